@@ -0,0 +1,28 @@
+RAPLA_HORIZON_WEEKS_BACK = 4  # * Weeks before the current week that are fetched from a Rapla source
+RAPLA_HORIZON_WEEKS_AHEAD = 26  # * Weeks after the current week (about one semester)
+RAPLA_WEEKS_PER_WINDOW = 4  # * Weeks rendered by one Rapla page (one request per window)
+RAPLA_PAGE_CACHE_SIZE = 4096  # * Parsed Rapla windows kept in memory (unchanged windows are not parsed again)
+
+CALENDAR_PARSE_WORKERS = 4  # * Worker processes that parse the downloaded calendars (0 = parse in the refresh thread)
+
+CALENDAR_VERSION_HISTORY = 20  # * Versions (changesets) kept per calendar for the delta API
+
+CALENDAR_RESPONSE_CACHE_SIZE = 512  # * Encoded calendar responses kept in memory (public calendar GET)
+CALENDAR_RESPONSE_CACHE_TTL = 60  # * Seconds a cached response is served (bounds staleness between processes)
+CALENDAR_CATALOG_CACHE_TTL = 60  # * Seconds the catalog of the native calendars is served (other processes may add)
+CALENDAR_FEED_CACHE_SIZE = 256  # * Rendered ICS feeds kept in memory (reused while the calendar hash is unchanged)
+
+GUEST_ACCESS_FLUSH_SECONDS = 60  # * Guest accesses are collected in memory and written in one UPDATE per interval
+
+REFRESH_TICK_SECONDS = 60 * 5  # * Refresh tasks look for due calendars at this interval (only due ones are fetched)
+REFRESH_MIN_SECONDS = 60 * 5  # * Shortest refresh interval (calendars that change often)
+REFRESH_DEFAULT_SECONDS = 60 * 15  # * Refresh interval of a calendar without fetch history
+REFRESH_MAX_SECONDS = 60 * 60 * 2  # * Longest refresh interval (stable calendars)
+REFRESH_BACKOFF_FACTOR = 1.5  # * Interval growth per unchanged fetch (a change divides the interval by it squared)
+REFRESH_EXAM_HORIZON_DAYS = 7  # * Calendars with an exam in the next days are refreshed at least every ...
+REFRESH_EXAM_MAX_SECONDS = 60 * 10  # * ... 10 minutes
+
+REFRESH_QUEUE_SECONDS = 60  # * The refresh queue (linked > guest > catalog sweep) is processed at this interval
+REFRESH_QUEUE_BATCH = 200  # * Calendars fetched per run of the queue (the rest stays queued by priority)
+
+REFRESH_LEASE_SECONDS = 60 * 10  # * A worker has to finish a leased calendar in this time (then another worker may)
@@ -0,0 +1,3 @@
+CANTEEN_WEEKS = 3  # * Weeks (current + following) of which the menus are fetched
+CANTEEN_FRESH_SECONDS = 60 * 10  # * A canteen week refreshed in this time is not fetched again (by any worker)
+CANTEEN_LEASE_SECONDS = 60 * 10  # * A worker has to finish a leased canteen week in this time (then another worker may)
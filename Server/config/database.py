@@ -1,5 +1,7 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from functools import lru_cache
 import configparser
 from pathlib import Path
 
@@ -8,12 +10,6 @@ configPath = Path(__file__).parent.parent.absolute() / "config.ini"
 config = configparser.ConfigParser()
 config.read(configPath)
 
-# Extract database connection details from the configuration
-host = config["DATABASE"]["host"]
-user = config["DATABASE"]["user"]
-password = config["DATABASE"]["password"]
-database = config["DATABASE"]["database"]
-
 # Define SSL arguments for secure database connection
 ssl_args = {
     "ssl": {
@@ -24,10 +20,39 @@ ssl_args = {
     }
 }
 
-# Create the database URL and SQLAlchemy engine
-SQLALCHEMY_DATABASE_URL = f"mariadb+pymysql://{user}:{password}@{host}/{database}?charset=utf8mb4"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=ssl_args, pool_pre_ping=True)
+
+# The connection details are only read when the engine is used first, so the models can be imported without
+# a config.ini (e.g. by the tests, which run on their own in-memory database)
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    # Extract database connection details from the configuration
+    host = config["DATABASE"]["host"]
+    user = config["DATABASE"]["user"]
+    password = config["DATABASE"]["password"]
+    database = config["DATABASE"]["database"]
+
+    # Create the database URL and SQLAlchemy engine
+    SQLALCHEMY_DATABASE_URL = f"mariadb+pymysql://{user}:{password}@{host}/{database}?charset=utf8mb4"
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=ssl_args, pool_pre_ping=True)
+    SessionLocal.configure(bind=engine)
+    return engine
+
+
+class LazySessionMaker(sessionmaker):
+    """Session factory that binds itself to the engine of config.ini on the first session."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+def __getattr__(name: str):
+    if name == "engine":  # * from config.database import engine
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Setup the session maker and declarative base for ORM
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = LazySessionMaker(autocommit=False, autoflush=False)
 Base = declarative_base()
@@ -0,0 +1,25 @@
+FETCH_MAX_CONCURRENCY = 32  # * Maximum number of parallel downloads in one fetch run (all hosts together)
+FETCH_MAX_CONCURRENCY_PER_HOST = 6  # * Maximum number of parallel downloads per upstream host (be polite!)
+
+HTTP_CONNECT_TIMEOUT_SECONDS = 5  # * Timeout to establish a connection to an upstream host
+HTTP_READ_TIMEOUT_SECONDS = 30  # * Timeout between two received chunks of a response
+HTTP_MAX_RETRIES = 3  # * Retries for connection errors and temporary upstream errors (429, 5xx)
+HTTP_RETRY_BACKOFF_SECONDS = 0.5  # * Base of the exponential backoff between retries
+HTTP_RETRY_JITTER_SECONDS = 0.5  # * Random jitter added to every backoff (avoids retry storms)
+HTTP_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+HTTP_MAX_RESPONSE_BYTES = 10 * 1024 * 1024  # * 10 Megabytes - larger responses are aborted
+HTTP_POOL_HOSTS = 16  # * Number of upstream hosts with a cached connection pool
+HTTP_POOL_MAXSIZE = FETCH_MAX_CONCURRENCY_PER_HOST  # * Keep-alive connections per upstream host
+HTTP_USER_AGENT = "TheStudentMaster-Server"
+
+UPSTREAM_RATE_PER_SECOND = 8  # * Requests per second to one upstream host (token bucket, shared by all fetch runs)
+UPSTREAM_BURST = 16  # * Requests to one upstream host that may be sent at once before the rate limit applies
+UPSTREAM_FAILURE_THRESHOLD = 5  # * Consecutive failures (timeouts, 5xx, 429) after which a host is skipped (open)
+UPSTREAM_RESET_SECONDS = 60 * 5  # * An open host is probed again after this time (one request, half-open)
+
+HTTP_CACHE_MAX_AGE_SECONDS = 60  # * Responses of public GETs are fresh for a minute (client and reverse proxy)
+HTTP_CACHE_STALE_SECONDS = 600  # * A proxy may serve a stale response while it revalidates it in the background
+HTTP_CACHE_CONTROL_PUBLIC = (
+    f"public, max-age={HTTP_CACHE_MAX_AGE_SECONDS}, stale-while-revalidate={HTTP_CACHE_STALE_SECONDS}"
+)
+HTTP_CACHE_CONTROL_PRIVATE = "private, no-cache"  # * Responses of user routes (always revalidated, never shared)
@@ -0,0 +1,3 @@
+NOTIFICATION_KEEPALIVE_SECONDS = 25  # * Comment sent on an idle event stream (keeps proxies from closing it)
+NOTIFICATION_RETRY_MS = 10 * 1000  # * Reconnect delay announced to the clients of the event stream
+NOTIFICATION_MAX_TOPICS = 32  # * Topics a client may subscribe to with one event stream
@@ -1,51 +1,68 @@
-from sqlalchemy.orm import Session, joinedload, defer
-from fastapi import HTTPException
+from sqlalchemy.orm import Session, defer
+from fastapi import HTTPException, Response
 import uuid
 import datetime
 
 
 from models.sql_models import m_calendar
-from models.pydantic_schemas import s_calendar
-
-
-def fetch_available_calendars(db: Session):
-    # Optimize query by loading related University objects and deferring the loading of large 'data' field
-    query_options = [joinedload(m_calendar.CalendarNative.university), defer(m_calendar.CalendarNative.data)]
-
-    # Query all CalendarNative entries with the specified query options
-    calendars = db.query(m_calendar.CalendarNative).options(*query_options).all()
-
-    available_calendars = {}  # Dictionary to hold lists of course names, keyed by university name
-    university_uuids = {}  # Dictionary to hold university UUIDs, keyed by university name
-
-    # Iterate through all fetched calendars
-    for calendar in calendars:
-        # Initialize lists in the dictionaries if the university hasn't been encountered yet
-        if calendar.university.university_name not in available_calendars:
-            available_calendars[calendar.university.university_name] = []
-            university_uuids[calendar.university.university_name] = calendar.university.university_uuid
-
-        # Append the course name to the list for the corresponding university
-        available_calendars[calendar.university.university_name].append(calendar.course_name)
-
-    response = []
-    # Convert the dictionaries into a list of ResAvailableNativeCalendars objects
-    for university_name, lectures in available_calendars.items():
-        response.append(
-            s_calendar.ResAvailableNativeCalendars(
-                university_name=university_name,
-                university_uuid=university_uuids[university_name],
-                course_names=lectures,
-            )
-        )
-
-    return response
-
-
-def fetch_calendar_by_university_and_course(university_uuid: uuid.UUID, course_name: str, db: Session):
+from middleware.calendar import (
+    build_calendar_delta,
+    build_calendar_response,
+    get_calendar_window,
+    accepts_gzip,
+    calendar_data_response,
+    calendar_feed_response,
+    cached_calendar_response,
+    build_calendar_catalog,
+    encoded_json_response,
+)
+from middleware.http_cache import make_etag, etag_matches, not_modified, set_cache_headers
+from utils.calendar.response_cache import calendar_response_cache, calendar_catalog_cache
+from utils.calendar.access_tracker import guest_access_tracker
+
+
+def fetch_available_calendars(
+    db: Session, university_uuid: uuid.UUID | None = None, if_none_match: str | None = None
+) -> Response:
+    # The catalog is built once and served from the cache until calendars or universities change
+    catalog = calendar_catalog_cache.get(university_uuid)
+    if catalog is None:
+        generation = calendar_catalog_cache.generation
+        catalog = calendar_catalog_cache.put(build_calendar_catalog(db), generation, university_uuid)
+
+    if etag_matches(if_none_match, catalog.etag):
+        return not_modified(catalog.etag)
+    return set_cache_headers(encoded_json_response(catalog.body), catalog.etag)
+
+
+def fetch_calendar_by_university_and_course(
+    university_uuid: uuid.UUID,
+    course_name: str,
+    db: Session,
+    start: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+    accept_encoding: str | None = None,
+    if_none_match: str | None = None,
+):
     course_name = course_name.replace("_", " ")
+    is_window = start is not None or end is not None
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+
+    # Popular calendars are sent from the response cache (no database query, no serialization)
+    cache_key = (university_uuid, course_name)
+    if not is_window:
+        cached = calendar_response_cache.get(cache_key)
+        if cached:
+            guest_access_tracker.record(cached.calendar_id)
+            etag = make_etag(cached.hash, gzip_encoded=accepts_gzip(accept_encoding))
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag, vary="Accept-Encoding")
+            return set_cache_headers(cached_calendar_response(cached, accept_encoding), etag)
 
     # Query the database for the calendar based on university UUID and course name
+    # (the data is only loaded when it is sent - not for a 304 or a time window)
+    query_options = [defer(m_calendar.CalendarNative.data)]
     calendar = (
         db.query(m_calendar.CalendarNative)
         .join(m_calendar.University)
@@ -53,30 +70,31 @@ def fetch_calendar_by_university_and_course(university_uuid: uuid.UUID, course_n
             m_calendar.University.university_uuid == university_uuid,
             m_calendar.CalendarNative.course_name == course_name,
         )
+        .options(*query_options)
         .first()
     )
 
     if not calendar:
         raise HTTPException(status_code=404, detail="Calendar not found")
 
-    # Check if the last_accessed field needs to be updated
-    current_time = datetime.datetime.now()
-    if (current_time - calendar.guest_last_accessed) > datetime.timedelta(minutes=15):
-        # Update last_accessed to the current time if more than 15 minutes have passed
-        calendar.guest_last_accessed = current_time
-        db.commit()  # Commit the update to the database
+    # Remember the guest access (written in one batch by the scheduler, no write transaction per request)
+    guest_access_tracker.record(calendar.calendar_native_id)
+
+    if is_window:
+        etag = make_etag(calendar.hash, start, end)
+    else:
+        etag = make_etag(calendar.hash, gzip_encoded=accepts_gzip(accept_encoding))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, vary=None if is_window else "Accept-Encoding")
 
     # Create the response structure with the necessary calendar details
-    res_calendar = s_calendar.CalendarNative(
-        university_name=calendar.university.university_name,
-        course_name=calendar.course_name,
-        data=calendar.data,
-        hash=calendar.hash,
-        last_modified=calendar.last_modified,
-        guest_last_accessed=calendar.guest_last_accessed,
-    )
+    if is_window:
+        window = get_calendar_window(db, calendar, start, end)
+        return set_cache_headers(build_calendar_response(calendar, calendar.university.university_name, window), etag)
 
-    return res_calendar
+    response = build_calendar_response(calendar, calendar.university.university_name)
+    cached = calendar_response_cache.put(cache_key, calendar.calendar_native_id, calendar.hash, response.body)
+    return set_cache_headers(cached_calendar_response(cached, accept_encoding), etag)
 
 
 def fetch_calendar_hash(university_uuid: uuid.UUID, course_name: str, db: Session):
@@ -101,11 +119,108 @@ def fetch_calendar_hash(university_uuid: uuid.UUID, course_name: str, db: Sessio
     if not calendar:
         raise HTTPException(status_code=404, detail="Calendar not found")
 
-    # Check if the guest_last_accessed field needs to be updated (only if more than 15 minutes have passed)
-    current_time = datetime.datetime.now()
-    if (current_time - calendar.guest_last_accessed) > datetime.timedelta(minutes=15):
-        # Update guest_last_accessed to the current time
-        calendar.guest_last_accessed = current_time
-        db.commit()  # Commit the update to the database
+    # Remember the guest access (written in one batch by the scheduler, no write transaction per request)
+    guest_access_tracker.record(calendar.calendar_native_id)
 
     return {"message": calendar.hash}
+
+
+def fetch_calendar_delta(university_uuid: uuid.UUID, course_name: str, base_hash: str, db: Session):
+    course_name = course_name.replace("_", " ")  # Replace underscores with spaces in the course name
+
+    # Query the calendar without its data (only needed if the client has to get the full calendar)
+    calendar = (
+        db.query(m_calendar.CalendarNative)
+        .join(m_calendar.University)
+        .filter(
+            m_calendar.University.university_uuid == university_uuid,
+            m_calendar.CalendarNative.course_name == course_name,
+        )
+        .options(defer(m_calendar.CalendarNative.data))
+        .first()
+    )
+
+    if not calendar:
+        raise HTTPException(status_code=404, detail="Calendar not found")
+
+    # Remember the guest access (written in one batch by the scheduler, no write transaction per request)
+    guest_access_tracker.record(calendar.calendar_native_id)
+
+    return build_calendar_delta(db, calendar, base_hash)
+
+
+def fetch_calendar_data(
+    university_uuid: uuid.UUID,
+    course_name: str,
+    accept_encoding: str | None,
+    db: Session,
+    if_none_match: str | None = None,
+):
+    course_name = course_name.replace("_", " ")  # Replace underscores with spaces in the course name
+
+    calendar = (
+        db.query(m_calendar.CalendarNative)
+        .join(m_calendar.University)
+        .filter(
+            m_calendar.University.university_uuid == university_uuid,
+            m_calendar.CalendarNative.course_name == course_name,
+        )
+        .options(defer(m_calendar.CalendarNative.data))  # Only loaded if the client's copy is outdated
+        .first()
+    )
+
+    if not calendar:
+        raise HTTPException(status_code=404, detail="Calendar not found")
+
+    # Remember the guest access (written in one batch by the scheduler, no write transaction per request)
+    guest_access_tracker.record(calendar.calendar_native_id)
+
+    etag = make_etag(calendar.hash, gzip_encoded=accepts_gzip(accept_encoding))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, vary="Accept-Encoding")
+    return set_cache_headers(calendar_data_response(calendar, accept_encoding), etag)
+
+
+def fetch_calendar_feed(
+    university_uuid: uuid.UUID, course_name: str, db: Session, if_none_match: str | None = None
+) -> Response:
+    course_name = course_name.replace("_", " ")  # Replace underscores with spaces in the course name
+
+    calendar = (
+        db.query(m_calendar.CalendarNative)
+        .join(m_calendar.University)
+        .filter(
+            m_calendar.University.university_uuid == university_uuid,
+            m_calendar.CalendarNative.course_name == course_name,
+        )
+        .options(defer(m_calendar.CalendarNative.data))  # Only loaded if the feed is not cached
+        .first()
+    )
+
+    if not calendar:
+        raise HTTPException(status_code=404, detail="Calendar not found")
+
+    # Remember the guest access (written in one batch by the scheduler, no write transaction per request)
+    guest_access_tracker.record(calendar.calendar_native_id)
+
+    etag = make_etag(calendar.hash, "ics")
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return set_cache_headers(calendar_feed_response(calendar, calendar.course_name, "native"), etag)
+
+
+def fetch_custom_calendar_feed(feed_token: uuid.UUID, db: Session, if_none_match: str | None = None) -> Response:
+    calendar = (
+        db.query(m_calendar.CalendarCustom)
+        .filter(m_calendar.CalendarCustom.feed_token == feed_token)
+        .options(defer(m_calendar.CalendarCustom.data))  # Only loaded if the feed is not cached
+        .first()
+    )
+
+    if not calendar:
+        raise HTTPException(status_code=404, detail="Calendar not found")
+
+    etag = make_etag(calendar.hash, "ics")
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return set_cache_headers(calendar_feed_response(calendar, calendar.course_name, "custom"), etag)
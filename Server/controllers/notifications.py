@@ -0,0 +1,158 @@
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Tuple
+import json
+import uuid
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.notifications import NOTIFICATION_KEEPALIVE_SECONDS, NOTIFICATION_RETRY_MS, NOTIFICATION_MAX_TOPICS
+
+# ~~~~~~~~~~~~~~~~ Models ~~~~~~~~~~~~~~~~ #
+from models.sql_models import m_calendar, m_canteen
+
+# ~~~~~~~~~~~~~~~ Middleware ~~~~~~~~~~~~~~ #
+from middleware.auth import check_access_token
+from middleware.calendar import get_calendar
+
+# ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
+from utils.notifications.pubsub import get_broker, calendar_channel, canteen_channel
+
+# Topics of the event stream (as sent by the client) and the channel each one is published to:
+#   user                                  -> calendar of the authenticated user (native or custom)
+#   calendar:<university_uuid>/<course>  -> native calendar (course name as in /calendar/<uuid>/<course>)
+#   canteen:<canteen_short_name>          -> menu of a canteen
+#   canteen                               -> menus of all canteens (one topic per canteen)
+
+Topic = Tuple[str, int | str]  # ("native" / "custom", calendar id) or ("canteen", canteen_short_name)
+
+
+# ======================================================== #
+# ======================== Topics ======================== #
+# ======================================================== #
+
+
+def topic_channel(topic: Topic) -> str:
+    kind, key = topic
+    return canteen_channel(key) if kind == "canteen" else calendar_channel(kind, key)
+
+
+def resolve_topics(db: Session, topics: List[str], access_token: str | None) -> Dict[str, Topic]:
+    """Function to resolve the topics of a client (label -> topic). Raises 400/401/404 for invalid topics."""
+    resolved = {}
+    for label in dict.fromkeys(topics):
+        if label == "user":
+            if not access_token:
+                raise HTTPException(status_code=401, detail="Unauthorized")
+            calendar = get_calendar(db, check_access_token(db, access_token).user_id)
+            if not calendar:
+                raise HTTPException(status_code=404, detail="Calendar not found")
+            if isinstance(calendar, m_calendar.CalendarNative):
+                resolved[label] = ("native", calendar.calendar_native_id)
+            else:
+                resolved[label] = ("custom", calendar.calendar_custom_id)
+
+        elif label.startswith("calendar:"):
+            university_uuid, _, course_name = label[len("calendar:") :].partition("/")
+            try:
+                university_uuid = uuid.UUID(university_uuid)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid topic '{label}'")
+            calendar_id = (
+                db.query(m_calendar.CalendarNative.calendar_native_id)
+                .join(m_calendar.University)
+                .filter(
+                    m_calendar.University.university_uuid == university_uuid,
+                    m_calendar.CalendarNative.course_name == course_name.replace("_", " "),
+                )
+                .scalar()
+            )
+            if calendar_id is None:
+                raise HTTPException(status_code=404, detail="Calendar not found")
+            resolved[label] = ("native", calendar_id)
+
+        elif label == "canteen" or label.startswith("canteen:"):
+            query = db.query(m_canteen.Canteen.canteen_short_name)
+            if label != "canteen":
+                query = query.filter(m_canteen.Canteen.canteen_short_name == label[len("canteen:") :])
+            canteen_short_names = [canteen_short_name for (canteen_short_name,) in query]
+            if not canteen_short_names:
+                raise HTTPException(status_code=404, detail="Canteen not found")
+            for canteen_short_name in canteen_short_names:
+                resolved[f"canteen:{canteen_short_name}"] = ("canteen", canteen_short_name)
+
+        else:
+            raise HTTPException(status_code=400, detail=f"Invalid topic '{label}'")
+
+    if not resolved or len(resolved) > NOTIFICATION_MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"Subscribe to 1 - {NOTIFICATION_MAX_TOPICS} topics")
+    return resolved
+
+
+def load_topic_messages(db: Session, topics: Dict[str, Topic]) -> Dict[str, dict]:
+    """Function to read the current hashes of the topics (label -> message, same format as published)."""
+    keys = {"native": [], "custom": [], "canteen": []}
+    for kind, key in topics.values():
+        keys[kind].append(key)
+
+    messages = {}
+    for calendar_id, calendar_hash in db.query(
+        m_calendar.CalendarNative.calendar_native_id, m_calendar.CalendarNative.hash
+    ).filter(m_calendar.CalendarNative.calendar_native_id.in_(keys["native"])):
+        messages[("native", calendar_id)] = {"hash": calendar_hash}
+    for calendar_id, calendar_hash in db.query(
+        m_calendar.CalendarCustom.calendar_custom_id, m_calendar.CalendarCustom.hash
+    ).filter(m_calendar.CalendarCustom.calendar_custom_id.in_(keys["custom"])):
+        messages[("custom", calendar_id)] = {"hash": calendar_hash}
+    for canteen_short_name, canteen_hash, menu_hash in db.query(
+        m_canteen.Canteen.canteen_short_name, m_canteen.Canteen.hash, m_canteen.Canteen.menu_hash
+    ).filter(m_canteen.Canteen.canteen_short_name.in_(keys["canteen"])):
+        messages[("canteen", canteen_short_name)] = {"hash": canteen_hash, "menu_hash": menu_hash}
+
+    return {label: messages[topic] for label, topic in topics.items() if topic in messages}
+
+
+# ======================================================== #
+# ====================== Event Stream ==================== #
+# ======================================================== #
+
+
+def format_event(label: str, message: dict) -> str:
+    """Function to format a message as Server-Sent Event ("hash" event with the topic of the client)."""
+    return f"event: hash\ndata: {json.dumps({'topic': label, **message})}\n\n"
+
+
+def open_notification_stream(db: Session, topics: List[str], access_token: str | None = None) -> StreamingResponse:
+    """Function to open an event stream of hash changes. The current hashes are sent first, then every change."""
+    resolved = resolve_topics(db, topics, access_token)
+    labels = {topic_channel(topic): label for label, topic in resolved.items()}
+
+    # Subscribe before reading the current hashes (a change in between is sent twice instead of being lost)
+    broker = get_broker()
+    subscription = broker.subscribe(labels)
+    try:
+        db.rollback()  # * New snapshot of the database (changes committed before the subscription are visible)
+        current = load_topic_messages(db, resolved)
+    except Exception:
+        broker.unsubscribe(subscription)
+        raise
+
+    async def events():
+        try:
+            yield f"retry: {NOTIFICATION_RETRY_MS}\n\n"
+            for label, message in current.items():
+                yield format_event(label, message)
+            while True:
+                messages = await subscription.get(NOTIFICATION_KEEPALIVE_SECONDS)
+                if not messages:
+                    yield ": keep-alive\n\n"
+                for channel, message in messages:
+                    yield format_event(labels[channel], message)
+        finally:
+            broker.unsubscribe(subscription)  # Client disconnected
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # * Not buffered by proxies (nginx)
+    )
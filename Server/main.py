@@ -7,20 +7,25 @@ from fastapi_cdn_host import monkey_patch
 
 # ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
 from config.database import engine
+from config.calendar import GUEST_ACCESS_FLUSH_SECONDS, REFRESH_TICK_SECONDS, REFRESH_QUEUE_SECONDS
 
 # ~~~~~~~~~~~~~~~ Middleware ~~~~~~~~~~~~~~ #
 from middleware.database import get_async_db, get_db
 
 from middleware.general import clean_address
 from middleware.calendar import (
+    migrateCalendarTables,
     prepareCalendarTables,
+    prepareCalendarEvents,
     update_user_linked_calendars,
     update_guest_accessed_calendars,
+    process_native_refresh_queue,
+    flush_guest_accesses,
     update_all_native_calendars,
     update_custom_calendars,
     clean_custom_calendars,
 )
-from middleware.canteen import create_canteens, update_canteen_menus, clean_canteen_menus
+from middleware.canteen import migrateCanteenTables, create_canteens, update_canteen_menus, clean_canteen_menus
 
 # ~~~~~~~~~~~~~~~~ Schemas ~~~~~~~~~~~~~~~~ #
 
@@ -28,9 +33,10 @@ from middleware.canteen import create_canteens, update_canteen_menus, clean_cant
 from models.sql_models import m_user, m_general, m_canteen, m_calendar, m_auth
 
 # ~~~~~~~~~~~~~~~~~ Routes ~~~~~~~~~~~~~~~~ #
-from routes import user, auth, canteen, calendar
+from routes import user, auth, canteen, calendar, monitoring, notifications
 
 from utils.scheduler.task_scheduler import TaskScheduler
+from utils.calendar.parse_pool import parse_pool
 
 m_general.Base.metadata.create_all(bind=engine)
 m_user.Base.metadata.create_all(bind=engine)
@@ -47,12 +53,20 @@ task_scheduler = TaskScheduler(verbose=True)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # ~~~~~~~~~ Code to run on startup ~~~~~~~~ #
+    # Tables of an older deployment get the new columns first (create_all does not alter existing tables)
+    async with get_async_db() as db:
+        await asyncio.to_thread(migrateCanteenTables, db)
+        await asyncio.to_thread(migrateCalendarTables, db)
+
     async with get_async_db() as db:
         await asyncio.to_thread(create_canteens, db)
 
     async with get_async_db() as db:
         await asyncio.to_thread(prepareCalendarTables, db)
 
+    async with get_async_db() as db:
+        await asyncio.to_thread(prepareCalendarEvents, db)
+
     async with get_async_db() as db:
         backends = db.query(m_calendar.CalendarBackend).all()
 
@@ -79,26 +93,45 @@ async def lifespan(app: FastAPI):
     task_scheduler.add_task(
         "calendar_native_linked",
         update_user_linked_calendars,
-        interval_seconds=60 * 15,  # 15 minutes
+        interval_seconds=REFRESH_TICK_SECONDS,  # Only due calendars are queued (adaptive interval)
         start_time=6,
         end_time=18,
-        blocked_by=["calendar_native_all"],
+        blocked_by=[],
+        with_progress=False,
     )
 
     task_scheduler.add_task(
         "calendar_native_guest_accessed",
         update_guest_accessed_calendars,
-        interval_seconds=60 * 15,  # 15 minutes
+        interval_seconds=REFRESH_TICK_SECONDS,  # Only due calendars are queued (adaptive interval)
         start_time=6,
         end_time=18,
-        blocked_by=["calendar_native_all"],
+        blocked_by=[],
+        with_progress=False,
+    )
+
+    task_scheduler.add_task(
+        "calendar_native_queue",
+        process_native_refresh_queue,
+        interval_seconds=REFRESH_QUEUE_SECONDS,  # Single consumer of the queue (linked > guest > sweep)
+        start_time=6,
+        end_time=18,
+        blocked_by=[],
+    )
+
+    task_scheduler.add_task(
+        "calendar_guest_access_flush",
+        flush_guest_accesses,
+        interval_seconds=GUEST_ACCESS_FLUSH_SECONDS,
+        blocked_by=[],
+        with_progress=False,
     )
 
     for backend in backends:
         task_scheduler.add_task(
             f"calendar_custom_{backend.backend_name}",
             update_custom_calendars,
-            interval_seconds=60 * 15,  # 15 minutes
+            interval_seconds=REFRESH_TICK_SECONDS,  # Only due calendars are fetched (adaptive interval)
             start_time=6,
             end_time=18,
             blocked_by=[],
@@ -143,6 +176,10 @@ async def lifespan(app: FastAPI):
     yield
     # ~~~~~~~~ Code to run on shutdown ~~~~~~~~ #
     task_scheduler.stop()
+    parse_pool.shutdown()
+
+    async with get_async_db() as db:
+        await asyncio.to_thread(flush_guest_accesses, db)  # Write the remaining guest accesses
 
     # ~~~~~~~~ End of code to run on shutdown ~~~~~~~~ #
 
@@ -167,3 +204,5 @@ app.include_router(user.users_router, prefix="/user", tags=["user"])
 app.include_router(auth.auth_router, prefix="/auth", tags=["auth"])
 app.include_router(canteen.canteen_router, prefix="/canteen", tags=["canteen"])
 app.include_router(calendar.calendar_router, prefix="/calendar", tags=["calendar"])
+app.include_router(monitoring.monitoring_router, prefix="/monitoring", tags=["monitoring"])
+app.include_router(notifications.notifications_router, prefix="/notifications", tags=["notifications"])
@@ -1,23 +1,58 @@
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload, defer
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, exists, case, or_
+from sqlalchemy.exc import IntegrityError
 from profanity_check import predict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import json
 import datetime
 import uuid
 
 # ~~~~~~~~~~~~~~~~~ Models ~~~~~~~~~~~~~~~~ #
 from models.sql_models import m_calendar
+from models.sql_models.compressed_json import CompressedPayload
 
 # ~~~~~~~~~~~~~~~ Middleware ~~~~~~~~~~~~~~ #
-from middleware.general import create_address
+from middleware.general import create_address, add_missing_columns, compress_json_column
+from middleware.lease import claim_leases, release_lease
 
 # ~~~~~~~~~~~~~~~~~ Schemas ~~~~~~~~~~~~~~~~ #
 from models.pydantic_schemas import s_general, s_calendar
 
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.calendar import (
+    CALENDAR_VERSION_HISTORY,
+    REFRESH_MIN_SECONDS,
+    REFRESH_EXAM_HORIZON_DAYS,
+    REFRESH_QUEUE_BATCH,
+    REFRESH_DEFAULT_SECONDS,
+    REFRESH_LEASE_SECONDS,
+)
+
 # ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
 import utils.calendar.nativ_sources as nativ_sources
+from utils.calendar.calendar_events import (
+    calendar_event_index,
+    event_row,
+    event_from_row,
+    diff_calendar_events,
+    compose_changesets,
+    EVENT_COLUMNS,
+)
 from utils.calendar.calendar_wrapper import CalendarWrapper
+from utils.network.fetch_engine import get_source_validators, source_validator_columns
+from utils.calendar.response_cache import (
+    calendar_response_cache,
+    calendar_catalog_cache,
+    calendar_feed_cache,
+    CachedResponse,
+)
+from utils.calendar.ics_export import iter_ics, ICS_MEDIA_TYPE
+from utils.notifications.pubsub import publish, calendar_channel
+from utils.calendar.access_tracker import guest_access_tracker
+from utils.calendar.refresh_schedule import RefreshOutcome, next_refresh_interval
+from utils.calendar.refresh_queue import native_refresh_queue, PRIORITY_LINKED, PRIORITY_GUEST, PRIORITY_SWEEP
 
 ###########################################################################
 ############################# Helper Functions ############################
@@ -30,24 +65,460 @@ def get_backend_ids(db: Session):
     return {backend.backend_name: backend.calendar_backend_id for backend in backends}
 
 
+def sync_calendar_events(
+    db: Session, calendar: m_calendar.CalendarNative | m_calendar.CalendarCustom, data: dict
+) -> dict:
+    """Function to apply only the changed events of a calendar to the calendar_events table.
+    Returns the changeset (added, changed and removed events)."""
+    if isinstance(calendar, m_calendar.CalendarNative):
+        owner_column, calendar_id = m_calendar.CalendarEvent.native_calendar_id, calendar.calendar_native_id
+    else:
+        owner_column, calendar_id = m_calendar.CalendarEvent.custom_calendar_id, calendar.calendar_custom_id
+    owner = {owner_column.key: calendar_id}
+
+    columns = [getattr(m_calendar.CalendarEvent, column) for column in EVENT_COLUMNS]
+    stored_events = db.query(
+        m_calendar.CalendarEvent.calendar_event_id, m_calendar.CalendarEvent.event_key, *columns
+    ).filter(owner_column == calendar_id)
+    existing = {
+        event.event_key: (event.calendar_event_id, {column: getattr(event, column) for column in EVENT_COLUMNS})
+        for event in stored_events
+    }
+
+    events = calendar_event_index(data)
+    inserts, updates, deletes = diff_calendar_events(existing, {key: event_row(event) for key, event in events.items()})
+
+    # Only the changed rows are written (bulk statements, no ORM objects)
+    if deletes:
+        db.query(m_calendar.CalendarEvent).filter(m_calendar.CalendarEvent.calendar_event_id.in_(deletes)).delete(
+            synchronize_session=False
+        )
+    if inserts:
+        db.execute(insert(m_calendar.CalendarEvent), [{**owner, "event_key": key, **row} for key, row in inserts])
+    if updates:
+        db.execute(
+            update(m_calendar.CalendarEvent), [{"calendar_event_id": event_id, **row} for event_id, row in updates]
+        )
+
+    keys = {event_id: key for key, (event_id, _) in existing.items()}
+    return {
+        "added": [{"key": key, **events[key]} for key, _ in inserts],
+        "changed": [{"key": keys[event_id], **events[keys[event_id]]} for event_id, _ in updates],
+        "removed": [event_from_row(keys[event_id], existing[keys[event_id]][1]) for event_id in deletes],
+    }
+
+
+def record_calendar_version(
+    db: Session, calendar: m_calendar.CalendarNative | m_calendar.CalendarCustom, base_hash: str, changeset: dict
+):
+    """Function to record the changeset from base_hash to the current hash of a calendar (bounded history)."""
+    if isinstance(calendar, m_calendar.CalendarNative):
+        owner_column, calendar_id = m_calendar.CalendarVersion.native_calendar_id, calendar.calendar_native_id
+    else:
+        owner_column, calendar_id = m_calendar.CalendarVersion.custom_calendar_id, calendar.calendar_custom_id
+
+    db.add(
+        m_calendar.CalendarVersion(
+            **{owner_column.key: calendar_id}, base_hash=base_hash, hash=calendar.hash, changes=changeset
+        )
+    )
+    db.flush()
+
+    # Only keep the newest versions
+    expired_versions = [
+        version_id
+        for (version_id,) in db.query(m_calendar.CalendarVersion.calendar_version_id)
+        .filter(owner_column == calendar_id)
+        .order_by(m_calendar.CalendarVersion.calendar_version_id.desc())
+        .offset(CALENDAR_VERSION_HISTORY)
+    ]
+    if expired_versions:
+        db.query(m_calendar.CalendarVersion).filter(
+            m_calendar.CalendarVersion.calendar_version_id.in_(expired_versions)
+        ).delete(synchronize_session=False)
+
+
+def get_calendar_delta(
+    db: Session, calendar: m_calendar.CalendarNative | m_calendar.CalendarCustom, base_hash: str
+) -> dict | None:
+    """Function to get the changes of a calendar since base_hash.
+    Returns None if base_hash is unknown or expired (the client needs the full payload)."""
+    if base_hash == calendar.hash:
+        return {"added": [], "changed": [], "removed": []}
+
+    if isinstance(calendar, m_calendar.CalendarNative):
+        owner_column, calendar_id = m_calendar.CalendarVersion.native_calendar_id, calendar.calendar_native_id
+    else:
+        owner_column, calendar_id = m_calendar.CalendarVersion.custom_calendar_id, calendar.calendar_custom_id
+
+    versions = (
+        db.query(m_calendar.CalendarVersion)
+        .filter(owner_column == calendar_id)
+        .order_by(m_calendar.CalendarVersion.calendar_version_id)
+        .all()
+    )
+
+    # Start at the newest version that is based on the client's hash and follow the chain to the current hash
+    start = next((i for i in reversed(range(len(versions))) if versions[i].base_hash == base_hash), None)
+    if start is None:
+        return None
+    chain = versions[start:]
+    for previous, version in zip(chain, chain[1:]):
+        if version.base_hash != previous.hash:
+            return None  # Gap in the history (e.g. versions were not recorded)
+    if chain[-1].hash != calendar.hash:
+        return None
+
+    return compose_changesets([version.changes for version in chain])
+
+
+def build_calendar_delta(
+    db: Session, calendar: m_calendar.CalendarNative | m_calendar.CalendarCustom, base_hash: str
+) -> s_calendar.ResCalendarDelta:
+    """Function to build the delta response of a calendar (falls back to the full data)."""
+    changes = get_calendar_delta(db, calendar, base_hash)
+    return s_calendar.ResCalendarDelta(
+        base_hash=base_hash,
+        hash=calendar.hash,
+        full=changes is None,
+        changes=changes,
+        data=calendar.data if changes is None else None,  # * data is only loaded if needed (deferred)
+        last_modified=calendar.last_modified,
+    )
+
+
+def to_calendar_time(moment: datetime.datetime | None, timezone: str | None) -> datetime.datetime | None:
+    """Function to convert a timezone aware datetime to the naive local time the events are stored in."""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    try:
+        return moment.astimezone(ZoneInfo(timezone)).replace(tzinfo=None)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return moment.astimezone().replace(tzinfo=None)  # Unknown timezone -> server time
+
+
+def get_calendar_window(
+    db: Session,
+    calendar: m_calendar.CalendarNative | m_calendar.CalendarCustom,
+    start: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+) -> dict:
+    """Function to get the events of a calendar that overlap [start, end) in the calendar json format.
+    The events are read from the calendar_events table, so the (deferred) data of the calendar is not loaded."""
+    if isinstance(calendar, m_calendar.CalendarNative):
+        owner_column, calendar_id = m_calendar.CalendarEvent.native_calendar_id, calendar.calendar_native_id
+    else:
+        owner_column, calendar_id = m_calendar.CalendarEvent.custom_calendar_id, calendar.calendar_custom_id
+
+    # Rows written before the timezone column existed -> read it from the data once
+    timezone = calendar.timezone or calendar.data.get("X-WR-TIMEZONE")
+    start, end = (to_calendar_time(moment, timezone) for moment in (start, end))
+
+    columns = [getattr(m_calendar.CalendarEvent, column) for column in EVENT_COLUMNS]
+    query = db.query(*columns).filter(owner_column == calendar_id)
+    if end:
+        query = query.filter(m_calendar.CalendarEvent.event_start < end)  # * Range on index (calendar, event_start)
+    if start:
+        query = query.filter(m_calendar.CalendarEvent.event_end > start)
+    query = query.order_by(m_calendar.CalendarEvent.event_start, m_calendar.CalendarEvent.calendar_event_id)
+
+    return {
+        "X-WR-TIMEZONE": timezone,
+        "events": [
+            event_from_row(None, {column: getattr(event, column) for column in EVENT_COLUMNS}) for event in query
+        ],
+    }
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    return "gzip" in (accept_encoding or "").lower()
+
+
+def encoded_json_response(content: bytes, gzip_encoded: bool = False) -> Response:
+    """Function to send already encoded JSON bytes (gzip_encoded -> content is a gzip stream)."""
+    headers = {"Vary": "Accept-Encoding"}
+    if gzip_encoded:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def calendar_data_response(
+    calendar: m_calendar.CalendarNative | m_calendar.CalendarCustom, accept_encoding: str | None
+) -> Response:
+    """Function to send the data of a calendar as stored (gzip) if the client accepts it, otherwise decompressed."""
+    payload = calendar.data
+    if accepts_gzip(accept_encoding):
+        return encoded_json_response(payload.gzip, gzip_encoded=True)
+    return encoded_json_response(payload.raw)
+
+
+def cached_calendar_response(entry: CachedResponse, accept_encoding: str | None) -> Response:
+    """Function to send a cached calendar response (gzip if the client accepts it)."""
+    if accepts_gzip(accept_encoding):
+        return encoded_json_response(entry.gzip, gzip_encoded=True)
+    return encoded_json_response(entry.raw)
+
+
+def calendar_feed_response(
+    calendar: m_calendar.CalendarNative | m_calendar.CalendarCustom, calendar_name: str, kind: str
+) -> Response:
+    """Function to send a calendar as ICS feed (kind: "native"/"custom"). A feed is rendered once per calendar hash:
+    the first request streams it while it is rendered and caches it, the following ones are sent from the cache."""
+    calendar_id = calendar.calendar_native_id if kind == "native" else calendar.calendar_custom_id
+    key = (kind, calendar_id)
+    feed = calendar_feed_cache.get(key, calendar.hash)
+    if feed is not None:
+        return Response(content=feed, media_type=ICS_MEDIA_TYPE)
+
+    # * Read everything before streaming (the database session is closed when the body is sent)
+    calendar_hash = calendar.hash
+    chunks = iter_ics(calendar.data, calendar_name, kind, calendar_id, calendar.last_modified)
+
+    def stream():
+        rendered = []
+        for chunk in chunks:
+            rendered.append(chunk)
+            yield chunk
+        calendar_feed_cache.put(key, calendar_hash, b"".join(rendered))
+
+    return StreamingResponse(stream(), media_type=ICS_MEDIA_TYPE)
+
+
+def calendar_feed_path(calendar: m_calendar.CalendarNative | m_calendar.CalendarCustom) -> str:
+    """Function to get the path of the ICS feed of a calendar (relative to the API root)."""
+    if isinstance(calendar, m_calendar.CalendarNative):
+        course_name = calendar.course_name.replace(" ", "_")
+        return f"/calendar/{calendar.university.university_uuid}/{course_name}/ics"
+    return f"/calendar/custom/{calendar.feed_token}/ics"
+
+
+def build_calendar_response(
+    calendar: m_calendar.CalendarNative | m_calendar.CalendarCustom, university_name: str | None, window: dict = None
+) -> Response:
+    """Function to build the calendar response. The full data is not serialized again: its canonical JSON bytes
+    (as hashed and stored) are added to the response object as an already encoded member."""
+    if window is not None:
+        response = s_calendar.ResCalendar(
+            university_name=university_name,
+            course_name=calendar.course_name,
+            data=window,
+            hash=calendar.hash,
+            last_modified=calendar.last_modified,
+        )
+        return Response(content=response.model_dump_json(), media_type="application/json")
+
+    fields = s_calendar.ResCalendar.model_construct(
+        university_name=university_name,
+        course_name=calendar.course_name,
+        hash=calendar.hash,
+        last_modified=calendar.last_modified,
+    ).model_dump(mode="json", exclude={"data"})
+    members = [
+        json.dumps(key).encode("utf-8") + b":" + json.dumps(value, ensure_ascii=False).encode("utf-8")
+        for key, value in fields.items()
+    ]
+    members.append(b'"data":' + CompressedPayload.from_data(calendar.data).raw)
+    return Response(content=b"{" + b",".join(members) + b"}", media_type="application/json")
+
+
+def apply_calendar_data(
+    db: Session, calendar: m_calendar.CalendarNative | m_calendar.CalendarCustom, calendar_data: dict
+) -> bool:
+    """Function to apply a CalendarWrapper result to a calendar. Returns True if the data has changed."""
+    if not calendar_data:
+        return False
+
+    # Remember the upstream validators for the next conditional download
+    for column, value in source_validator_columns(calendar_data.get("validators")).items():
+        setattr(calendar, column, value)
+
+    # Upstream answered "not modified" or sent the same payload again -> nothing to parse or write
+    if calendar_data.get("not_modified"):
+        return False
+
+    if calendar_data.get("hash") != calendar.hash:
+        base_hash = calendar.hash
+        calendar.data = calendar_data.get("data")
+        calendar.hash = calendar_data.get("hash")
+        db.add(calendar)  # Stage the changes to be committed later
+        changeset = sync_calendar_events(db, calendar, calendar.data)
+        if base_hash:
+            record_calendar_version(db, calendar, base_hash, changeset)
+        return True
+    return False
+
+
+def only_due_calendars(
+    query, model: type[m_calendar.CalendarNative] | type[m_calendar.CalendarCustom], now: datetime.datetime
+):
+    """Function to restrict a calendar query to calendars that are due for a refresh (or were never fetched)."""
+    state = m_calendar.CalendarRefreshState
+    if model is m_calendar.CalendarNative:
+        owner = state.native_calendar_id == m_calendar.CalendarNative.calendar_native_id
+    else:
+        owner = state.custom_calendar_id == m_calendar.CalendarCustom.calendar_custom_id
+    return query.outerjoin(state, owner).filter(or_(state.next_due.is_(None), state.next_due <= now))
+
+
+def get_exam_calendar_ids(db: Session, owner_column, calendar_ids: list[int], now: datetime.datetime) -> set[int]:
+    """Function to get the calendars with an exam (event tag) in the next REFRESH_EXAM_HORIZON_DAYS days."""
+    horizon = now + datetime.timedelta(days=REFRESH_EXAM_HORIZON_DAYS)
+    upcoming_events = db.query(owner_column, m_calendar.CalendarEvent.description).filter(
+        owner_column.in_(calendar_ids),
+        m_calendar.CalendarEvent.event_end >= now,
+        m_calendar.CalendarEvent.event_start <= horizon,
+    )
+    return {
+        calendar_id
+        for calendar_id, description in upcoming_events
+        if isinstance(description, dict) and "exam" in (description.get("tags") or [])
+    }
+
+
+def fetch_outcome(calendar_data: dict | None, changed: bool, fetch_stats: dict | None) -> RefreshOutcome:
+    """Function to get the outcome of a fetch from a CalendarWrapper result (None = download failed)."""
+    fetch_stats = fetch_stats or {}
+    return RefreshOutcome(
+        changed=changed,
+        failed=not calendar_data,
+        elapsed=fetch_stats.get("elapsed"),
+        bytes=fetch_stats.get("bytes"),
+    )
+
+
+def claim_calendar_refreshes(
+    db: Session,
+    model: type[m_calendar.CalendarNative] | type[m_calendar.CalendarCustom],
+    calendar_ids: list[int],
+    now: datetime.datetime | None = None,
+) -> list[int]:
+    """Function to lease the due calendars of calendar_ids to this worker (see middleware/lease).
+    Calendars that are not due or leased by another worker are left out. Returns the leased calendar ids."""
+    if not calendar_ids:
+        return []
+    now = now or datetime.datetime.now()
+    state = m_calendar.CalendarRefreshState
+    owner_column = state.native_calendar_id if model is m_calendar.CalendarNative else state.custom_calendar_id
+
+    # Calendars without a refresh state get one (due now), so there is a row to lock
+    existing = {calendar_id for (calendar_id,) in db.query(owner_column).filter(owner_column.in_(calendar_ids))}
+    missing = [calendar_id for calendar_id in calendar_ids if calendar_id not in existing]
+    if missing:
+        try:
+            db.execute(
+                insert(state),
+                [
+                    {
+                        owner_column.key: calendar_id,
+                        "refresh_interval": REFRESH_DEFAULT_SECONDS,
+                        "next_due": now,
+                        "fetch_count": 0,
+                        "change_count": 0,
+                        "failure_count": 0,
+                    }
+                    for calendar_id in missing
+                ],
+            )
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # Another worker created them at the same time
+
+    leased = claim_leases(
+        db,
+        db.query(state).filter(owner_column.in_(calendar_ids), state.next_due <= now),
+        state,
+        REFRESH_LEASE_SECONDS,
+        now,
+    )
+    return [getattr(calendar_state, owner_column.key) for calendar_state in leased]
+
+
+def record_refresh_outcomes(
+    db: Session,
+    calendars: dict[int, m_calendar.CalendarNative | m_calendar.CalendarCustom],
+    outcomes: dict[int, RefreshOutcome],
+    now: datetime.datetime | None = None,
+):
+    """Function to record the fetch outcomes of calendars (of one type) and to schedule their next refresh.
+    Stable calendars back off, changing ones and ones with an upcoming exam are refreshed more often."""
+    if not outcomes:
+        return
+    now = now or datetime.datetime.now()
+    state = m_calendar.CalendarRefreshState
+    if isinstance(next(iter(calendars.values())), m_calendar.CalendarNative):
+        owner_column, event_owner_column = state.native_calendar_id, m_calendar.CalendarEvent.native_calendar_id
+    else:
+        owner_column, event_owner_column = state.custom_calendar_id, m_calendar.CalendarEvent.custom_calendar_id
+
+    calendar_ids = list(outcomes)
+    states = {getattr(row, owner_column.key): row for row in db.query(state).filter(owner_column.in_(calendar_ids))}
+    exam_calendars = get_exam_calendar_ids(db, event_owner_column, calendar_ids, now)
+
+    for calendar_id, outcome in outcomes.items():
+        calendar_state = states.get(calendar_id)
+        if calendar_state is None:
+            calendar_state = state(**{owner_column.key: calendar_id}, fetch_count=0, change_count=0, failure_count=0)
+            db.add(calendar_state)
+
+        # Custom calendars are never refreshed more often than their owner configured (minutes)
+        calendar = calendars[calendar_id]
+        min_interval = REFRESH_MIN_SECONDS
+        if isinstance(calendar, m_calendar.CalendarCustom):
+            min_interval = calendar.refresh_interval * 60
+
+        calendar_state.refresh_interval = next_refresh_interval(
+            calendar_state.refresh_interval, outcome, calendar_id in exam_calendars, min_interval
+        )
+        calendar_state.next_due = now + datetime.timedelta(seconds=calendar_state.refresh_interval)
+        calendar_state.last_fetched = now
+        calendar_state.fetch_count += 1
+        release_lease(calendar_state)  # Written with the result (other workers see the new next_due)
+        if outcome.failed:
+            calendar_state.failure_count += 1
+            continue
+        if outcome.changed:
+            calendar_state.last_changed = now
+            calendar_state.change_count += 1
+        calendar_state.last_latency_ms = int(outcome.elapsed * 1000) if outcome.elapsed is not None else None
+        calendar_state.last_bytes = outcome.bytes
+
+
+def publish_calendar_hashes(kind: str, calendar_hashes: dict[int, str]):
+    """Function to notify the subscribers of changed calendars (kind: "native"/"custom", call after the commit)."""
+    for calendar_id, calendar_hash in calendar_hashes.items():
+        publish(calendar_channel(kind, calendar_id), {"hash": calendar_hash})
+
+
 def update_calendars(
     db: Session, progress, task_id, calendars: set[m_calendar.CalendarNative], calendar_wrapper: CalendarWrapper
 ):
     """Helper function to update the provided set of calendars."""
     progress.update(task_id, total=len(calendars), refresh=True)
-    for calendar in calendars:
-        progress.update(
-            task_id,
-            description=f"[bold green]Native-Calendar[/bold green] Update {calendar_wrapper.get_type()} - {calendar.course_name}",
-        )
-        # Fetch new calendar data and if new data is available and different from current data, update the calendar
-        calendar_data = calendar_wrapper.get_data(calendar.source)
-        if calendar_data and calendar_data.get("hash") != calendar.hash:
-            calendar.data = calendar_data.get("data")
-            calendar.hash = calendar_data.get("hash")
-            db.add(calendar)  # Stage the changes to be committed later
+    progress.update(
+        task_id,
+        description=f"[bold green]Native-Calendar[/bold green] Fetching {calendar_wrapper.get_type()} ({len(calendars)} calendars)",
+    )
+
+    # Fetch all calendars concurrently (keyed by id), then apply the results
+    calendars_by_id = {calendar.calendar_native_id: calendar for calendar in calendars}
+    calendar_results, _ = calendar_wrapper.get_data(
+        {calendar_id: calendar.source for calendar_id, calendar in calendars_by_id.items()},
+        {calendar_id: get_source_validators(calendar) for calendar_id, calendar in calendars_by_id.items()},
+    )
+
+    changed_calendars = {}  # calendar_native_id -> new hash
+    outcomes = {}
+    for calendar_id, calendar_data in calendar_results.items():
+        # If new data is available and different from current data, update the calendar
+        changed = apply_calendar_data(db, calendars_by_id[calendar_id], calendar_data)
+        if changed:
+            changed_calendars[calendar_id] = calendars_by_id[calendar_id].hash
+        outcomes[calendar_id] = fetch_outcome(calendar_data, changed, calendar_wrapper.fetch_stats.get(calendar_id))
         progress.update(task_id, advance=1)
+    record_refresh_outcomes(db, calendars_by_id, outcomes)
     db.commit()
+    calendar_response_cache.invalidate(*changed_calendars)  # Only after the commit (no refill with old data)
+    publish_calendar_hashes("native", changed_calendars)
 
     # Final update to indicate the task is done
     progress.update(
@@ -68,6 +539,18 @@ def update_calendars(
 # ======================================================== #
 
 
+def migrateCalendarTables(db: Session):
+    """Function to migrate the calendar tables of an older deployment (new columns, compressed data)"""
+    for model in (m_calendar.CalendarNative, m_calendar.CalendarCustom):
+        added_columns = add_missing_columns(db, model)
+        if added_columns:
+            print(f"Added {', '.join(added_columns)} to {model.__tablename__}")
+
+        compressed_rows = compress_json_column(db, model.__table__.columns.data)
+        if compressed_rows:
+            print(f"Compressed the data of {compressed_rows} rows of {model.__tablename__}")
+
+
 def prepareCalendarTables(db: Session):
     """Function to prepare calendar tables by adding initial data"""
     backends = ["Rapla", "iCalendar"]
@@ -108,6 +591,31 @@ def prepareCalendarTables(db: Session):
                 address_id=university_address.address_id if university_address else None,
             )
         )
+
+    # Custom calendars created before the ICS feed have no feed token yet
+    for calendar_custom_id in db.scalars(
+        select(m_calendar.CalendarCustom.calendar_custom_id).where(m_calendar.CalendarCustom.feed_token.is_(None))
+    ).all():
+        db.execute(
+            update(m_calendar.CalendarCustom)
+            .where(m_calendar.CalendarCustom.calendar_custom_id == calendar_custom_id)
+            .values(feed_token=uuid.uuid4(), last_modified=m_calendar.CalendarCustom.last_modified)
+        )
+    db.commit()
+    calendar_catalog_cache.invalidate()
+
+
+def prepareCalendarEvents(db: Session):
+    """Function to fill the calendar_events table for calendars that have no events yet (e.g. after an upgrade)"""
+    for calendar_model, owner_column, id_column in [
+        (m_calendar.CalendarNative, m_calendar.CalendarEvent.native_calendar_id, "calendar_native_id"),
+        (m_calendar.CalendarCustom, m_calendar.CalendarEvent.custom_calendar_id, "calendar_custom_id"),
+    ]:
+        calendars = (
+            db.query(calendar_model).filter(~exists().where(owner_column == getattr(calendar_model, id_column))).all()
+        )
+        for calendar in calendars:
+            sync_calendar_events(db, calendar, calendar.data)
     db.commit()
 
 
@@ -116,57 +624,109 @@ def prepareCalendarTables(db: Session):
 # ======================================================== #
 
 
-def update_user_linked_calendars(db: Session, progress, task_id):
-    """Update calendars linked to user accounts."""
-    query_options = [
-        defer(m_calendar.CalendarNative.data),  # Defer loading of large 'data' field to optimize query performance
-    ]
+def update_user_linked_calendars(db: Session):
+    """Queue the due calendars linked to user accounts (fetched by process_native_refresh_queue)."""
     try:
-        calendar_wrapper = CalendarWrapper("iCalendar", "dhbw-mannheim")
-
-        # Query calendars linked to user accounts from the DHBW Mannheim university
-        user_calendars: set[m_calendar.CalendarNative] = set(
-            db.query(m_calendar.CalendarNative)
+        # Query the due calendars linked to user accounts from the DHBW Mannheim university
+        user_calendar_ids = only_due_calendars(
+            db.query(m_calendar.CalendarNative.calendar_native_id)
             .join(
                 m_calendar.UserCalendar,
                 m_calendar.UserCalendar.native_calendar_id == m_calendar.CalendarNative.calendar_native_id,
             )
             .join(m_calendar.University)
-            .filter(m_calendar.University.university_name == "Duale Hochschule Baden-Wuerttemberg Mannheim")
-            .options(*query_options)
-            .all()
+            .filter(m_calendar.University.university_name == "Duale Hochschule Baden-Wuerttemberg Mannheim"),
+            m_calendar.CalendarNative,
+            datetime.datetime.now(),
         )
+        native_refresh_queue.enqueue([calendar_id for (calendar_id,) in user_calendar_ids], PRIORITY_LINKED)
 
-        # Update the queried calendars using the helper function
-        update_calendars(db, progress, task_id, user_calendars, calendar_wrapper)
+    except Exception as e:
+        print(e)
+
+
+def flush_guest_accesses(db: Session) -> int:
+    """Function to write the guest accesses collected by the access tracker in one UPDATE.
+    Returns the number of written calendars."""
+    accesses = guest_access_tracker.drain()
+    if not accesses:
+        return 0
+
+    last_accessed = case(accesses, value=m_calendar.CalendarNative.calendar_native_id)
+    try:
+        # * Only newer times are written (another worker may have written a later access already)
+        db.execute(
+            update(m_calendar.CalendarNative)
+            .where(
+                m_calendar.CalendarNative.calendar_native_id.in_(accesses),
+                or_(
+                    m_calendar.CalendarNative.guest_last_accessed.is_(None),
+                    m_calendar.CalendarNative.guest_last_accessed < last_accessed,
+                ),
+            )
+            .values(
+                guest_last_accessed=last_accessed,
+                last_modified=m_calendar.CalendarNative.last_modified,  # An access is not a modification
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        guest_access_tracker.restore(accesses)  # Try again with the next flush
+        print(f"[ERROR] Could not write guest accesses! ({e})")
+        return 0
+    return len(accesses)
+
+
+def update_guest_accessed_calendars(db: Session):
+    """Queue the due calendars accessed by guests in the last 15 minutes (fetched by process_native_refresh_queue)."""
+    try:
+        flush_guest_accesses(db)  # Include the accesses that were not written yet
+
+        # Query the due calendars accessed by guests in the last 15 minutes
+        now = datetime.datetime.now()
+        time_threshold = now - datetime.timedelta(minutes=15)
+        guest_calendar_ids = only_due_calendars(
+            db.query(m_calendar.CalendarNative.calendar_native_id)
+            .join(m_calendar.University)
+            .filter(m_calendar.University.university_name == "Duale Hochschule Baden-Wuerttemberg Mannheim")
+            .filter(m_calendar.CalendarNative.guest_last_accessed >= time_threshold),
+            m_calendar.CalendarNative,
+            now,
+        )
+        native_refresh_queue.enqueue([calendar_id for (calendar_id,) in guest_calendar_ids], PRIORITY_GUEST)
 
     except Exception as e:
-        # Handle any exceptions by updating the progress bar and logging the error
-        progress.update(task_id, description=f"[bold red]Error[/bold red]", visible=True)
         print(e)
 
 
-def update_guest_accessed_calendars(db: Session, progress, task_id):
-    """Update calendars accessed by guests in the last 15 minutes."""
+def process_native_refresh_queue(db: Session, progress, task_id):
+    """Fetch the queued native calendars (the only consumer of the refresh queue of this worker).
+    Calendars that were refreshed within their refresh interval (not due) or are leased by another worker
+    are skipped."""
     query_options = [
         defer(m_calendar.CalendarNative.data),  # Defer loading of large 'data' field to optimize query performance
     ]
     try:
-        calendar_wrapper = CalendarWrapper("iCalendar", "dhbw-mannheim")
+        calendar_ids = native_refresh_queue.drain(REFRESH_QUEUE_BATCH)
+        if not calendar_ids:
+            progress.update(task_id, description=f"[bold green]Native-Queue[/bold green] Empty", visible=True)
+            return
+
+        # Only the due calendars that are not fetched by another worker (lease)
+        leased_ids = claim_calendar_refreshes(db, m_calendar.CalendarNative, calendar_ids)
 
-        # Query calendars accessed by guests in the last 15 minutes
-        time_threshold = datetime.datetime.now() - datetime.timedelta(minutes=15)
-        guest_calendars = set(
+        calendar_wrapper = CalendarWrapper("iCalendar", "dhbw-mannheim")
+        due_calendars = set(
             db.query(m_calendar.CalendarNative)
-            .join(m_calendar.University)
-            .filter(m_calendar.University.university_name == "Duale Hochschule Baden-Wuerttemberg Mannheim")
-            .filter(m_calendar.CalendarNative.guest_last_accessed >= time_threshold)
+            .filter(m_calendar.CalendarNative.calendar_native_id.in_(leased_ids))
             .options(*query_options)
             .all()
         )
 
-        # Update the queried calendars using the helper function
-        update_calendars(db, progress, task_id, guest_calendars, calendar_wrapper)
+        # Update the queued calendars using the helper function
+        update_calendars(db, progress, task_id, due_calendars, calendar_wrapper)
 
     except Exception as e:
         # Handle any exceptions by updating the progress bar and logging the error
@@ -175,10 +735,8 @@ def update_guest_accessed_calendars(db: Session, progress, task_id):
 
 
 def update_all_native_calendars(db: Session, progress, task_id: int):
-    """Function to update all native calendars."""
-    query_options = [
-        defer(m_calendar.CalendarNative.data),  # Defer loading of large 'data' field to optimize query performance
-    ]
+    """Function to sync the native calendars with the available sources.
+    New calendars are fetched and added, existing ones are queued with the lowest priority (catalog sweep)."""
     try:
         calendar_wrapper = CalendarWrapper(
             "iCalendar", "dhbw-mannheim"
@@ -192,51 +750,63 @@ def update_all_native_calendars(db: Session, progress, task_id: int):
             .first()
         )
 
-        # Query all native calendars associated with DHBW Mannheim
-        dhbw_calendars = (
-            db.query(m_calendar.CalendarNative)
-            .filter(m_calendar.CalendarNative.university_id == dhbw_mannheim.university_id)
-            .options(*query_options)
-            .all()
-        )
-
-        dhbw_available_sources = (
-            nativ_sources.get_source_dhbw_ma()
-        )  # Get the currently available sources for DHBW Mannheim
-
-        progress.update(task_id, total=len(dhbw_available_sources), refresh=True)
-
-        # Process each existing DHBW calendar
-        for dhbw_calendar in dhbw_calendars:
+        # Query the course name and source of all native calendars associated with DHBW Mannheim (no ORM objects)
+        dhbw_calendars = {
+            calendar_id: (course_name, source)
+            for calendar_id, course_name, source in db.query(
+                m_calendar.CalendarNative.calendar_native_id,
+                m_calendar.CalendarNative.course_name,
+                m_calendar.CalendarNative.source,
+            ).filter(m_calendar.CalendarNative.university_id == dhbw_mannheim.university_id)
+        }
+
+        # Get the currently available sources for DHBW Mannheim (conditional request, cached catalog)
+        dhbw_catalog = nativ_sources.get_catalog_dhbw_ma()
+        if not dhbw_catalog.sources:
+            print("[ERROR] DHBW Mannheim source catalog is empty! Calendars are not synced.")
+            return
+
+        # Unchanged catalog and a calendar for every course -> nothing to reconcile, only the catalog sweep
+        # (a calendar that could not be added last time is missing from the count and is retried below)
+        if not dhbw_catalog.changed and len(dhbw_calendars) == len(dhbw_catalog.sources):
+            native_refresh_queue.enqueue(list(dhbw_calendars), PRIORITY_SWEEP)
             progress.update(
                 task_id,
-                description=f"[bold green]Native-Calendar[/bold green] Update DHBW-Mannheim - {dhbw_calendar.course_name}",
+                description=f"[bold green]Native-Calendar-DHBWMannheim[/bold green] Done! (catalog unchanged)",
+                visible=True,
+                refresh=True,
             )
-            # If the source is no longer available, delete the calendar entry
-            if dhbw_calendar.source not in dhbw_available_sources.values():
-                print("Deleting", dhbw_calendar.course_name)
-                db.delete(dhbw_calendar)
-                continue
-            else:
-                dhbw_available_sources.pop(
-                    dhbw_calendar.course_name, None
-                )  # Remove the processed source from available sources
-
-            # Fetch and update calendar data if it has changed
-            calendar_data = calendar_wrapper.get_data(dhbw_calendar.source)
-            if calendar_data and calendar_data.get("hash") != dhbw_calendar.hash:
-                dhbw_calendar.data = calendar_data.get("data")
-                dhbw_calendar.hash = calendar_data.get("hash")
-                db.add(dhbw_calendar)  # Stage the updated calendar for commit
-            progress.update(task_id, advance=1)
+            return
+        dhbw_available_sources = dict(dhbw_catalog.sources)
+
+        # Sort existing DHBW calendars into calendars to delete and calendars to update (set based, linear time)
+        deleted_calendars, calendars_to_update, dhbw_available_sources = nativ_sources.reconcile_sources(
+            dhbw_calendars, dhbw_available_sources
+        )
+        catalog_changed = False  # Calendars were added -> the catalog has to be rebuilt
+        if deleted_calendars:
+            print("Deleting", ", ".join(dhbw_calendars[calendar_id][0] for calendar_id in deleted_calendars))
+            db.query(m_calendar.CalendarNative).filter(
+                m_calendar.CalendarNative.calendar_native_id.in_(deleted_calendars)
+            ).delete(synchronize_session=False)
+
+        # Fetch only the new calendars here (existing ones are fetched by the refresh queue)
+        progress.update(task_id, total=len(dhbw_available_sources), refresh=True)
+        progress.update(
+            task_id,
+            description=f"[bold green]Native-Calendar[/bold green] Fetching DHBW-Mannheim ({len(dhbw_available_sources)} new calendars)",
+        )
+        calendar_results, _ = calendar_wrapper.get_data(
+            {("new", name): source for name, source in dhbw_available_sources.items()}
+        )
 
         # Add new calendars for any remaining sources that were not in the existing records
         for name, source in dhbw_available_sources.items():
             progress.update(
                 task_id, description=f"[bold green]Native-Calendar[/bold green] Adding DHBW-Mannheim - {name}"
             )
-            calendar_data = calendar_wrapper.get_data(source)
-            if calendar_data:
+            calendar_data = calendar_results.get(("new", name))
+            if calendar_data and not calendar_data.get("not_modified"):
                 calendar = m_calendar.CalendarNative(
                     university_id=dhbw_mannheim.university_id,
                     course_name=name,
@@ -244,11 +814,25 @@ def update_all_native_calendars(db: Session, progress, task_id: int):
                     source=source,
                     data=calendar_data.get("data"),
                     hash=calendar_data.get("hash"),
+                    **source_validator_columns(calendar_data.get("validators")),
                 )
-                db.add(calendar)  # Stage the new calendar for commit
+                # Another worker may add the same course at the same time (uix_university_id_course_name),
+                # a savepoint per calendar keeps the calendars added by this worker
+                try:
+                    with db.begin_nested():
+                        db.add(calendar)  # Stage the new calendar for commit
+                        db.flush()  # Flush to get the calendar_native_id for the events
+                        sync_calendar_events(db, calendar, calendar.data)
+                    catalog_changed = True
+                except IntegrityError:
+                    print(f"[INFO] Native calendar {name} was added by another worker")
             progress.update(task_id, advance=1)
 
         db.commit()  # Commit all changes to the database in a single transaction
+        native_refresh_queue.enqueue(calendars_to_update, PRIORITY_SWEEP)  # Not due ones are skipped by the queue
+        calendar_response_cache.invalidate(*deleted_calendars)
+        if catalog_changed or deleted_calendars:
+            calendar_catalog_cache.invalidate()
         progress.update(
             task_id,
             description=f"[bold green]Native-Calendar-DHBWMannheim[/bold green] Done!",
@@ -275,41 +859,60 @@ def update_custom_calendars(db: Session, progress, task_id, backend: m_calendar.
     try:
         calendar_wrapper = CalendarWrapper(backend.backend_name)  # Initialize the wrapper for handling calendar data
 
-        # Query all custom calendars associated with the specified backend
+        current_time = datetime.datetime.now()  # Get the current time for refresh interval checks
+
+        # Query only the custom calendars of the backend that are due (adaptive refresh interval)
+        # and lease them, so they are not fetched by another worker at the same time
+        due_calendar_ids = only_due_calendars(
+            db.query(m_calendar.CalendarCustom.calendar_custom_id).filter(
+                m_calendar.CalendarCustom.source_backend_id == backend.calendar_backend_id
+            ),
+            m_calendar.CalendarCustom,
+            current_time,
+        )
+        leased_ids = claim_calendar_refreshes(
+            db, m_calendar.CalendarCustom, [calendar_id for (calendar_id,) in due_calendar_ids], current_time
+        )
         custom_calendars = (
             db.query(m_calendar.CalendarCustom)
-            .filter(m_calendar.CalendarCustom.source_backend_id == backend.calendar_backend_id)
+            .filter(m_calendar.CalendarCustom.calendar_custom_id.in_(leased_ids))
             .options(*query_options)
             .all()
         )
         progress.update(task_id, total=len(custom_calendars), refresh=True)
+        due_calendars = {custom_calendar.calendar_custom_id: custom_calendar for custom_calendar in custom_calendars}
 
-        current_time = datetime.datetime.now()  # Get the current time for refresh interval checks
-
-        for custom_calendar in custom_calendars:
-            # Skip calendars that don't need updating based on their refresh interval
-            if (
-                custom_calendar.last_updated + datetime.timedelta(minutes=custom_calendar.refresh_interval)
-                > current_time
-            ):
-                progress.update(task_id, advance=1)
-                continue
+        progress.update(
+            task_id,
+            description=f"[bold green]Custom-Calendar[/bold green] Fetching {backend.backend_name} ({len(due_calendars)} calendars)",
+        )
 
-            progress.update(
-                task_id,
-                description=f"[bold green]Custom-Calendar[/bold green] Update {backend.backend_name} - {custom_calendar.course_name}",
-            )
+        # Fetch all due calendars concurrently
+        calendar_results, _ = calendar_wrapper.get_data(
+            {calendar_id: custom_calendar.source_url for calendar_id, custom_calendar in due_calendars.items()},
+            {
+                calendar_id: get_source_validators(custom_calendar)
+                for calendar_id, custom_calendar in due_calendars.items()
+            },
+        )
 
-            # Fetch and update calendar if the new data hash differs from the current one
-            calendar_data = calendar_wrapper.get_data(custom_calendar.source_url)
-            if calendar_data and calendar_data.get("hash") != custom_calendar.hash:
-                custom_calendar.data = calendar_data.get("data")
-                custom_calendar.hash = calendar_data.get("hash")
-                db.add(custom_calendar)  # Stage the updated calendar for commit
+        changed_calendars = {}  # calendar_custom_id -> new hash
+        outcomes = {}
+        for calendar_id, custom_calendar in due_calendars.items():
+            # Update calendar if the new data hash differs from the current one
+            calendar_data = calendar_results.get(calendar_id)
+            changed = apply_calendar_data(db, custom_calendar, calendar_data)
+            if changed:
+                changed_calendars[calendar_id] = custom_calendar.hash
+            if calendar_data:
+                custom_calendar.last_updated = current_time
+            outcomes[calendar_id] = fetch_outcome(calendar_data, changed, calendar_wrapper.fetch_stats.get(calendar_id))
 
             progress.update(task_id, advance=1)
+        record_refresh_outcomes(db, due_calendars, outcomes, current_time)
 
         db.commit()  # Commit all changes to the database in a single transaction
+        publish_calendar_hashes("custom", changed_calendars)
 
         # Final update to indicate the task is done
         progress.update(
@@ -425,6 +1028,7 @@ def add_custom_calendar_to_user(db: Session, user_id: int, new_custom_calendar:
                 source_url=new_custom_calendar.source_url,
                 data=custom_calendar_data.get("data"),
                 hash=custom_calendar_data.get("hash"),
+                **source_validator_columns(custom_calendar_data.get("validators")),
                 refresh_interval=15,  # TODO: Implement refresh interval (out of scope for now)
                 last_updated=datetime.datetime.now(),
                 verified=False,
@@ -432,6 +1036,7 @@ def add_custom_calendar_to_user(db: Session, user_id: int, new_custom_calendar:
             )
             db.add(custom_calendar)  # Stage the new UserCalendar entry for commit
             db.flush()  # Flush changes to the database to get the custom_calendar ready for immediate use
+            sync_calendar_events(db, custom_calendar, custom_calendar.data)
 
         # Add custom calendar to user
         add_update_user_calendar(db, user_id, custom_calendar_id=custom_calendar.calendar_custom_id)
@@ -448,6 +1053,32 @@ def add_custom_calendar_to_user(db: Session, user_id: int, new_custom_calendar:
 # ======================================================== #
 
 
+def build_calendar_catalog(db: Session) -> dict[uuid.UUID, bytes]:
+    """Function to build the encoded catalog entry (ResAvailableNativeCalendars) of every university."""
+    courses = (
+        db.query(
+            m_calendar.University.university_uuid,
+            m_calendar.University.university_name,
+            m_calendar.CalendarNative.course_name,
+        )
+        .join(m_calendar.University)
+        .order_by(m_calendar.University.university_id, m_calendar.CalendarNative.calendar_native_id)
+    )
+
+    universities = {}
+    for university_uuid, university_name, course_name in courses:
+        universities.setdefault(university_uuid, (university_name, []))[1].append(course_name)
+
+    return {
+        university_uuid: s_calendar.ResAvailableNativeCalendars(
+            university_name=university_name, university_uuid=university_uuid, course_names=course_names
+        )
+        .model_dump_json()
+        .encode("utf-8")
+        for university_uuid, (university_name, course_names) in universities.items()
+    }
+
+
 def get_calendar(
     db: Session, user_id: int, with_university: bool = False, with_data: bool = False
 ) -> m_calendar.CalendarCustom | m_calendar.CalendarNative | None:
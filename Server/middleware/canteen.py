@@ -1,14 +1,23 @@
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+import hashlib
 import json
 
 
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.canteen import CANTEEN_WEEKS, CANTEEN_FRESH_SECONDS, CANTEEN_LEASE_SECONDS
+
 # ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
 from utils.canteen.canteen_scraper import fetch_menu
+from utils.notifications.pubsub import publish, canteen_channel
 
 # ~~~~~~~~~~~~~~~ Middleware ~~~~~~~~~~~~~~ #
-from middleware.general import create_address
+from middleware.general import create_address, add_missing_columns
+from middleware.http_cache import make_etag
+from middleware.lease import claim_leases, release_lease
 
 # ~~~~~~~~~~~~~~~~~ Models ~~~~~~~~~~~~~~~~ #
 from models.sql_models import m_canteen, m_general
@@ -21,6 +30,17 @@ from models.pydantic_schemas import s_general
 # ======================================================== #
 # ======================== Update ======================== #
 # ======================================================== #
+def migrateCanteenTables(db: Session):
+    """function to add the columns of the canteen tables that are missing in an older deployment
+
+    Args:
+        db (Session): database session
+    """
+    added_columns = add_missing_columns(db, m_canteen.Canteen)
+    if added_columns:
+        print(f"Added {', '.join(added_columns)} to {m_canteen.Canteen.__tablename__}")
+
+
 def create_canteens(db: Session):
     """function to add all canteens included in the canteen_addresses.json file to the database
 
@@ -58,6 +78,8 @@ def create_canteens(db: Session):
 
 def update_canteen_menus(db: Session, progress, task_id, week_offset: int = 0):
     """This function updates the menu for all canteens in the database. This function is used by the repeated update task.
+    Every canteen week is leased to one worker (see middleware/lease), so several workers share the canteens and a
+    week that was refreshed recently (by any worker) is not fetched again.
 
     Args:
         db (Session): database session
@@ -66,28 +88,82 @@ def update_canteen_menus(db: Session, progress, task_id, week_offset: int = 0):
         week_offset (int, optional): offset by x weeks to the future. maximum value = 3. Defaults to 0.
     """
     try:
-        # get all canteens
-        canteens = db.query(m_canteen.Canteen).all()
+        now = datetime.now()
+        weeks = range(week_offset, CANTEEN_WEEKS)
+        canteen_ids = [canteen_id for (canteen_id,) in db.query(m_canteen.Canteen.canteen_id)]
+
+        # Every canteen week gets a refresh state, so there is a row to lock
+        state = m_canteen.CanteenRefreshState
+        existing = set(db.query(state.canteen_id, state.week_offset).filter(state.week_offset.in_(weeks)))
+        missing = [
+            {"canteen_id": canteen_id, "week_offset": week}
+            for canteen_id in canteen_ids
+            for week in weeks
+            if (canteen_id, week) not in existing
+        ]
+        if missing:
+            try:
+                db.execute(insert(state), missing)
+                db.commit()
+            except IntegrityError:
+                db.rollback()  # Another worker created them at the same time
+
+        # Lease the weeks that were not refreshed recently and are not fetched by another worker
+        fresh_since = now - timedelta(seconds=CANTEEN_FRESH_SECONDS)
+        canteen_weeks = claim_leases(
+            db,
+            db.query(state)
+            .filter(state.week_offset.in_(weeks))
+            .filter(or_(state.last_refreshed.is_(None), state.last_refreshed < fresh_since))
+            .order_by(state.week_offset, state.canteen_id),
+            state,
+            CANTEEN_LEASE_SECONDS,
+            now,
+        )
+        canteens = {
+            canteen.canteen_id: canteen
+            for canteen in db.query(m_canteen.Canteen).filter(
+                m_canteen.Canteen.canteen_id.in_({canteen_week.canteen_id for canteen_week in canteen_weeks})
+            )
+        }
 
-        # update progress bar and loop through all canteens
-        progress.update(task_id, total=(len(canteens) * (3 - week_offset)))
-        for canteen_obj in canteens:
-            # for each canteen update the menu for the next 3 weeks
-            for week in range(week_offset, 3):
-                progress.update(
-                    task_id,
-                    description=f"[bold green]Canteen[/bold green] Update {canteen_obj.canteen_name} - Week {week}",
+        # update progress bar and loop through the leased canteen weeks
+        progress.update(task_id, total=len(canteen_weeks))
+        for canteen_week in canteen_weeks:
+            progress.update(
+                task_id,
+                description=f"[bold green]Canteen[/bold green] Update {canteen_week_label(canteens, canteen_week)}",
+            )
+            # add canteen menu to database (a failing week is rolled back alone, the other weeks are kept)
+            savepoint = db.begin_nested()
+            try:
+                refreshed = canteen_menu_to_db(
+                    db=db, canteen_id=canteen_week.canteen_id, week_offset=canteen_week.week_offset
                 )
-                # add canteen menu to database
-                canteen_menu_to_db(db=db, canteen_id=canteen_obj.canteen_id, week_offset=week)
-                db.flush()
-                progress.update(task_id, advance=1)
+                savepoint.commit()
+            except Exception as e:  # e.g. CircuitOpen or a connection error of the canteen website
+                savepoint.rollback()
+                refreshed = False
+                print(f"[ERROR] Menu update of {canteen_week_label(canteens, canteen_week)} failed! ({e})")
+            if refreshed:
+                canteen_week.last_refreshed = now
+            release_lease(canteen_week)  # A failed week is fetched again by the next run
+            db.flush()
+            progress.update(task_id, advance=1)
+        changed_menus = update_menu_hashes(db)
         db.commit()
+        publish_menu_hashes(changed_menus)
     except Exception as e:
         print(e)
         db.rollback()
 
 
+def canteen_week_label(canteens: dict, canteen_week: m_canteen.CanteenRefreshState) -> str:
+    """Function to get the progress label of a canteen week ("<canteen name> - Week <offset>")."""
+    canteen = canteens.get(canteen_week.canteen_id)
+    return f"{canteen.canteen_name if canteen else canteen_week.canteen_id} - Week {canteen_week.week_offset}"
+
+
 def clean_canteen_menus(db: Session):
     """This function deletes all menu items that are older than the current date.
 
@@ -105,12 +181,54 @@ def clean_canteen_menus(db: Session):
             # check if menu item is older than current date
             if menu_item.serving_date < datetime.now():
                 db.delete(menu_item)
+        db.flush()
+        changed_menus = update_menu_hashes(db)
         db.commit()
+        publish_menu_hashes(changed_menus)
     except Exception as e:
         print(e)
         db.rollback()
 
 
+def update_menu_hashes(db: Session) -> dict:
+    """Function to recalculate the menu_hash of all canteens (after menus or dish prices have changed).
+
+    Args:
+        db (Session): database session
+
+    Returns:
+        dict: canteens whose menu_hash has changed (canteen_short_name -> {"hash": ..., "menu_hash": ...})
+    """
+    columns = [m_canteen.Menu.canteen_id, m_canteen.Menu.serving_date, m_canteen.Menu.dish_type]
+    menu_items = (
+        db.query(*columns, m_canteen.Dish).join(m_canteen.Dish).order_by(*columns, m_canteen.Dish.dish_id).all()
+    )
+
+    menu_hashes = {}
+    for canteen_id, serving_date, dish_type, dish in menu_items:
+        menu_hash = menu_hashes.setdefault(canteen_id, hashlib.sha1())
+        menu_hash.update(f"{serving_date.isoformat()}|{dish_type}|{dish.description}|{dish.price};".encode())
+
+    changed_menus = {}
+    for canteen in db.query(m_canteen.Canteen).all():
+        menu_hash = menu_hashes.get(canteen.canteen_id)
+        menu_hash = menu_hash.hexdigest() if menu_hash else None
+        if menu_hash != canteen.menu_hash:
+            canteen.menu_hash = menu_hash
+            changed_menus[canteen.canteen_short_name] = {"hash": canteen.hash, "menu_hash": menu_hash}
+    return changed_menus
+
+
+def publish_menu_hashes(changed_menus: dict):
+    """Function to notify the subscribers of canteens whose menu has changed (call after the commit).
+
+    Args:
+        changed_menus (dict): result of update_menu_hashes
+    """
+    for canteen_short_name, message in changed_menus.items():
+        publish(canteen_channel(canteen_short_name), message)
+
+
 # ======================================================== #
 # ======================== Canteen ======================= #
 # ======================================================== #
@@ -500,6 +618,44 @@ def get_menu_for_day(db: Session, day: str) -> list[ResGetCanteenMenuDay]:
     return return_value
 
 
+def get_menu_etag(db: Session, canteen_short_name: str, current_week_only: bool = False) -> str | None:
+    """Get the ETag of the menu of a canteen without loading the menu (None if the canteen does not exist).
+
+    Args:
+        db (Session): Database session.
+        canteen_short_name (str): Short name of the canteen.
+        current_week_only (bool, optional): ETag of the current week's menu. Defaults to False.
+
+    Returns:
+        str | None: Strong ETag of the menu response.
+    """
+    canteen = (
+        db.query(m_canteen.Canteen.hash, m_canteen.Canteen.menu_hash)
+        .filter_by(canteen_short_name=canteen_short_name)
+        .first()
+    )
+    if not canteen:
+        return None
+
+    # The current week's menu changes with the week even if no menu item changed
+    week = datetime.now().isocalendar()[:2] if current_week_only else "all"
+    return make_etag(canteen.hash, canteen.menu_hash, week)
+
+
+def get_menu_day_etag(db: Session, day: str) -> str:
+    """Get the ETag of the menus of all canteens for a given day without loading the menus.
+
+    Args:
+        db (Session): Database session.
+        day (str): The day of the menus.
+
+    Returns:
+        str: Strong ETag of the menu response.
+    """
+    canteens = db.query(m_canteen.Canteen.hash, m_canteen.Canteen.menu_hash).order_by(m_canteen.Canteen.canteen_id)
+    return make_etag(day, *(f"{canteen.hash}:{canteen.menu_hash}" for canteen in canteens))
+
+
 # ======================================================== #
 # ========================= Main ========================= #
 # ======================================================== #
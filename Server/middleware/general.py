@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import union, select
+from sqlalchemy import union, select, update, inspect, text, func, type_coerce, Column, LargeBinary
+from sqlalchemy.schema import CreateColumn
 from operator import xor as xor_
 from functools import reduce
 
@@ -8,6 +9,7 @@ from models.pydantic_schemas import s_general
 
 # ~~~~~~~~~~~~~~~~~ Models ~~~~~~~~~~~~~~~~ #
 from models.sql_models import m_general, m_user, m_calendar, m_canteen
+from models.sql_models.compressed_json import CompressedPayload, PAYLOAD_VERSION_GZIP
 
 ###########################################################################
 ########################## Basic logic functions ##########################
@@ -165,3 +167,75 @@ def clean_address(db: Session) -> int:
     )
     db.commit()
     return delete_count
+
+
+###########################################################################
+############################# Schema migration ############################
+###########################################################################
+
+# create_all only creates missing tables, it never alters an existing one.
+# These functions bring the tables of an older deployment to the columns of the models (idempotent, run on startup).
+
+
+# Function to add the columns of a model that are missing in its table. Returns the names of the added columns
+def add_missing_columns(db: Session, model) -> list[str]:
+    table = model.__table__
+    connection = db.connection()
+    quote = connection.dialect.identifier_preparer.quote
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        if not column.nullable:
+            print(f"[ERROR] Column {table.name}.{column.name} is not nullable and can't be added! Skipping...")
+            continue
+
+        column_ddl = CreateColumn(column).compile(dialect=connection.dialect)
+        db.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {column_ddl}"))
+        if column.unique:
+            index_name = quote(f"uq_{table.name}_{column.name}")
+            db.execute(text(f"CREATE UNIQUE INDEX {index_name} ON {quote(table.name)} ({quote(column.name)})"))
+        added.append(column.name)
+    db.commit()
+    return added
+
+
+# Function to convert a JSON column of an older table to its CompressedJSON type and compress the stored rows.
+# Returns the number of compressed rows
+def compress_json_column(db: Session, column: Column) -> int:
+    table = column.table
+    connection = db.connection()
+    quote = connection.dialect.identifier_preparer.quote
+
+    # JSON (LONGTEXT) -> LONGBLOB
+    reflected = {item["name"]: item for item in inspect(connection).get_columns(table.name)}[column.name]
+    if connection.dialect.name in ("mysql", "mariadb") and reflected["type"].python_type is not bytes:
+        column_type = column.type.compile(dialect=connection.dialect)
+        db.execute(text(f"ALTER TABLE {quote(table.name)} MODIFY {quote(column.name)} {column_type} NOT NULL"))
+
+        # The JSON type of MariaDB adds CHECK (json_valid(...)), which the compressed bytes would fail.
+        # The check of the column definition is replaced by MODIFY, a check on table level is dropped here
+        if connection.dialect.name == "mariadb":
+            constraints = db.scalars(
+                text(
+                    "SELECT CONSTRAINT_NAME FROM information_schema.CHECK_CONSTRAINTS "
+                    "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = :table AND CHECK_CLAUSE LIKE :clause"
+                ),
+                {"table": table.name, "clause": f"%json_valid(`{column.name}`)%"},
+            ).all()
+            for constraint in constraints:
+                db.execute(text(f"ALTER TABLE {quote(table.name)} DROP CONSTRAINT {quote(constraint)}"))
+
+    # Rows written before the codec are plain JSON (no version byte)
+    stored = type_coerce(column, LargeBinary)
+    primary_key = table.primary_key.columns[0]
+    legacy_ids = db.scalars(select(primary_key).where(func.substr(stored, 1, 1) != PAYLOAD_VERSION_GZIP)).all()
+    for row_id in legacy_ids:
+        values = {column.key: CompressedPayload(db.scalar(select(stored).where(primary_key == row_id)))}
+        if "last_modified" in table.columns:
+            values["last_modified"] = table.columns.last_modified  # The data did not change
+        db.execute(update(table).where(primary_key == row_id).values(values))
+    db.commit()
+    return len(legacy_ids)
@@ -0,0 +1,53 @@
+from fastapi import Response
+import hashlib
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.network import HTTP_CACHE_CONTROL_PUBLIC, HTTP_CACHE_CONTROL_PRIVATE
+
+###########################################################################
+############################# Helper Functions ############################
+###########################################################################
+
+
+def make_etag(content_hash: str, *variant, gzip_encoded: bool = False) -> str:
+    """Function to build a strong ETag from a content hash (variant: e.g. the time window of the response).
+    A gzip encoded body is another representation (other bytes) and gets its own ETag ("-gz" suffix)."""
+    if variant:
+        content_hash = hashlib.sha1("|".join([content_hash, *map(str, variant)]).encode("utf-8")).hexdigest()
+    return f'"{content_hash}-gz"' if gzip_encoded else f'"{content_hash}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Function to check an If-None-Match header against an ETag (weak comparison as required for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return etag in (candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates)
+
+
+def cache_headers(etag: str, private: bool = False, vary: str | None = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": HTTP_CACHE_CONTROL_PRIVATE if private else HTTP_CACHE_CONTROL_PUBLIC}
+    if vary:
+        headers["Vary"] = vary
+    return headers
+
+
+def set_cache_headers(response: Response, etag: str, private: bool = False, vary: str | None = None) -> Response:
+    """Function to add ETag and Cache-Control (and Vary) to a response."""
+    response.headers.update(cache_headers(etag, private, vary))
+    return response
+
+
+def not_modified(etag: str, private: bool = False, vary: str | None = None) -> Response:
+    """Function to answer a conditional request whose ETag still matches (no body).
+    vary: request headers that select the representation (e.g. "Accept-Encoding" for gzip encoded bodies)."""
+    return Response(status_code=304, headers=cache_headers(etag, private, vary))
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# etag = make_etag(calendar.hash)  # make_etag(calendar.hash, gzip_encoded=True) for the gzip body
+# if etag_matches(request.headers.get("if-none-match"), etag):
+#     return not_modified(etag)
+# return set_cache_headers(Response(content=body, media_type="application/json"), etag)
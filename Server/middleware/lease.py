@@ -0,0 +1,37 @@
+from sqlalchemy.orm import Session, Query
+from sqlalchemy import or_
+import datetime
+import socket
+import os
+
+# Leases distribute the refresh work between several API processes (uvicorn workers / replicas).
+# Every process runs its own TaskScheduler, but a calendar or canteen week is only fetched by the worker that
+# holds its lease. A crashed worker does not block the work - its leases expire and are taken by another worker.
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"[:64]  # * Owner of the leases taken by this process
+
+
+def claim_leases(db: Session, query: Query, model, lease_seconds: int, now: datetime.datetime = None) -> list:
+    """Function to lease the rows of query that are free (no lease or an expired one) to this worker.
+
+    Rows that another worker is claiming at the same time are skipped (SELECT ... FOR UPDATE SKIP LOCKED).
+    The leases are committed immediately, so other workers see them while this worker does the (slow) work.
+    Returns the leased rows."""
+    now = now or datetime.datetime.now()
+    rows = (
+        query.filter(or_(model.lease_expires.is_(None), model.lease_expires <= now))
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    expires = now + datetime.timedelta(seconds=lease_seconds)
+    for row in rows:
+        row.lease_owner = WORKER_ID
+        row.lease_expires = expires
+    db.commit()
+    return rows
+
+
+def release_lease(row):
+    """Function to release the lease of a row (written with the result of the work)."""
+    row.lease_owner = None
+    row.lease_expires = None
@@ -82,3 +82,18 @@ class ResCalendar(BaseModel):
     data: dict
     hash: str
     last_modified: datetime
+
+
+class CalendarChanges(BaseModel):
+    added: List[dict]  # Events with their "key"
+    changed: List[dict]
+    removed: List[dict]
+
+
+class ResCalendarDelta(BaseModel):
+    base_hash: str
+    hash: str
+    full: bool  # True if base_hash is unknown or expired -> data contains the full calendar instead of changes
+    changes: Optional[CalendarChanges] = None
+    data: Optional[dict] = None
+    last_modified: datetime
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+# ======================================================== #
+# ======================= Upstream ======================= #
+# ======================================================== #
+class ResUpstreamState(BaseModel):
+    # Circuit breaker state of an upstream host (closed = healthy, open = skipped, half_open = probing)
+    host: str
+    state: str
+    consecutive_failures: int
+    total_failures: int
+    total_rejected: int
+    retry_in_seconds: Optional[float] = None
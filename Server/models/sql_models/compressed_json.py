@@ -0,0 +1,120 @@
+from sqlalchemy.types import TypeDecorator, LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator
+import json
+import gzip
+
+# Storage codec for large JSON documents (e.g. the data of a calendar).
+# The document is stored as <version byte><gzip stream> and only decompressed when it is accessed.
+# The gzip stream can be sent unchanged to clients that accept "Content-Encoding: gzip".
+
+PAYLOAD_VERSION_GZIP = b"\x01"
+PAYLOAD_COMPRESSION_LEVEL = 6
+
+
+def canonical_json(data: Dict[str, Any]) -> bytes:
+    """Canonical JSON bytes of a document (the bytes that are hashed, stored and sent)."""
+    return json.dumps(data, sort_keys=True).encode("utf-8")
+
+
+def encode_payload(raw: bytes) -> bytes:
+    """Compress the JSON bytes of a document to the stored format."""
+    return PAYLOAD_VERSION_GZIP + gzip.compress(raw, compresslevel=PAYLOAD_COMPRESSION_LEVEL, mtime=0)
+
+
+def decode_payload(stored: bytes) -> bytes:
+    """Get the JSON bytes of a stored document (plain JSON of rows written before the codec is returned as is)."""
+    if stored[:1] == PAYLOAD_VERSION_GZIP:
+        return gzip.decompress(stored[1:])
+    return stored
+
+
+class CompressedPayload(Mapping):
+    """Read-only JSON object that keeps its compressed form and is only decompressed on first access."""
+
+    __slots__ = ("__stored", "__data")
+
+    def __init__(self, stored: bytes, data: Dict[str, Any] = None):
+        self.__stored = stored
+        self.__data = data
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> "CompressedPayload":
+        if isinstance(data, CompressedPayload):
+            return data
+        return cls.from_raw(canonical_json(data), data)
+
+    @classmethod
+    def from_raw(cls, raw: bytes, data: Dict[str, Any] = None) -> "CompressedPayload":
+        """Payload of already serialized JSON bytes (data is the document of the bytes, if already known)."""
+        return cls(encode_payload(raw), data)
+
+    @property
+    def stored(self) -> bytes:
+        """Bytes in the database (version byte + gzip stream)."""
+        if self.__stored[:1] != PAYLOAD_VERSION_GZIP:
+            self.__stored = encode_payload(self.__stored)  # Legacy plain JSON row
+        return self.__stored
+
+    @property
+    def gzip(self) -> bytes:
+        """Gzip stream of the JSON bytes (ready for "Content-Encoding: gzip")."""
+        return self.stored[1:]
+
+    @property
+    def raw(self) -> bytes:
+        """Uncompressed JSON bytes."""
+        return decode_payload(self.__stored)
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        if self.__data is None:
+            self.__data = json.loads(self.raw)
+        return self.__data
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __repr__(self) -> str:
+        return f"CompressedPayload({len(self.__stored)} bytes)"
+
+
+class CompressedJSON(TypeDecorator):
+    """JSON column that is stored compressed (LONGBLOB on MariaDB) and loaded as CompressedPayload."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name in ("mysql", "mariadb"):
+            return dialect.type_descriptor(LONGBLOB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return CompressedPayload.from_data(value).stored
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return CompressedPayload(bytes(value))
+
+    def compare_values(self, x, y):
+        if isinstance(x, CompressedPayload) and isinstance(y, CompressedPayload):
+            return x.stored == y.stored  # * No decompression needed
+        return x == y
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# data = Column(CompressedJSON, nullable=False)
+# calendar.data = {"X-WR-TIMEZONE": "Europe/Berlin", "events": [...]}  -> stored as b"\x01\x1f\x8b..."
+# calendar.data["events"]  -> decompressed on first access
+# Response(calendar.data.gzip, media_type="application/json", headers={"Content-Encoding": "gzip"})
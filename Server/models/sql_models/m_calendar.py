@@ -2,18 +2,21 @@ from sqlalchemy import (
     Column,
     Integer,
     String,
+    Text,
     TIMESTAMP,
+    DateTime,
     BOOLEAN,
     JSON,
     ForeignKey,
     CheckConstraint,
     Uuid,
     UniqueConstraint,
+    Index,
 )
 from config.database import Base
+from models.sql_models.compressed_json import CompressedJSON, CompressedPayload
 from sqlalchemy.orm import validates, relationship
 from sqlalchemy.sql import func
-import json
 import uuid
 import datetime
 
@@ -28,10 +31,19 @@ class CalendarCustom(Base):
     source_backend_id = Column(Integer, ForeignKey("calendar_backend.calendar_backend_id"), nullable=False)
     source_url = Column(String(255), nullable=False, unique=True)
 
-    data = Column(JSON, nullable=False)
+    data = Column(CompressedJSON, nullable=False)  # Stored gzip compressed (see compressed_json)
     hash = Column(String(255), nullable=False)
+    timezone = Column(String(64), nullable=True)  # X-WR-TIMEZONE of data (readable without loading data)
+
+    # Upstream HTTP validators of the last download (used for conditional requests)
+    source_etag = Column(String(255), nullable=True)
+    source_last_modified = Column(String(255), nullable=True)
+    source_content_length = Column(Integer, nullable=True)
+    source_fingerprint = Column(String(32), nullable=True)  # blake2b of the raw payload (see fetch_engine)
 
     refresh_interval = Column(Integer, nullable=False, default=15)  # In minutes
+    # Secret of the public ICS feed (the source URL may be private, so the feed is not reachable by the id)
+    feed_token = Column(Uuid(as_uuid=True), unique=True, nullable=True, default=uuid.uuid4)
     last_updated = Column(TIMESTAMP, nullable=False)
 
     verified = Column(
@@ -46,9 +58,11 @@ class CalendarCustom(Base):
 
     @validates("data")
     def validate_data(self, key, data):
-        if len(json.dumps(data)) > 200 * 1024:  # 200 Kilobytes
+        payload = CompressedPayload.from_data(data)  # * Compressed once, reused when the row is written
+        if len(payload.stored) > 200 * 1024:  # 200 Kilobytes (compressed)
             raise ValueError("Data is too large!")
-        return data
+        self.timezone = payload.get("X-WR-TIMEZONE")
+        return payload
 
     @validates("refresh_interval")
     def validate_refresh_interval(self, key, interval):
@@ -68,8 +82,15 @@ class CalendarNative(Base):
     source_backend_id = Column(Integer, ForeignKey("calendar_backend.calendar_backend_id"), nullable=False)
     source = Column(String(255), nullable=False)
 
-    data = Column(JSON, nullable=False)
+    data = Column(CompressedJSON, nullable=False)  # Stored gzip compressed (see compressed_json)
     hash = Column(String(255), nullable=False)
+    timezone = Column(String(64), nullable=True)  # X-WR-TIMEZONE of data (readable without loading data)
+
+    # Upstream HTTP validators of the last download (used for conditional requests)
+    source_etag = Column(String(255), nullable=True)
+    source_last_modified = Column(String(255), nullable=True)
+    source_content_length = Column(Integer, nullable=True)
+    source_fingerprint = Column(String(32), nullable=True)  # blake2b of the raw payload (see fetch_engine)
 
     last_modified = Column(TIMESTAMP, nullable=False, server_default=func.now(), onupdate=func.current_timestamp())
     guest_last_accessed = Column(TIMESTAMP, nullable=False, default=datetime.datetime(1999, 1, 1))
@@ -79,6 +100,107 @@ class CalendarNative(Base):
 
     __table_args__ = (UniqueConstraint("university_id", "course_name", name="uix_university_id_course_name"),)
 
+    @validates("data")
+    def validate_data(self, key, data):
+        payload = CompressedPayload.from_data(data)
+        self.timezone = payload.get("X-WR-TIMEZONE")
+        return payload
+
+
+class CalendarEvent(Base):
+    __tablename__ = "calendar_events"
+    calendar_event_id = Column(Integer, primary_key=True, index=True)
+
+    custom_calendar_id = Column(
+        Integer, ForeignKey("calendar_custom.calendar_custom_id", ondelete="CASCADE"), nullable=True
+    )
+    native_calendar_id = Column(
+        Integer, ForeignKey("calendar_native.calendar_native_id", ondelete="CASCADE"), nullable=True
+    )
+
+    event_key = Column(String(40), nullable=False)  # Stable identity of the event (see utils/calendar/calendar_events)
+
+    summary = Column(Text, nullable=True)
+    description = Column(JSON, nullable=True)
+    location = Column(Text, nullable=True)
+    event_start = Column(DateTime, nullable=False, index=True)
+    event_end = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        CheckConstraint(
+            "(custom_calendar_id IS NOT NULL AND native_calendar_id IS NULL) OR "
+            "(custom_calendar_id IS NULL AND native_calendar_id IS NOT NULL)",
+            name="chk_one_calendar_id_event",
+        ),
+        UniqueConstraint("custom_calendar_id", "event_key", name="uix_custom_calendar_id_event_key"),
+        UniqueConstraint("native_calendar_id", "event_key", name="uix_native_calendar_id_event_key"),
+        Index("ix_calendar_events_custom_start", "custom_calendar_id", "event_start"),
+        Index("ix_calendar_events_native_start", "native_calendar_id", "event_start"),
+    )
+
+
+class CalendarVersion(Base):
+    __tablename__ = "calendar_versions"
+    calendar_version_id = Column(Integer, primary_key=True, index=True)
+
+    custom_calendar_id = Column(
+        Integer, ForeignKey("calendar_custom.calendar_custom_id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    native_calendar_id = Column(
+        Integer, ForeignKey("calendar_native.calendar_native_id", ondelete="CASCADE"), nullable=True, index=True
+    )
+
+    base_hash = Column(String(255), nullable=False)  # Hash of the calendar before the change
+    hash = Column(String(255), nullable=False)  # Hash of the calendar after the change
+    changes = Column(JSON, nullable=False)  # {"added": [...], "changed": [...], "removed": [...]}
+
+    created = Column(TIMESTAMP, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        CheckConstraint(
+            "(custom_calendar_id IS NOT NULL AND native_calendar_id IS NULL) OR "
+            "(custom_calendar_id IS NULL AND native_calendar_id IS NOT NULL)",
+            name="chk_one_calendar_id_version",
+        ),
+    )
+
+
+class CalendarRefreshState(Base):
+    __tablename__ = "calendar_refresh_state"
+    calendar_refresh_state_id = Column(Integer, primary_key=True, index=True)
+
+    custom_calendar_id = Column(
+        Integer, ForeignKey("calendar_custom.calendar_custom_id", ondelete="CASCADE"), nullable=True, unique=True
+    )
+    native_calendar_id = Column(
+        Integer, ForeignKey("calendar_native.calendar_native_id", ondelete="CASCADE"), nullable=True, unique=True
+    )
+
+    # Adaptive schedule (see utils/calendar/refresh_schedule)
+    refresh_interval = Column(Integer, nullable=False)  # In seconds
+    next_due = Column(TIMESTAMP, nullable=False, index=True)
+
+    # Outcome of the fetches
+    last_fetched = Column(TIMESTAMP, nullable=True)
+    last_changed = Column(TIMESTAMP, nullable=True)
+    last_latency_ms = Column(Integer, nullable=True)
+    last_bytes = Column(Integer, nullable=True)
+    fetch_count = Column(Integer, nullable=False, default=0)
+    change_count = Column(Integer, nullable=False, default=0)
+    failure_count = Column(Integer, nullable=False, default=0)
+
+    # Worker that is fetching the calendar (see middleware/lease) - an expired lease can be taken by another worker
+    lease_owner = Column(String(64), nullable=True)
+    lease_expires = Column(TIMESTAMP, nullable=True, index=True)
+
+    __table_args__ = (
+        CheckConstraint(
+            "(custom_calendar_id IS NOT NULL AND native_calendar_id IS NULL) OR "
+            "(custom_calendar_id IS NULL AND native_calendar_id IS NOT NULL)",
+            name="chk_one_calendar_id_refresh_state",
+        ),
+    )
+
 
 class University(Base):
     __tablename__ = "university"
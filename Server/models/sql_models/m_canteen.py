@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, TIMESTAMP, DateTime
+from sqlalchemy import Column, ForeignKey, Integer, String, TIMESTAMP, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 import hashlib
 
@@ -16,6 +16,7 @@ class Canteen(Base):
     image_url = Column(String(255))
     address_id = Column(Integer, ForeignKey("addresses.address_id"), nullable=False)
     hash = Column(String(255), nullable=False)
+    menu_hash = Column(String(40), nullable=True)  # sha1 over all menu items (ETag of the menu routes)
 
     last_modified = Column(TIMESTAMP, nullable=False)
 
@@ -118,3 +119,20 @@ class Menu(Base):
             "dish_type": self.dish_type,
             "serving_date": self.serving_date,
         }
+
+
+class CanteenRefreshState(Base):
+    __tablename__ = "canteen_refresh_state"
+
+    # One row per canteen and week (unit of work of the menu refresh)
+    canteen_refresh_state_id = Column(Integer, primary_key=True, index=True)
+    canteen_id = Column(Integer, ForeignKey("canteens.canteen_id", ondelete="CASCADE"), nullable=False)
+    week_offset = Column(Integer, nullable=False)
+
+    last_refreshed = Column(TIMESTAMP, nullable=True)
+
+    # Worker that is fetching the week (see middleware/lease) - an expired lease can be taken by another worker
+    lease_owner = Column(String(64), nullable=True)
+    lease_expires = Column(TIMESTAMP, nullable=True, index=True)
+
+    __table_args__ = (UniqueConstraint("canteen_id", "week_offset", name="uix_canteen_id_week_offset"),)
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import datetime
 import uuid
 
 # ~~~~~~~~~~~~~~~ Controller ~~~~~~~~~~~~~~ #
@@ -8,6 +9,10 @@ from controllers.calendar import (
     fetch_available_calendars,
     fetch_calendar_by_university_and_course,
     fetch_calendar_hash,
+    fetch_calendar_delta,
+    fetch_calendar_data,
+    fetch_calendar_feed,
+    fetch_custom_calendar_feed,
 )
 
 # ~~~~~~~~~~~~~~~ Middleware ~~~~~~~~~~~~~~ #
@@ -19,16 +24,72 @@ from models.pydantic_schemas import s_general, s_calendar
 calendar_router = APIRouter()
 
 
+# Optional filter ?university_uuid=... -> only the calendars of that university
 @calendar_router.get("/available_calendars", response_model=List[s_calendar.ResAvailableNativeCalendars])
-def get_available_calendars(db: Session = Depends(get_db)):
-    return fetch_available_calendars(db)
+def get_available_calendars(
+    university_uuid: Optional[uuid.UUID] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    return fetch_available_calendars(db, university_uuid, if_none_match)
 
 
+# ICS feed of a custom calendar for calendar apps (the token is sent by /user/calendar/feed)
+# * Registered before the native feed, otherwise "custom" would be parsed as university UUID
+@calendar_router.get("/custom/{feed_token}/ics", response_class=Response)
+def get_custom_calendar_feed(
+    feed_token: uuid.UUID,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    return fetch_custom_calendar_feed(feed_token, db, if_none_match)
+
+
+# Optional time window (?from=...&to=...) -> only the events overlapping the window
 @calendar_router.get("/{university_uuid}/{course_name}", response_model=s_calendar.ResCalendar)
-def get_calendar(university_uuid: uuid.UUID, course_name: str, db: Session = Depends(get_db)):
-    return fetch_calendar_by_university_and_course(university_uuid, course_name, db)
+def get_calendar(
+    university_uuid: uuid.UUID,
+    course_name: str,
+    start: Optional[datetime.datetime] = Query(None, alias="from"),
+    end: Optional[datetime.datetime] = Query(None, alias="to"),
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    return fetch_calendar_by_university_and_course(
+        university_uuid, course_name, db, start, end, accept_encoding, if_none_match
+    )
 
 
 @calendar_router.get("/{university_uuid}/{course_name}/hash", response_model=s_general.BasicMessage)
 def get_calendar_hash(university_uuid: uuid.UUID, course_name: str, db: Session = Depends(get_db)):
     return fetch_calendar_hash(university_uuid, course_name, db)
+
+
+# Changes since the client's last known hash (full calendar if the hash is unknown or expired)
+@calendar_router.get("/{university_uuid}/{course_name}/delta", response_model=s_calendar.ResCalendarDelta)
+def get_calendar_delta(university_uuid: uuid.UUID, course_name: str, base_hash: str, db: Session = Depends(get_db)):
+    return fetch_calendar_delta(university_uuid, course_name, base_hash, db)
+
+
+# Only the data of the calendar (sent gzip compressed as stored if the client accepts it)
+@calendar_router.get("/{university_uuid}/{course_name}/data", response_class=Response)
+def get_calendar_data(
+    university_uuid: uuid.UUID,
+    course_name: str,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    return fetch_calendar_data(university_uuid, course_name, accept_encoding, db, if_none_match)
+
+
+# ICS feed of the calendar for calendar apps (Google, Apple, ...) - rendered once per calendar hash
+@calendar_router.get("/{university_uuid}/{course_name}/ics", response_class=Response)
+def get_calendar_feed(
+    university_uuid: uuid.UUID,
+    course_name: str,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    return fetch_calendar_feed(university_uuid, course_name, db, if_none_match)
@@ -1,5 +1,5 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, Header, Response
 from sqlalchemy.orm import Session
 
 # ~~~~~~~~~~~~~~~~~ Schemas ~~~~~~~~~~~~~~~~ #
@@ -15,9 +15,9 @@ from models.pydantic_schemas.s_canteen import (
 from models.sql_models import m_canteen
 
 # ~~~~~~~~~~~~~~~ Middleware ~~~~~~~~~~~~~~ #
-from middleware.canteen import get_menu_for_canteen, get_menu_for_day
+from middleware.canteen import get_menu_for_canteen, get_menu_for_day, get_menu_etag, get_menu_day_etag
 from middleware.database import get_db
-
+from middleware.http_cache import etag_matches, not_modified, set_cache_headers
 
 ###########################################################################
 ################################### MAIN ##################################
@@ -59,11 +59,20 @@ def canteen_read_all_details(
 # ======================================================== #
 
 
+# Menu routes send an ETag (304 if the client's copy is still current, the menu is not loaded then)
 @canteen_router.get("/{canteen_short_name}/menu/all", response_model=ResGetCanteenMenu)
 def canteen_read_menu_all(
     canteen_short_name: Annotated[str, "The short name of the canteen to retrieve the menu for."],
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
 ) -> ResGetCanteenMenu:
+    etag = get_menu_etag(db=db, canteen_short_name=canteen_short_name, current_week_only=False)
+    if etag and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    if etag:
+        set_cache_headers(response, etag)
+
     # Retrieve the full menu for a specific canteen
     return get_menu_for_canteen(db=db, canteen_short_name=canteen_short_name, current_week_only=False)
 
@@ -71,8 +80,16 @@ def canteen_read_menu_all(
 @canteen_router.get("/{canteen_short_name}/menu/currentweek", response_model=ResGetCanteenMenu)
 def canteen_read_canteen_menu(
     canteen_short_name: Annotated[str, "The short name of the canteen to retrieve the menu for."],
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
 ) -> ResGetCanteenMenu:
+    etag = get_menu_etag(db=db, canteen_short_name=canteen_short_name, current_week_only=True)
+    if etag and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    if etag:
+        set_cache_headers(response, etag)
+
     # Retrieve the current week's menu for a specific canteen
     return get_menu_for_canteen(db=db, canteen_short_name=canteen_short_name, current_week_only=True)
 
@@ -80,8 +97,15 @@ def canteen_read_canteen_menu(
 @canteen_router.get("/menu/{day}", response_model=list[ResGetCanteenMenuDay])
 def canteen_read_menu_day(
     day: Annotated[str, "The day to retrieve the menu for. (e.g. '2021-10-01')"],
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
 ) -> list[ResGetCanteenMenuDay]:
+    etag = get_menu_day_etag(db=db, day=day)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+
     return get_menu_for_day(db=db, day=day)
 
 
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from typing import List
+
+# ~~~~~~~~~~~~~~~~~ Schemas ~~~~~~~~~~~~~~~~ #
+from models.pydantic_schemas import s_monitoring
+
+# ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
+from utils.network.upstream_guard import upstream_guard
+
+###########################################################################
+################################### MAIN ##################################
+###########################################################################
+
+monitoring_router = APIRouter()
+
+# ======================================================== #
+# ======================= Upstream ======================= #
+# ======================================================== #
+
+
+# Endpoint to get the circuit breaker state of every upstream host the server has contacted
+@monitoring_router.get("/upstreams", response_model=List[s_monitoring.ResUpstreamState])
+def get_upstream_states():
+    return [{"host": host, **state} for host, state in upstream_guard.states().items()]
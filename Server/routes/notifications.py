@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+# ~~~~~~~~~~~~~~~ Controller ~~~~~~~~~~~~~~ #
+from controllers.notifications import open_notification_stream
+
+# ~~~~~~~~~~~~~~~ Middleware ~~~~~~~~~~~~~~ #
+from middleware.database import get_db
+
+###########################################################################
+################################### MAIN ##################################
+###########################################################################
+
+notifications_router = APIRouter()
+
+# For token authentication (only needed for the "user" topic)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
+
+# ======================================================== #
+# ======================== Stream ======================== #
+# ======================================================== #
+
+
+# Server-Sent Events stream of hash changes instead of polling the hash endpoints
+# ?topic=user&topic=calendar:<university_uuid>/<course_name>&topic=canteen:<canteen_short_name> (or topic=canteen)
+@notifications_router.get("/stream", response_class=StreamingResponse)
+def get_notification_stream(
+    topic: List[str] = Query(...),
+    access_token: Optional[str] = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    return open_notification_stream(db, topic, access_token)
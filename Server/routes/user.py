@@ -1,6 +1,8 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Header, Response
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from typing import Optional
+import datetime
 
 # ~~~~~~~~~~~~~~~~~ Models ~~~~~~~~~~~~~~~~ #
 from models.sql_models import m_user, m_calendar, m_canteen
@@ -11,8 +13,17 @@ from models.pydantic_schemas import s_user, s_calendar, s_general, s_canteen
 # ~~~~~~~~~~~~~~~ Middleware ~~~~~~~~~~~~~~ #
 from middleware.database import get_db
 from middleware.auth import check_access_token, check_password
-from middleware.calendar import get_calendar
+from middleware.calendar import (
+    get_calendar,
+    build_calendar_delta,
+    build_calendar_response,
+    get_calendar_window,
+    accepts_gzip,
+    calendar_data_response,
+    calendar_feed_path,
+)
 from middleware.canteen import get_canteen, get_menu_for_canteen
+from middleware.http_cache import make_etag, etag_matches, not_modified, set_cache_headers
 
 # ~~~~~~~~~~~~~~ Controllers ~~~~~~~~~~~~~~ #
 from controllers.user import update_user, update_user_calendar
@@ -80,21 +91,59 @@ def add_user_calendar(
     return update_user_calendar(db, user, new_calendar)
 
 
-# Endpoint to get the current user's calendar
+# Endpoint to get the current user's calendar (optional time window ?from=...&to=...)
 @users_router.get("/calendar", response_model=s_calendar.ResCalendar)
-def get_user_calendars(access_token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_user_calendars(
+    start: Optional[datetime.datetime] = Query(None, alias="from"),
+    end: Optional[datetime.datetime] = Query(None, alias="to"),
+    if_none_match: Optional[str] = Header(None),
+    access_token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
     user = check_access_token(db, access_token)
-    calendar = get_calendar(db, user.user_id, with_university=True, with_data=True)
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    is_window = start is not None or end is not None
+    calendar = get_calendar(db, user.user_id, with_university=True)  # Data is only loaded if it is sent
+
+    if calendar:
+        etag = make_etag(calendar.hash, start, end) if is_window else make_etag(calendar.hash)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, private=True)
+
+        university_name = calendar.university.university_name if calendar.university else None
+        window = get_calendar_window(db, calendar, start, end) if is_window else None
+        return set_cache_headers(build_calendar_response(calendar, university_name, window), etag, private=True)
+    else:
+        raise HTTPException(status_code=404, detail="Calendar not found")
+
 
+# Endpoint to get only the data of the current user's calendar (gzip compressed as stored if accepted)
+@users_router.get("/calendar/data", response_class=Response)
+def get_user_calendar_data(
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    access_token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    user = check_access_token(db, access_token)
+    calendar = get_calendar(db, user.user_id)
     if calendar:
-        res_calendar = s_calendar.ResCalendar(
-            university_name=calendar.university.university_name if calendar.university else None,
-            course_name=calendar.course_name,
-            data=calendar.data,
-            hash=calendar.hash,
-            last_modified=calendar.last_modified,
-        )
-        return res_calendar
+        etag = make_etag(calendar.hash, gzip_encoded=accepts_gzip(accept_encoding))
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, private=True, vary="Accept-Encoding")
+        return set_cache_headers(calendar_data_response(calendar, accept_encoding), etag, private=True)
+    else:
+        raise HTTPException(status_code=404, detail="Calendar not found")
+
+
+# Endpoint to get the path of the ICS feed of the current user's calendar (to subscribe from a calendar app)
+@users_router.get("/calendar/feed", response_model=s_general.BasicMessage)
+def get_user_calendar_feed(access_token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user = check_access_token(db, access_token)
+    calendar = get_calendar(db, user.user_id, with_university=True)
+    if calendar:
+        return {"message": calendar_feed_path(calendar)}
     else:
         raise HTTPException(status_code=404, detail="Calendar not found")
 
@@ -110,6 +159,17 @@ def get_user_calendar_hash(access_token: str = Depends(oauth2_scheme), db: Sessi
         raise HTTPException(status_code=404, detail="Calendar not found")
 
 
+# Endpoint to get the changes of the current user's calendar since the client's last known hash
+@users_router.get("/calendar/delta", response_model=s_calendar.ResCalendarDelta)
+def get_user_calendar_delta(base_hash: str, access_token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user = check_access_token(db, access_token)
+    calendar = get_calendar(db, user.user_id)
+    if calendar:
+        return build_calendar_delta(db, calendar, base_hash)
+    else:
+        raise HTTPException(status_code=404, detail="Calendar not found")
+
+
 # Endpoint to delete the current user's calendar
 @users_router.delete("/calendar", response_model=s_general.BasicMessage)
 def delete_user_calendar(access_token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
@@ -0,0 +1,177 @@
+"""Benchmark: streaming VEVENT extractor vs. the previous icalendar.Calendar.from_ical path.
+
+Run from the Server directory:
+    python -m test.benchmark_ical_stream [--semesters 8] [--events-per-semester 2500] [--runs 3]
+
+Every path is measured in a fresh process, so the reported peak RSS growth is not distorted by the other path.
+"""
+
+from icalendar import Calendar
+import multiprocessing
+import argparse
+import datetime
+import resource
+import random
+import time
+import sys
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar.parse_pool import convert_ical
+
+EXAM_KEYWORDS = [  # * Keywords of the previous implementation (now data/calendar/event_tags.json)
+    "klausur",
+    "exam",
+    "prüfung",
+    "test",
+    "quiz",
+    "examen",
+    "examination",
+    "prüfungsleistung",
+    "abschlussklausur",
+    "abschlussprüfung",
+    "abschlussarbeit",
+    "prüfungsform",
+]
+
+###########################################################################
+################################ Test-Data ################################
+###########################################################################
+
+
+def generate_feed(semesters: int, events_per_semester: int) -> bytes:
+    """Generate a multi-semester feed that looks like a DHBW Mannheim export (folded lines, escapes, alarms)."""
+    random.seed(42)
+    lectures = ["Mathematik I", "Programmieren", "Klausur Datenbanken", "Theoretische Informatik", "Online Seminar"]
+    rooms = ["A 101", "B 202\\, Online", "Hybrid C 303", ""]
+
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Benchmark//DE",
+        "X-WR-TIMEZONE:Europe/Berlin",
+    ]
+    start = datetime.datetime(2020, 10, 1, 8, 0)
+    for i in range(semesters * events_per_semester):
+        event_start = start + datetime.timedelta(hours=2 * i)
+        event_end = event_start + datetime.timedelta(minutes=90)
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:benchmark-{i}@thestudentmaster",
+            f"SUMMARY:{random.choice(lectures)} - Gruppe {i % 7}",
+            "DESCRIPTION:Dozent: Prof. Dr. Beispiel\\nHinweise zur Veranstaltung\\; bitte Laptop mitbringen. Dies ist e",
+            " ine lange Beschreibung\\, die auf mehrere Zeilen umgebrochen wird.",
+            f"LOCATION:{random.choice(rooms)}",
+            f"DTSTART;TZID=Europe/Berlin:{event_start:%Y%m%dT%H%M%S}",
+            f"DTEND;TZID=Europe/Berlin:{event_end:%Y%m%dT%H%M%S}",
+            "BEGIN:VALARM",
+            "ACTION:DISPLAY",
+            "DESCRIPTION:Erinnerung",
+            "TRIGGER:-PT15M",
+            "END:VALARM",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(lines) + "\r\n").encode("utf-8")
+
+
+###########################################################################
+############################## Converter Paths ############################
+###########################################################################
+
+
+def convert_calendar_from_ical(ical: bytes) -> dict:
+    # * Previous implementation of CalendarWrapper.__ical_convert_to_json (kept here as reference)
+    cal = Calendar.from_ical(ical.decode("utf-8"))
+    jsonIcal = {}
+    jsonIcal["X-WR-TIMEZONE"] = str(cal.get("X-WR-TIMEZONE"))
+    jsonEvents = []
+
+    for event in cal.walk("vevent"):
+        event_description = {"tags": []}
+        event_description_tmp = str(event.get("description", "")).lower()
+
+        if "online" in event_description_tmp.lower() or "online" in event.get("summary").lower():
+            event_description["tags"].append("online")
+        elif "hybrid" in event_description_tmp.lower() or "hybrid" in event.get("summary").lower():
+            event_description["tags"].append("hybrid")
+
+        if any(ext in event.get("summary").lower() for ext in EXAM_KEYWORDS):
+            if "klausureinsicht" in event.get("summary").lower():
+                event_description["tags"].append("exam_review")
+            else:
+                event_description["tags"].append("exam")
+
+        jsonEvents.append(
+            {
+                "summary": str(event.get("summary")),
+                "description": event_description,
+                "location": str(event.get("location")),
+                "start": event.get("dtstart").dt.strftime("%Y-%m-%d %H:%M:%S"),
+                "end": event.get("dtend").dt.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+        )
+
+    jsonIcal["events"] = jsonEvents
+    return jsonIcal
+
+
+def convert_streaming(ical: bytes) -> dict:
+    return convert_ical(ical)
+
+
+PATHS = {"Calendar.from_ical": convert_calendar_from_ical, "ICalEventStream": convert_streaming}
+
+
+###########################################################################
+################################ Benchmark ################################
+###########################################################################
+
+
+def measure(path_name: str, ical: bytes, runs: int, results: multiprocessing.Queue):
+    convert = PATHS[path_name]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+
+    durations = []
+    output = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = convert(ical)
+        durations.append(time.perf_counter() - start)
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((path_name, min(durations), rss_after - rss_before, output))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--semesters", type=int, default=8)
+    parser.add_argument("--events-per-semester", type=int, default=2500)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    ical = generate_feed(args.semesters, args.events_per_semester)
+    events = args.semesters * args.events_per_semester
+    print(f"Feed: {events} events, {len(ical) / 1024 / 1024:.1f} MiB")
+
+    context = multiprocessing.get_context("spawn")
+    outputs = {}
+    for path_name in PATHS:
+        results = context.Queue()
+        process = context.Process(target=measure, args=(path_name, ical, args.runs, results))
+        process.start()
+        name, duration, rss_growth, output = results.get()
+        process.join()
+        outputs[name] = output
+        print(
+            f"{name:<20} {duration:7.3f} s  {events / duration:10.0f} events/s  "
+            f"{len(ical) / 1024 / 1024 / duration:6.1f} MiB/s  peak RSS +{rss_growth / 1024:.1f} MiB"
+        )
+
+    if outputs["Calendar.from_ical"] != outputs["ICalEventStream"]:
+        print("[ERROR] Outputs of the two paths differ!")
+        sys.exit(1)
+    print("Outputs are identical.")
+
+
+if __name__ == "__main__":
+    main()
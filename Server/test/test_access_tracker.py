@@ -0,0 +1,41 @@
+import datetime
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar.access_tracker import AccessTracker
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_record_keeps_newest_access():
+    tracker = AccessTracker()
+    newer = datetime.datetime(2024, 10, 16, 9, 41)
+    tracker.record(1, newer)
+    tracker.record(1, newer - datetime.timedelta(minutes=5))
+    tracker.record(2, newer)
+
+    assert len(tracker) == 2
+    assert tracker.drain() == {1: newer, 2: newer}
+
+
+def test_drain_empties_tracker():
+    tracker = AccessTracker()
+    tracker.record(1)
+
+    assert len(tracker.drain()) == 1
+    assert len(tracker) == 0
+    assert tracker.drain() == {}
+
+
+def test_restore_keeps_newer_accesses():
+    tracker = AccessTracker()
+    drained_at = datetime.datetime(2024, 10, 16, 9, 0)
+    tracker.record(1, drained_at)
+    tracker.record(2, drained_at)
+    failed = tracker.drain()
+
+    tracker.record(1, drained_at + datetime.timedelta(minutes=1))  # Access during the failed flush
+    tracker.restore(failed)
+
+    assert tracker.drain() == {1: drained_at + datetime.timedelta(minutes=1), 2: drained_at}
@@ -0,0 +1,87 @@
+import datetime
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar.calendar_events import (
+    calendar_event_rows,
+    compose_changesets,
+    diff_calendar_events,
+    event_from_row,
+    event_key,
+)
+
+###########################################################################
+################################ Test-Data ################################
+###########################################################################
+
+
+def build_event(summary: str, start: str, end: str, location: str = "A 101") -> dict:
+    return {"summary": summary, "description": {"tags": []}, "location": location, "start": start, "end": end}
+
+
+CALENDAR_DATA = {
+    "X-WR-TIMEZONE": "Europe/Berlin",
+    "events": [
+        build_event("Mathematik", "2024-01-15 08:00:00", "2024-01-15 10:00:00"),
+        build_event("Mathematik", "2024-01-15 08:00:00", "2024-01-15 10:00:00", "B 202"),  # Same slot, 2nd group
+        build_event("Programmieren", "2024-01-16 09:15:00", "2024-01-16 10:45:00"),
+    ],
+}
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_event_rows_have_stable_keys():
+    rows = calendar_event_rows(CALENDAR_DATA)
+
+    assert len(rows) == 3
+    assert list(rows) == list(calendar_event_rows(CALENDAR_DATA))
+    assert event_key("Mathematik", "2024-01-15 08:00:00", 1) in rows
+    assert rows[event_key("Programmieren", "2024-01-16 09:15:00")]["event_end"] == datetime.datetime(
+        2024, 1, 16, 10, 45
+    )
+
+
+def test_rows_convert_back_to_events():
+    rows = calendar_event_rows(CALENDAR_DATA)
+
+    assert [event_from_row(None, row) for row in rows.values()] == CALENDAR_DATA["events"]
+    key = event_key("Programmieren", "2024-01-16 09:15:00")
+    assert event_from_row(key, rows[key]) == {"key": key, **CALENDAR_DATA["events"][2]}
+
+
+def test_diff_only_contains_changes():
+    rows = calendar_event_rows(CALENDAR_DATA)
+    existing = {key: (event_id, row) for event_id, (key, row) in enumerate(rows.items())}
+
+    assert diff_calendar_events(existing, rows) == ([], [], [])
+
+    changed_data = {
+        "events": [
+            build_event("Mathematik", "2024-01-15 08:00:00", "2024-01-15 10:00:00", "C 303"),  # Moved room
+            build_event("Datenbanken", "2024-01-17 13:00:00", "2024-01-17 15:00:00"),  # New
+        ]
+    }
+    inserts, updates, deletes = diff_calendar_events(existing, calendar_event_rows(changed_data))
+
+    assert [key for key, _ in inserts] == [event_key("Datenbanken", "2024-01-17 13:00:00")]
+    assert [(event_id, row["location"]) for event_id, row in updates] == [(0, "C 303")]
+    assert sorted(deletes) == [1, 2]
+
+
+def test_compose_changesets():
+    math = {"key": "math", "summary": "Mathematik", "location": "A 101"}
+    math_moved = dict(math, location="C 303")
+    db = {"key": "db", "summary": "Datenbanken", "location": "A 101"}
+    seminar = {"key": "seminar", "summary": "Seminar", "location": "A 101"}
+
+    composed = compose_changesets(
+        [
+            {"added": [db], "changed": [], "removed": [math]},  # Removed and added again -> changed
+            {"added": [math_moved, seminar], "changed": [], "removed": []},
+            {"added": [], "changed": [dict(db, location="B 202")], "removed": [seminar]},  # Added, never seen
+        ]
+    )
+
+    assert composed == {"added": [dict(db, location="B 202")], "changed": [math_moved], "removed": []}
@@ -0,0 +1,56 @@
+import datetime
+import json
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from models.sql_models import m_auth, m_calendar, m_canteen, m_general, m_user  # All models for the mappers
+from models.pydantic_schemas.s_calendar import ResCalendar
+from middleware.calendar import build_calendar_response
+
+DATA = {
+    "X-WR-TIMEZONE": "Europe/Berlin",
+    "events": [
+        {
+            "summary": 'Prüfung "Mathematik"\nTeil 1',
+            "description": {"tags": ["exam"]},
+            "location": None,
+            "start": "2024-01-15 08:00:00",
+            "end": "2024-01-15 10:00:00",
+        }
+    ],
+}
+
+###########################################################################
+############################# Helper Functions ############################
+###########################################################################
+
+
+def native_calendar() -> m_calendar.CalendarNative:
+    calendar = m_calendar.CalendarNative(course_name="TINF22AI1 {Gruppe}", hash="abc", data=DATA)
+    calendar.last_modified = datetime.datetime(2024, 1, 15, 12, 0)
+    return calendar
+
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_full_response_matches_the_schema():
+    response = build_calendar_response(native_calendar(), 'DHBW "Mannheim" }')
+
+    body = json.loads(response.body)
+    validated = ResCalendar.model_validate(body)
+    assert validated.university_name == 'DHBW "Mannheim" }'
+    assert validated.course_name == "TINF22AI1 {Gruppe}"
+    assert validated.data == DATA
+    assert validated.hash == "abc"
+    assert validated.last_modified == datetime.datetime(2024, 1, 15, 12, 0)
+    assert set(body) == set(ResCalendar.model_fields)
+
+
+def test_full_response_equals_the_window_response():
+    # The full response (already encoded data) has the same members as the one serialized by the schema
+    calendar = native_calendar()
+    full = json.loads(build_calendar_response(calendar, None).body)
+    window = json.loads(build_calendar_response(calendar, None, window=DATA).body)
+    assert full == window
@@ -0,0 +1,306 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from zoneinfo import ZoneInfo
+from unittest import mock
+import datetime
+import pytest
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.database import Base
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from models.sql_models import m_auth, m_calendar, m_canteen, m_general, m_user  # All models for the mappers
+from middleware.calendar import (
+    sync_calendar_events,
+    apply_calendar_data,
+    get_calendar_delta,
+    build_calendar_delta,
+    get_calendar_window,
+    to_calendar_time,
+    flush_guest_accesses,
+)
+from middleware import calendar as calendar_middleware
+from utils.calendar.access_tracker import AccessTracker
+from test.test_calendar_events import build_event
+
+NOW = datetime.datetime(2024, 1, 15, 12, 0)
+
+TABLES = [
+    m_calendar.CalendarNative.__table__,
+    m_calendar.CalendarCustom.__table__,
+    m_calendar.CalendarEvent.__table__,
+    m_calendar.CalendarVersion.__table__,
+]
+
+
+def calendar_data(*events: dict) -> dict:
+    return {"X-WR-TIMEZONE": "Europe/Berlin", "events": list(events)}
+
+
+MATHE = build_event("Mathematik", "2024-01-15 08:00:00", "2024-01-15 10:00:00")
+PROGRAMMIEREN = build_event("Programmieren", "2024-01-16 09:15:00", "2024-01-16 10:45:00")
+DATENBANKEN = build_event("Datenbanken", "2024-01-17 13:00:00", "2024-01-17 16:15:00")
+
+###########################################################################
+############################# Helper Functions ############################
+###########################################################################
+
+
+@pytest.fixture
+def db():
+    """Session of an in-memory database with the calendar tables."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=TABLES)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def add_native_calendar(
+    db, data: dict, calendar_hash: str = "v1", course_name: str = "TINF22AI1"
+) -> m_calendar.CalendarNative:
+    calendar = m_calendar.CalendarNative(
+        university_id=1, course_name=course_name, source_backend_id=1, source="1", data=data, hash=calendar_hash
+    )
+    calendar.last_modified = NOW
+    db.add(calendar)
+    db.flush()
+    return calendar
+
+
+def refresh(db, calendar: m_calendar.CalendarNative, calendar_hash: str, *events: dict):
+    """Apply a refresh result (as from the CalendarWrapper) -> events and version history are written."""
+    assert apply_calendar_data(db, calendar, {"data": calendar_data(*events), "hash": calendar_hash})
+    db.flush()
+
+
+def summaries(changeset: dict) -> dict[str, list[str]]:
+    return {change: [event["summary"] for event in events] for change, events in changeset.items()}
+
+
+def stored_events(db, owner_column, calendar_id: int) -> dict[str, tuple[int, str]]:
+    """Stored events of a calendar -> {summary: (calendar_event_id, location)}"""
+    event = m_calendar.CalendarEvent
+    rows = db.query(event.calendar_event_id, event.summary, event.location).filter(owner_column == calendar_id)
+    return {row.summary: (row.calendar_event_id, row.location) for row in rows}
+
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+# ======================================================== #
+# ======================== Events ======================== #
+# ======================================================== #
+
+
+def test_sync_inserts_the_events_of_a_new_calendar(db):
+    calendar = add_native_calendar(db, calendar_data(MATHE, PROGRAMMIEREN))
+
+    changeset = sync_calendar_events(db, calendar, calendar.data)
+
+    assert [event["summary"] for event in changeset["added"]] == ["Mathematik", "Programmieren"]
+    assert changeset["changed"] == changeset["removed"] == []
+    events = stored_events(db, m_calendar.CalendarEvent.native_calendar_id, calendar.calendar_native_id)
+    assert {summary: location for summary, (_, location) in events.items()} == {
+        "Mathematik": "A 101",
+        "Programmieren": "A 101",
+    }
+
+
+def test_sync_only_writes_the_changed_events(db):
+    calendar = add_native_calendar(db, calendar_data(MATHE, PROGRAMMIEREN))
+    sync_calendar_events(db, calendar, calendar.data)
+    owner = (m_calendar.CalendarEvent.native_calendar_id, calendar.calendar_native_id)
+    before = stored_events(db, *owner)
+
+    # Mathematik moves to another room, Programmieren is cancelled, Datenbanken is new
+    moved = {**MATHE, "location": "B 202"}
+    changeset = sync_calendar_events(db, calendar, calendar_data(moved, DATENBANKEN))
+
+    assert [event["summary"] for event in changeset["added"]] == ["Datenbanken"]
+    assert [(event["summary"], event["location"]) for event in changeset["changed"]] == [("Mathematik", "B 202")]
+    assert [event["summary"] for event in changeset["removed"]] == ["Programmieren"]
+
+    after = stored_events(db, *owner)
+    assert set(after) == {"Mathematik", "Datenbanken"}
+    assert after["Mathematik"] == (before["Mathematik"][0], "B 202")  # Updated in place (same row)
+
+    # Same data again -> nothing to write
+    assert sync_calendar_events(db, calendar, calendar_data(moved, DATENBANKEN)) == {
+        "added": [],
+        "changed": [],
+        "removed": [],
+    }
+
+
+def test_sync_keeps_the_events_of_other_calendars(db):
+    native = add_native_calendar(db, calendar_data(MATHE))
+    custom = m_calendar.CalendarCustom(calendar_custom_id=1, course_name="Custom", source_backend_id=1, hash="c1")
+    sync_calendar_events(db, native, native.data)
+    sync_calendar_events(db, custom, calendar_data(MATHE, PROGRAMMIEREN))
+
+    # The custom calendar owns its rows (custom_calendar_id), the native calendar is unchanged
+    sync_calendar_events(db, custom, calendar_data())
+    assert stored_events(db, m_calendar.CalendarEvent.custom_calendar_id, 1) == {}
+    assert set(stored_events(db, m_calendar.CalendarEvent.native_calendar_id, native.calendar_native_id)) == {
+        "Mathematik"
+    }
+
+
+# ======================================================== #
+# ======================== Delta ========================= #
+# ======================================================== #
+
+
+@pytest.fixture
+def versioned_calendar(db) -> m_calendar.CalendarNative:
+    """Calendar refreshed v1 -> v2 (Datenbanken added) -> v3 (Mathematik removed)."""
+    calendar = add_native_calendar(db, calendar_data(MATHE, PROGRAMMIEREN))
+    sync_calendar_events(db, calendar, calendar.data)
+    refresh(db, calendar, "v2", MATHE, PROGRAMMIEREN, DATENBANKEN)
+    refresh(db, calendar, "v3", PROGRAMMIEREN, DATENBANKEN)
+    return calendar
+
+
+def test_delta_follows_the_version_chain(db, versioned_calendar):
+    # From the oldest hash both versions are composed, from v2 only the last one
+    assert summaries(get_calendar_delta(db, versioned_calendar, "v1")) == {
+        "added": ["Datenbanken"],
+        "changed": [],
+        "removed": ["Mathematik"],
+    }
+    assert summaries(get_calendar_delta(db, versioned_calendar, "v2")) == {
+        "added": [],
+        "changed": [],
+        "removed": ["Mathematik"],
+    }
+    assert get_calendar_delta(db, versioned_calendar, "v3") == {"added": [], "changed": [], "removed": []}
+
+
+def test_delta_of_an_unknown_hash_is_a_full_reload(db, versioned_calendar):
+    assert get_calendar_delta(db, versioned_calendar, "unknown") is None
+
+    delta = build_calendar_delta(db, versioned_calendar, "unknown")
+    assert delta.full is True and delta.changes is None
+    assert [event["summary"] for event in delta.data["events"]] == ["Programmieren", "Datenbanken"]
+
+
+def test_delta_of_a_broken_chain_is_a_full_reload(db, versioned_calendar):
+    # v2 -> v3 was not recorded, a version from another base leads to the current hash instead
+    version = m_calendar.CalendarVersion
+    db.query(version).filter(version.base_hash == "v2").delete()
+    db.add(
+        version(
+            native_calendar_id=versioned_calendar.calendar_native_id,
+            base_hash="v2-other",
+            hash="v3",
+            changes={"added": [], "changed": [], "removed": []},
+        )
+    )
+    db.flush()
+
+    assert get_calendar_delta(db, versioned_calendar, "v1") is None
+    assert build_calendar_delta(db, versioned_calendar, "v1").full is True
+    assert get_calendar_delta(db, versioned_calendar, "v2-other") == {"added": [], "changed": [], "removed": []}
+
+
+# ======================================================== #
+# ======================== Window ======================== #
+# ======================================================== #
+
+
+@pytest.fixture
+def window_calendar(db) -> m_calendar.CalendarNative:
+    """Calendar in Europe/Berlin (UTC+1 in January) - events are stored in its local time."""
+    calendar = add_native_calendar(db, calendar_data(MATHE, PROGRAMMIEREN, DATENBANKEN))
+    sync_calendar_events(db, calendar, calendar.data)
+    return calendar
+
+
+def window_summaries(db, calendar, start=None, end=None) -> list[str]:
+    return [event["summary"] for event in get_calendar_window(db, calendar, start, end)["events"]]
+
+
+def test_window_bounds_are_converted_to_the_calendar_zone(db, window_calendar):
+    utc = datetime.timezone.utc
+
+    # 07:30 UTC is 08:30 in Berlin -> Mathematik (08:00 - 10:00 local) is still running
+    start = datetime.datetime(2024, 1, 15, 7, 30, tzinfo=utc)
+    assert window_summaries(db, window_calendar, start) == ["Mathematik", "Programmieren", "Datenbanken"]
+
+    # 09:30 UTC is 10:30 in Berlin -> Mathematik is over (a naive 09:30 would still include it)
+    start = datetime.datetime(2024, 1, 15, 9, 30, tzinfo=utc)
+    assert window_summaries(db, window_calendar, start) == ["Programmieren", "Datenbanken"]
+    assert window_summaries(db, window_calendar, start.replace(tzinfo=None)) == [
+        "Mathematik",
+        "Programmieren",
+        "Datenbanken",
+    ]
+
+    # End bound: the events starting before 13:00 Berlin (12:00 UTC) on the 17th
+    end = datetime.datetime(2024, 1, 17, 12, 0, tzinfo=utc)
+    assert window_summaries(db, window_calendar, None, end) == ["Mathematik", "Programmieren"]
+
+
+def test_empty_window(db, window_calendar):
+    # Between Programmieren (ends 10:45) and Datenbanken (starts 13:00)
+    start, end = datetime.datetime(2024, 1, 16, 11, 0), datetime.datetime(2024, 1, 17, 13, 0)
+    window = get_calendar_window(db, window_calendar, start, end)
+    assert window == {"X-WR-TIMEZONE": "Europe/Berlin", "events": []}
+
+
+@pytest.mark.parametrize("timezone", [None, "None", "Invalid/Zone"])
+def test_calendar_without_timezone_uses_the_server_time(timezone):
+    moment = datetime.datetime(2024, 1, 15, 9, 30, tzinfo=datetime.timezone.utc)
+    assert to_calendar_time(moment, timezone) == moment.astimezone().replace(tzinfo=None)
+
+
+def test_to_calendar_time():
+    moment = datetime.datetime(2024, 1, 15, 9, 30)
+    assert to_calendar_time(moment, "Europe/Berlin") is moment
+    assert to_calendar_time(None, "Europe/Berlin") is None
+    assert to_calendar_time(moment.replace(tzinfo=ZoneInfo("Europe/Berlin")), "UTC") == datetime.datetime(
+        2024, 1, 15, 8, 30
+    )
+
+
+def test_window_of_a_calendar_without_timezone(db):
+    # convert_ical writes str(None) if the feed has no X-WR-TIMEZONE
+    calendar = add_native_calendar(db, {"X-WR-TIMEZONE": "None", "events": [MATHE]})
+    sync_calendar_events(db, calendar, calendar.data)
+
+    start = datetime.datetime(2024, 1, 14, 12, 0, tzinfo=datetime.timezone.utc)  # The day before in every zone
+    window = get_calendar_window(db, calendar, start)
+    assert window["X-WR-TIMEZONE"] == "None"
+    assert [event["summary"] for event in window["events"]] == ["Mathematik"]
+
+
+# ======================================================== #
+# ==================== Guest accesses ==================== #
+# ======================================================== #
+
+
+def test_flush_never_overwrites_a_newer_access(db):
+    newer = add_native_calendar(db, calendar_data(), course_name="TINF22AI1")
+    older = add_native_calendar(db, calendar_data(), course_name="TINF22AI2")
+    newer.guest_last_accessed = NOW  # e.g. written by another worker
+    db.commit()
+
+    last_modified = (newer.last_modified, older.last_modified)
+
+    tracker = AccessTracker()
+    tracker.record(newer.calendar_native_id, NOW - datetime.timedelta(hours=1))
+    tracker.record(older.calendar_native_id, NOW - datetime.timedelta(hours=1))
+    with mock.patch.object(calendar_middleware, "guest_access_tracker", tracker):
+        assert flush_guest_accesses(db) == 2
+    db.expire_all()
+
+    assert newer.guest_last_accessed == NOW
+    assert older.guest_last_accessed == NOW - datetime.timedelta(hours=1)
+    assert (newer.last_modified, older.last_modified) == last_modified  # An access is not a modification
+    assert len(tracker) == 0
@@ -0,0 +1,109 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import datetime
+import pytest
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.database import Base
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from models.sql_models import m_auth, m_calendar, m_canteen, m_general, m_user  # All models for the mappers
+from middleware.canteen import update_menu_hashes
+from middleware.database import get_db
+from routes.canteen import canteen_router
+
+NOW = datetime.datetime(2024, 1, 15, 12, 0)
+DAY = "2024-01-15"
+
+TABLES = [m_canteen.Canteen.__table__, m_canteen.Dish.__table__, m_canteen.Menu.__table__]
+
+###########################################################################
+############################# Helper Functions ############################
+###########################################################################
+
+
+@pytest.fixture
+def db():
+    """Session of an in-memory database with one canteen and its menu (menu_hash calculated)."""
+    # The sync routes run in the threadpool of the TestClient
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=TABLES)
+    session = sessionmaker(bind=engine)()
+
+    canteen = m_canteen.Canteen(canteen_name="Mensaria Metropol", canteen_short_name="metropol", address_id=1)
+    canteen.canteen_id = 1
+    canteen.last_modified = NOW
+    dish = m_canteen.Dish(dish_id=1, description="Linsen mit Spätzle", price="3,50 €", last_modified=NOW)
+    menu = m_canteen.Menu(
+        canteen_id=1, dish_id=1, dish_type="Vegetarisch", serving_date=datetime.datetime(2024, 1, 15), last_modified=NOW
+    )
+    session.add_all([canteen, dish, menu])
+    update_menu_hashes(session)
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    """Client of the canteen routes on the test database (main.app would connect to MariaDB)."""
+    app = FastAPI()
+    app.include_router(canteen_router, prefix="/canteen")
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+
+def change_price(db, price: str):
+    db.get(m_canteen.Dish, 1).price = price
+    update_menu_hashes(db)
+    db.commit()
+
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+@pytest.mark.parametrize("path", ["/canteen/metropol/menu/all", "/canteen/metropol/menu/currentweek"])
+def test_menu_not_modified(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    # Another client's copy (old ETag) gets the full menu
+    assert client.get(path, headers={"If-None-Match": '"outdated"'}).status_code == 200
+
+
+def test_menu_etag_changes_with_the_menu(client, db):
+    path = "/canteen/metropol/menu/all"
+    etag = client.get(path).headers["ETag"]
+
+    change_price(db, "3,90 €")
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert client.get(path, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+
+def test_menu_day_etag(client, db):
+    path = f"/canteen/menu/{DAY}"
+    etag = client.get(path).headers["ETag"]
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    # Every day has its own ETag, a changed menu changes the ETag of every day
+    assert client.get("/canteen/menu/2024-01-16").headers["ETag"] != etag
+    change_price(db, "3,90 €")
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
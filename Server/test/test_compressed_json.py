@@ -0,0 +1,51 @@
+import gzip
+import json
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from models.sql_models.compressed_json import CompressedJSON, CompressedPayload, PAYLOAD_VERSION_GZIP
+
+###########################################################################
+################################ Test-Data ################################
+###########################################################################
+
+CALENDAR_DATA = {
+    "X-WR-TIMEZONE": "Europe/Berlin",
+    "events": [
+        {
+            "summary": f"Mathematik {i}",
+            "description": {"tags": ["online"]},
+            "location": "Hörsaal A 101",
+            "start": "2024-01-15 08:00:00",
+            "end": "2024-01-15 10:00:00",
+        }
+        for i in range(200)
+    ],
+}
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_payload_is_stored_compressed():
+    stored = CompressedJSON().process_bind_param(CALENDAR_DATA, None)
+
+    assert stored.startswith(PAYLOAD_VERSION_GZIP)
+    assert len(stored) < len(json.dumps(CALENDAR_DATA)) / 10
+    assert json.loads(gzip.decompress(stored[1:])) == CALENDAR_DATA
+
+
+def test_payload_is_decompressed_on_access():
+    stored = CompressedPayload.from_data(CALENDAR_DATA).stored
+    payload = CompressedJSON().process_result_value(stored, None)
+
+    assert payload.gzip == stored[1:]  # Served without decompression
+    assert payload["X-WR-TIMEZONE"] == "Europe/Berlin"
+    assert dict(payload) == CALENDAR_DATA
+
+
+def test_legacy_plain_json_rows():
+    payload = CompressedJSON().process_result_value(json.dumps(CALENDAR_DATA).encode("utf-8"), None)
+
+    assert len(payload["events"]) == 200
+    assert json.loads(gzip.decompress(payload.gzip)) == CALENDAR_DATA
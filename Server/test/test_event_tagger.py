@@ -0,0 +1,123 @@
+import pytest
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar.event_tagger import EventTagger, event_tagger
+from utils.calendar.parse_pool import convert_ical
+from utils.calendar.rapla_parser import parse_rapla_page
+from test.test_rapla_parser import RAPLA_PAGE
+
+###########################################################################
+################################ Test-Data ################################
+###########################################################################
+
+EXAM_KEYWORDS = [
+    "klausur",
+    "exam",
+    "prüfung",
+    "test",
+    "quiz",
+    "examen",
+    "examination",
+    "prüfungsleistung",
+    "abschlussklausur",
+    "abschlussprüfung",
+    "abschlussarbeit",
+    "prüfungsform",
+]
+
+EVENTS = [
+    ("Klausur Mathematik", "Raum A 101"),
+    ("Klausureinsicht Datenbanken", "ONLINE via Zoom"),
+    ("Programmieren (online)", None),
+    ("Hybrid-Vorlesung Theoretische Informatik", ""),
+    ("Projektarbeit", "hybrid oder online"),
+    ("Abschlussprüfung", "Hybrid"),
+    ("Vorlesung", "Keine Prüfung"),
+    ("Feiertag", None),
+    ("Übungstestat", "Raum online\nZweite Zeile"),
+]
+
+ICAL_FEED = (
+    b"BEGIN:VCALENDAR\r\n"
+    b"X-WR-TIMEZONE:Europe/Berlin\r\n"
+    b"BEGIN:VEVENT\r\n"
+    b"SUMMARY:Klausureinsicht Datenbanken\r\n"
+    b"DESCRIPTION:Raum: Online\r\n"
+    b"DTSTART:20240115T080000\r\n"
+    b"DTEND:20240115T100000\r\n"
+    b"END:VEVENT\r\n"
+    b"BEGIN:VEVENT\r\n"
+    b"SUMMARY:Hybrid-Vorlesung Programmieren\r\n"
+    b"DTSTART:20240116T080000\r\n"
+    b"DTEND:20240116T100000\r\n"
+    b"END:VEVENT\r\n"
+    b"END:VCALENDAR\r\n"
+)
+
+
+def legacy_tags(summary: str, description: str) -> list:
+    # * Previous inline logic of CalendarWrapper.__ical_convert_to_json
+    tags = []
+    description = (description or "").lower()
+    summary = summary.lower()
+    if "online" in description or "online" in summary:
+        tags.append("online")
+    elif "hybrid" in description or "hybrid" in summary:
+        tags.append("hybrid")
+    if any(ext in summary for ext in EXAM_KEYWORDS):
+        tags.append("exam_review" if "klausureinsicht" in summary else "exam")
+    return tags
+
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+@pytest.mark.parametrize("summary, description", EVENTS)
+def test_default_rules_match_legacy_logic(summary, description):
+    assert event_tagger.tag(summary=summary, description=description) == legacy_tags(summary, description)
+
+
+def test_redundant_keywords_are_dropped():
+    tagger = EventTagger(
+        [{"tag": "exam", "fields": ["summary"], "keywords": ["Klausur", "abschlussklausur", "klausur"]}]
+    )
+    assert tagger.compiled_rules[0][3] == ("klausur",)
+
+
+def test_fields_and_groups():
+    tagger = EventTagger(
+        [
+            {"tag": "lab", "fields": ["summary"], "keywords": ["labor"]},
+            {"tag": "holiday", "group": "day", "fields": ["summary", "description"], "keywords": ["feiertag"]},
+            {"tag": "free", "group": "day", "fields": ["description"], "keywords": ["frei"]},
+        ]
+    )
+    assert tagger.tag(summary="Vorlesung", description="Labor") == []
+    assert tagger.tag(summary="Labor", description="Feiertag, vorlesungsfrei") == ["lab", "holiday"]
+    assert tagger.tag(summary="Vorlesung", description="vorlesungsfrei") == ["free"]
+    # Keywords never match across two fields
+    assert tagger.tag(summary="Feier", description="tag") == []
+
+
+def test_overlapping_keywords_are_not_lost():
+    tagger = EventTagger(
+        [
+            {"tag": "review", "fields": ["summary"], "keywords": ["klausureinsicht"]},
+            {"tag": "exam", "fields": ["summary"], "keywords": ["klausur"]},
+            {"tag": "quiz", "fields": ["summary"], "keywords": ["sichtung"]},
+        ]
+    )
+    # "klausur" is part of "klausureinsicht", "sichtung" starts inside it
+    assert tagger.tag(summary="Klausureinsichtung") == ["review", "exam", "quiz"]
+
+
+def test_backends_share_the_rules():
+    ical_tags = [event["description"]["tags"] for event in convert_ical(ICAL_FEED)["events"]]
+    assert ical_tags == [["online", "exam_review"], ["hybrid"]]
+
+    rapla_tags = {
+        event["summary"]: event["description"]["tags"] for event in parse_rapla_page(RAPLA_PAGE, year=2023)["events"]
+    }
+    assert rapla_tags["Hybrid-Vorlesung Programmieren"] == ["hybrid"]
@@ -0,0 +1,239 @@
+from unittest import mock
+from types import SimpleNamespace
+import asyncio
+import httpx
+import pytest
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.network import fetch_engine, http_client
+from utils.network.fetch_engine import (
+    FetchEngine,
+    payload_fingerprint,
+    response_validators,
+    is_unchanged,
+    conditional_headers,
+    get_source_validators,
+    source_validator_columns,
+)
+from utils.network.upstream_guard import UpstreamGuard, TokenBucket
+from utils.calendar import calendar_wrapper
+from utils.calendar.calendar_wrapper import CalendarWrapper
+from test.test_ical_stream import ICAL_FEED
+
+###########################################################################
+################################ Test-Data ################################
+###########################################################################
+
+PAYLOAD = b"BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n"
+
+###########################################################################
+############################# Helper Functions ############################
+###########################################################################
+
+
+class MockUpstream:
+    """Mocked transport for the fetch engine: every request is answered by handler(request).
+    Counts the clients that were created and the highest number of parallel requests (overall and per host)."""
+
+    def __init__(self, handler, delay: float = 0.01):
+        self.handler = handler
+        self.delay = delay
+        self.clients = 0
+        self.requests = []
+        self.running = {}
+        self.max_running = {}
+
+    async def __handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        for key in (None, request.url.host):
+            self.running[key] = self.running.get(key, 0) + 1
+            self.max_running[key] = max(self.max_running.get(key, 0), self.running[key])
+        try:
+            await asyncio.sleep(self.delay)
+            return self.handler(request)
+        finally:
+            for key in (None, request.url.host):
+                self.running[key] -= 1
+
+    def create_client(self, max_connections: int = 1) -> httpx.AsyncClient:
+        self.clients += 1
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.__handle))
+
+
+@pytest.fixture
+def upstream_guard():
+    """Fresh upstream guard without rate limit and retries without backoff (tests must not wait)."""
+    guard = UpstreamGuard(bucket_factory=lambda: TokenBucket(rate=10_000, capacity=10_000))
+    with (
+        mock.patch.object(http_client, "upstream_guard", guard),
+        mock.patch.object(http_client, "retry_delay", return_value=0),
+    ):
+        yield guard
+
+
+def patch_client(upstream: MockUpstream):
+    return mock.patch.object(fetch_engine, "create_async_client", side_effect=upstream.create_client)
+
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_payload_fingerprint():
+    assert payload_fingerprint(PAYLOAD) == payload_fingerprint(bytes(PAYLOAD))
+    assert payload_fingerprint(PAYLOAD) != payload_fingerprint(PAYLOAD + b"\r\n")
+    assert len(payload_fingerprint(PAYLOAD)) == 32
+    assert payload_fingerprint(None) is None
+
+
+def test_unchanged_by_fingerprint():
+    validators = response_validators({"etag": '"v1"'}, PAYLOAD)
+
+    # Same payload, but the server generated a new etag -> unchanged
+    assert is_unchanged(validators, {"etag": '"v2"'}, PAYLOAD)
+    # Same etag, but a different payload -> changed
+    assert not is_unchanged(validators, {"etag": '"v1"'}, PAYLOAD + b"\r\n")
+
+
+def test_unchanged_without_fingerprint():
+    # Validators stored before fingerprints existed
+    validators = {"etag": None, "last_modified": "Mon, 01 Jan 2024 00:00:00 GMT", "content_length": len(PAYLOAD)}
+    assert is_unchanged(validators, {"last-modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, PAYLOAD)
+    assert not is_unchanged(None, {}, PAYLOAD)
+
+
+def test_conditional_headers():
+    assert conditional_headers(None) == {}
+    assert conditional_headers({"etag": '"v1"', "last_modified": None, "fingerprint": "abc"}) == {
+        "If-None-Match": '"v1"'
+    }
+
+
+def test_one_client_per_fetch_run(upstream_guard):
+    upstream = MockUpstream(lambda request: httpx.Response(200, content=PAYLOAD))
+    urls = {index: f"https://host{index % 3}.example.org/{index}" for index in range(12)}
+    with patch_client(upstream):
+        results = FetchEngine().fetch_all(urls)
+
+    # All requests of the run share one client (and its connection pool)
+    assert upstream.clients == 1
+    assert len(upstream.requests) == 12
+    assert all(result.ok and result.content == PAYLOAD for result in results.values())
+    assert list(results) == list(urls)
+
+
+def test_shared_sync_session_is_reused():
+    assert http_client.get_session() is http_client.get_session()
+
+
+def test_concurrency_is_limited_globally_and_per_host(upstream_guard):
+    upstream = MockUpstream(lambda request: httpx.Response(200, content=PAYLOAD), delay=0.02)
+    urls = {index: f"https://host{index % 2}.example.org/{index}" for index in range(20)}
+    with patch_client(upstream):
+        FetchEngine(max_concurrency=3, max_per_host=2).fetch_all(urls)
+
+    assert upstream.max_running[None] == 3
+    assert upstream.max_running["host0.example.org"] == 2
+    assert upstream.max_running["host1.example.org"] == 2
+
+
+def test_invalid_concurrency_limits():
+    with pytest.raises(ValueError):
+        FetchEngine(max_concurrency=0)
+    with pytest.raises(ValueError):
+        FetchEngine(max_per_host=0)
+
+
+def test_errors_are_mapped_to_results(upstream_guard):
+    def handler(request: httpx.Request) -> httpx.Response:
+        match request.url.path:
+            case "/missing":
+                return httpx.Response(404)
+            case "/unchanged":
+                return httpx.Response(304)
+            case "/down":
+                raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, content=PAYLOAD)
+
+    upstream = MockUpstream(handler)
+    with patch_client(upstream):
+        results = FetchEngine().fetch_all(
+            {
+                "ok": "https://a.example.org/ok",
+                "missing": "https://a.example.org/missing",
+                "unchanged": "https://a.example.org/unchanged",
+                "down": "https://b.example.org/down",
+            }
+        )
+
+        # The failing host is skipped while its circuit is open (no request is sent)
+        upstream_guard.breaker("c.example.org").failure_threshold = 1
+        upstream_guard.record("https://c.example.org/", success=False)
+        skipped = FetchEngine().fetch_all({"skipped": "https://c.example.org/skipped"})["skipped"]
+
+    assert results["ok"].ok and results["ok"].error is None
+    assert not results["missing"].ok and results["missing"].error == "HTTP 404"
+    assert results["unchanged"].not_modified and not results["unchanged"].ok
+    assert results["down"].status_code is None and "ConnectError" in results["down"].error
+    assert "CircuitOpen" in skipped.error
+    assert not any(request.url.path == "/skipped" for request in upstream.requests)
+
+
+# ======================================================== #
+# ================== Conditional Requests ================ #
+# ======================================================== #
+
+VALIDATORS = {
+    "etag": '"v1"',
+    "last_modified": "Mon, 01 Jan 2024 00:00:00 GMT",
+    "content_length": len(ICAL_FEED),
+    "fingerprint": payload_fingerprint(ICAL_FEED),
+}
+
+
+def test_validators_are_sent_as_conditional_headers(upstream_guard):
+    upstream = MockUpstream(lambda request: httpx.Response(304))
+    with patch_client(upstream):
+        result = FetchEngine().fetch_all({"feed": "https://a.example.org/feed"}, {"feed": VALIDATORS})["feed"]
+
+    request = upstream.requests[0]
+    assert request.headers["if-none-match"] == '"v1"'
+    assert request.headers["if-modified-since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert result.not_modified
+
+
+def test_not_modified_source_is_not_parsed(upstream_guard):
+    upstream = MockUpstream(lambda request: httpx.Response(304))
+    wrapper = CalendarWrapper("iCalendar")
+    with patch_client(upstream), mock.patch.object(calendar_wrapper.parse_pool, "map", return_value={}) as parse:
+        result = wrapper.get_data("https://a.example.org/feed", VALIDATORS)
+
+    assert result == {"not_modified": True, "validators": VALIDATORS}
+    assert all(not call.args[1] for call in parse.call_args_list)  # Nothing was handed to the parser
+
+
+def test_validators_of_a_changed_source_are_stored(upstream_guard):
+    headers = {"etag": '"v2"', "last-modified": "Tue, 02 Jan 2024 00:00:00 GMT"}
+    upstream = MockUpstream(lambda request: httpx.Response(200, headers=headers, content=ICAL_FEED))
+    with patch_client(upstream):
+        result = CalendarWrapper("iCalendar").get_data(
+            "https://a.example.org/feed", {**VALIDATORS, "fingerprint": None}
+        )
+
+    assert result["data"]["events"]
+    assert result["validators"] == {
+        "etag": '"v2"',
+        "last_modified": "Tue, 02 Jan 2024 00:00:00 GMT",
+        "content_length": len(ICAL_FEED),
+        "fingerprint": payload_fingerprint(ICAL_FEED),
+    }
+
+    # Stored in the source_* columns of the calendar and read back for the next download
+    calendar = SimpleNamespace(**source_validator_columns(result["validators"]))
+    assert calendar.source_etag == '"v2"'
+    assert get_source_validators(calendar) == result["validators"]
+    assert conditional_headers(get_source_validators(calendar)) == {
+        "If-None-Match": '"v2"',
+        "If-Modified-Since": "Tue, 02 Jan 2024 00:00:00 GMT",
+    }
@@ -0,0 +1,39 @@
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from middleware.http_cache import make_etag, etag_matches, not_modified
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_make_etag():
+    assert make_etag("abc") == '"abc"'
+    assert make_etag("abc", "2024-01-15", None) == make_etag("abc", "2024-01-15", None)
+    assert make_etag("abc", "2024-01-15") != make_etag("abc", "2024-01-22")
+
+
+def test_etag_matches():
+    etag = make_etag("abc")
+
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"def", W/"abc"', etag)  # Weak comparison for GET
+    assert etag_matches("*", etag)
+    assert not etag_matches('"def"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_not_modified_has_no_body():
+    response = not_modified(make_etag("abc"), private=True)
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == '"abc"'
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+def test_gzip_body_has_its_own_etag():
+    assert make_etag("abc", gzip_encoded=True) == '"abc-gz"'
+    assert not etag_matches(make_etag("abc"), make_etag("abc", gzip_encoded=True))
+
+    response = not_modified(make_etag("abc", gzip_encoded=True), vary="Accept-Encoding")
+    assert response.headers["vary"] == "Accept-Encoding"
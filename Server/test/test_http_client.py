@@ -0,0 +1,189 @@
+from unittest import mock
+import asyncio
+import io
+import httpx
+import pytest
+import requests
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.network import http_client
+from utils.network.http_client import get, async_get, create_async_client, get_session, ResponseTooLarge
+from utils.network.upstream_guard import STATE_OPEN
+from config.network import (
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_READ_TIMEOUT_SECONDS,
+    HTTP_MAX_RETRIES,
+    HTTP_RETRY_STATUS_CODES,
+)
+from test.test_fetch_engine import upstream_guard  # Fixture: no rate limit, retries without backoff
+
+URL = "https://upstream.example.org/feed"
+
+###########################################################################
+############################# Helper Functions ############################
+###########################################################################
+
+
+def run_async_get(handler, **kwargs):
+    """Call async_get with a client whose requests are answered by handler (returns result and requests)."""
+    requests_sent = []
+
+    def record(request: httpx.Request) -> httpx.Response:
+        requests_sent.append(request)
+        return handler(request)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(record)) as client:
+            return await async_get(client, URL, **kwargs)
+
+    return asyncio.run(scenario()), requests_sent
+
+
+def sync_response(body: bytes, headers: dict = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(body)
+    return response
+
+
+async def body_stream(size: int):
+    for _ in range(size // 1024):
+        yield b"x" * 1024
+
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+# ======================================================== #
+# ====================== Size Cap ======================== #
+# ======================================================== #
+
+
+def test_async_cap_aborts_announced_body(upstream_guard):
+    with pytest.raises(ResponseTooLarge):
+        run_async_get(lambda request: httpx.Response(200, content=b"x" * 2048), max_bytes=1024)
+
+
+def test_async_cap_aborts_streamed_body(upstream_guard):
+    # No Content-Length -> the body is counted while it is read
+    with pytest.raises(ResponseTooLarge):
+        run_async_get(lambda request: httpx.Response(200, content=body_stream(64 * 1024)), max_bytes=4096)
+
+    (response, content), _ = run_async_get(lambda request: httpx.Response(200, content=body_stream(4096)))
+    assert len(content) == 4096
+
+
+def test_sync_cap_aborts_body(upstream_guard):
+    session = mock.Mock()
+    with mock.patch.object(http_client, "get_session", return_value=session):
+        session.get.return_value = sync_response(b"x" * 2048, {"Content-Length": "2048"})
+        with pytest.raises(ResponseTooLarge):
+            get(URL, max_bytes=1024)
+
+        session.get.return_value = sync_response(b"x" * 2048)  # Not announced
+        with pytest.raises(ResponseTooLarge):
+            get(URL, max_bytes=1024)
+
+        session.get.return_value = sync_response(b"x" * 512)
+        assert get(URL, max_bytes=1024).content == b"x" * 512
+
+
+# ======================================================== #
+# ======================== Retries ======================= #
+# ======================================================== #
+
+
+def test_async_retries_stop_at_configured_count(upstream_guard):
+    (response, _), sent = run_async_get(lambda request: httpx.Response(503))
+    assert response.status_code == 503
+    assert len(sent) == HTTP_MAX_RETRIES + 1
+
+    def refuse(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=request)
+
+    attempts = []
+    with pytest.raises(httpx.ConnectError):
+        run_async_get(lambda request: attempts.append(request) or refuse(request))
+    assert len(attempts) == HTTP_MAX_RETRIES + 1
+
+
+def test_async_success_is_not_retried(upstream_guard):
+    (response, content), sent = run_async_get(lambda request: httpx.Response(200, content=b"ok"))
+    assert (response.status_code, content, len(sent)) == (200, b"ok", 1)
+
+
+def test_async_retries_take_a_token_each(upstream_guard):
+    with mock.patch.object(upstream_guard, "throttle", wraps=upstream_guard.throttle) as throttle:
+        run_async_get(lambda request: httpx.Response(503))
+    assert throttle.call_count == HTTP_MAX_RETRIES  # The first attempt takes its token in acquire()
+
+
+def test_sync_retry_policy():
+    retry = get_session().get_adapter(URL).max_retries
+    assert retry.total == HTTP_MAX_RETRIES
+    assert set(retry.status_forcelist) == set(HTTP_RETRY_STATUS_CODES)
+
+
+# ======================================================== #
+# ==================== Circuit Breaker =================== #
+# ======================================================== #
+
+
+def half_open_breaker(guard):
+    """Open the circuit of URL and let its reset time pass (the next request is the probe)."""
+    breaker = guard.breaker(guard.host(URL))
+    breaker.failure_threshold = 1
+    breaker.reset_seconds = 0
+    guard.record(URL, success=False)
+    return breaker
+
+
+def test_async_other_http_errors_are_recorded(upstream_guard):
+    def undecodable(request: httpx.Request) -> httpx.Response:
+        raise httpx.DecodingError("broken gzip stream", request=request)
+
+    breaker = half_open_breaker(upstream_guard)
+    with pytest.raises(httpx.DecodingError):
+        run_async_get(undecodable)
+    assert breaker.state == STATE_OPEN  # Failed probe (not left half open)
+    assert breaker.total_failures == 2
+
+
+def test_async_cancelled_probe_is_released(upstream_guard):
+    async def hanging(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(10)
+        return httpx.Response(200)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(hanging)) as client:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(async_get(client, URL), 0.05)
+
+    breaker = half_open_breaker(upstream_guard)
+    asyncio.run(scenario())
+    assert breaker.allow()  # The next request may probe again
+
+
+# ======================================================== #
+# ======================= Timeouts ======================= #
+# ======================================================== #
+
+
+def test_timeouts_are_passed_through(upstream_guard):
+    session = mock.Mock()
+    session.get.return_value = sync_response(b"ok")
+    with mock.patch.object(http_client, "get_session", return_value=session):
+        get(URL)
+        get(URL, timeout=(1, 2))
+
+    assert session.get.call_args_list[0].kwargs["timeout"] == (HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS)
+    assert session.get.call_args_list[1].kwargs["timeout"] == (1, 2)
+
+    client = create_async_client()
+    try:
+        assert client.timeout == httpx.Timeout(HTTP_READ_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS)
+    finally:
+        asyncio.run(client.aclose())
@@ -0,0 +1,102 @@
+import io
+import pytest
+from icalendar import Calendar
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar.ical_stream import ICalEventStream, split_content_line, format_date_time
+
+###########################################################################
+################################ Test-Data ################################
+###########################################################################
+
+ICAL_FEED = (
+    b"BEGIN:VCALENDAR\r\n"
+    b"VERSION:2.0\r\n"
+    b"PRODID:-//Test//Test//DE\r\n"
+    b"X-WR-TIMEZONE:Europe/Berlin\r\n"
+    b"BEGIN:VTIMEZONE\r\n"
+    b"TZID:Europe/Berlin\r\n"
+    b"BEGIN:STANDARD\r\n"
+    b"DTSTART:19701025T030000\r\n"
+    b"TZOFFSETFROM:+0200\r\n"
+    b"TZOFFSETTO:+0100\r\n"
+    b"END:STANDARD\r\n"
+    b"END:VTIMEZONE\r\n"
+    b"BEGIN:VEVENT\r\n"
+    b"UID:event-1@test\r\n"
+    b"SUMMARY:Klausur Mathematik\\, Teil 1\r\n"
+    b"DESCRIPTION:Raum\\; Hinweise\\nZweite Zeile \\\\ Ende\r\n"
+    b"LOCATION:A 101\r\n"
+    b"DTSTART;TZID=Europe/Berlin:20240115T080000\r\n"
+    b"DTEND;TZID=Europe/Berlin:20240115T100000\r\n"
+    b"BEGIN:VALARM\r\n"
+    b"ACTION:DISPLAY\r\n"
+    b"DESCRIPTION:Alarm description\r\n"
+    b"TRIGGER:-PT15M\r\n"
+    b"END:VALARM\r\n"
+    b"END:VEVENT\r\n"
+    b"BEGIN:VEVENT\r\n"
+    b"UID:event-2@test\r\n"
+    b"SUMMARY:Eine sehr lange Vorlesung mit einem Namen\\, der umgebrochen wer\r\n"
+    b" den muss (online)\r\n"
+    b'DTSTART;TZID="Europe/Berlin":20240116T091500\r\n'
+    b"DTEND;TZID=Europe/Berlin:20240116T104500\r\n"
+    b"END:VEVENT\r\n"
+    b"BEGIN:VEVENT\r\n"
+    b"UID:event-3@test\r\n"
+    b"SUMMARY;LANGUAGE=de:Projektarbeit \xc3\x9cbung\r\n"
+    b"LOCATION:Hybrid / R\xc3\xa4ume B 202\r\n"
+    b"DTSTART:20240117T120000Z\r\n"
+    b"DTEND:20240117T130000Z\r\n"
+    b"END:VEVENT\r\n"
+    b"BEGIN:VEVENT\r\n"
+    b"UID:event-4@test\r\n"
+    b"SUMMARY:Feiertag\r\n"
+    b"DTSTART;VALUE=DATE:20240118\r\n"
+    b"DTEND;VALUE=DATE:20240119\r\n"
+    b"END:VEVENT\r\n"
+    b"END:VCALENDAR\r\n"
+)
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_stream_matches_icalendar():
+    events = ICalEventStream(io.BytesIO(ICAL_FEED))
+    stream_events = list(events)
+
+    calendar = Calendar.from_ical(ICAL_FEED.decode("utf-8"))
+    reference_events = list(calendar.walk("vevent"))
+
+    assert len(stream_events) == len(reference_events)
+    assert events.calendar_properties["X-WR-TIMEZONE"] == str(calendar.get("X-WR-TIMEZONE"))
+
+    for stream_event, reference_event in zip(stream_events, reference_events):
+        assert stream_event["summary"] == str(reference_event.get("summary"))
+        assert stream_event["location"] == (
+            str(reference_event.get("location")) if reference_event.get("location") is not None else None
+        )
+        assert stream_event["description"] == (
+            str(reference_event.get("description")) if reference_event.get("description") is not None else None
+        )
+        assert stream_event["start"] == reference_event.get("dtstart").dt.strftime("%Y-%m-%d %H:%M:%S")
+        assert stream_event["end"] == reference_event.get("dtend").dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def test_nested_components_are_ignored():
+    first_event = next(iter(ICalEventStream(io.BytesIO(ICAL_FEED))))
+    assert first_event["description"] == "Raum; Hinweise\nZweite Zeile \\ Ende"
+
+
+def test_split_content_line_with_quoted_params():
+    name, params, value = split_content_line('DESCRIPTION;ALTREP="cid:part1;x@example.org":Text: mit Doppelpunkt')
+    assert name == "DESCRIPTION"
+    assert params == {"ALTREP": "cid:part1;x@example.org"}
+    assert value == "Text: mit Doppelpunkt"
+
+
+def test_invalid_date_time():
+    with pytest.raises(ValueError):
+        format_date_time("2024-01-01")
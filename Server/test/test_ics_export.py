@@ -0,0 +1,107 @@
+import datetime
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar.ics_export import iter_ics, render_ics, escape_text, fold_line
+from utils.calendar.calendar_events import calendar_event_index
+from utils.calendar.response_cache import CalendarFeedCache
+
+DATA = {
+    "X-WR-TIMEZONE": "Europe/Berlin",
+    "events": [
+        {
+            "summary": "Mathe; Analysis, Teil 1",
+            "description": {"tags": ["exam"], "person": "Dr. Müller"},
+            "location": "A 101",
+            "start": "2024-10-16 08:00:00",
+            "end": "2024-10-16 09:30:00",
+        },
+        {
+            "summary": "Programmieren",
+            "description": {"tags": []},
+            "location": "None",
+            "start": "2024-01-10 13:00:00",
+            "end": "2024-01-10 14:30:00",
+        },
+    ],
+}
+
+
+def uid_lines(feed: str) -> list:
+    return [line for line in feed.split("\r\n") if line.startswith("UID:")]
+
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_text_is_escaped():
+    assert escape_text("a\\b;c,d\ne") == "a\\\\b\\;c\\,d\\ne"
+
+
+def test_long_lines_are_folded_without_splitting_characters():
+    line = "SUMMARY:" + "ü" * 100
+    folded = fold_line(line)
+    parts = folded[:-2].split("\r\n")
+
+    assert folded.endswith("\r\n")
+    assert all(len(part.encode("utf-8")) <= 75 for part in parts)
+    assert all(part.startswith(" ") for part in parts[1:])
+    assert "".join(part[1:] if index else part for index, part in enumerate(parts)) == line
+
+
+def test_feed_contains_every_event_in_utc():
+    feed = render_ics(DATA, "TINF22B1", "native", 12).decode("utf-8")
+
+    assert feed.startswith("BEGIN:VCALENDAR\r\n") and feed.endswith("END:VCALENDAR\r\n")
+    assert feed.count("BEGIN:VEVENT") == 2
+    assert "DTSTART:20241016T060000Z" in feed  # Summer time (UTC+2)
+    assert "DTSTART:20240110T120000Z" in feed  # Winter time (UTC+1)
+    assert "SUMMARY:Mathe\\; Analysis\\, Teil 1" in feed
+    assert "CATEGORIES:exam" in feed
+    assert "LOCATION:None" not in feed
+
+
+def test_uids_are_the_calendar_and_the_event_keys():
+    feed = render_ics(DATA, "TINF22B1", "native", 12).decode("utf-8")
+    for key in calendar_event_index(DATA):
+        assert f"UID:native-12-{key}@thestudentmaster" in feed
+
+    # The same events in another calendar get other UIDs
+    other = render_ics(DATA, "TINF22B1", "custom", 12).decode("utf-8")
+    assert not set(uid_lines(feed)) & set(uid_lines(other))
+
+
+def test_unknown_timezone_gives_floating_times():
+    feed = render_ics({**DATA, "X-WR-TIMEZONE": "None"}, "TINF22B1", "native", 12).decode("utf-8")
+    assert "DTSTART:20241016T080000\r\n" in feed
+    assert "X-WR-TIMEZONE" not in feed
+
+
+def test_feed_is_streamed_per_event_and_stable():
+    stamp = datetime.datetime(2024, 10, 1, 12, 0, 0)
+    chunks = list(iter_ics(DATA, "TINF22B1", "native", 12, stamp))
+
+    assert len(chunks) == len(DATA["events"]) + 2  # Header, events, footer
+    assert b"".join(chunks) == render_ics(DATA, "TINF22B1", "native", 12, stamp)
+
+
+def test_dtstamp_is_utc():
+    stamp = datetime.datetime(2024, 10, 1, 12, 0, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+    assert "DTSTAMP:20241001T100000Z" in render_ics(DATA, "TINF22B1", "native", 12, stamp).decode("utf-8")
+
+    # Naive times are the local time of the server
+    local = datetime.datetime(2024, 10, 1, 12, 0, 0)
+    expected = local.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    assert f"DTSTAMP:{expected}" in render_ics(DATA, "TINF22B1", "native", 12, local).decode("utf-8")
+
+
+def test_feed_cache_is_keyed_by_hash():
+    cache = CalendarFeedCache(max_size=1)
+    cache.put(("native", 1), "hash-1", b"feed")
+
+    assert cache.get(("native", 1), "hash-1") == b"feed"
+    assert cache.get(("native", 1), "hash-2") is None
+
+    cache.put(("custom", 1), "hash-1", b"other")
+    assert cache.get(("native", 1), "hash-1") is None  # Evicted (max_size)
@@ -0,0 +1,86 @@
+from sqlalchemy import create_engine, Column, Integer, String, TIMESTAMP
+from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import StaticPool
+import datetime
+import pytest
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from middleware.lease import WORKER_ID, claim_leases, release_lease
+
+NOW = datetime.datetime(2024, 1, 15, 12, 0)
+LEASE_SECONDS = 600
+
+Base = declarative_base()
+
+
+class Work(Base):
+    __tablename__ = "work"
+    work_id = Column(Integer, primary_key=True)
+    lease_owner = Column(String(64), nullable=True)
+    lease_expires = Column(TIMESTAMP, nullable=True)
+
+
+###########################################################################
+############################# Helper Functions ############################
+###########################################################################
+
+
+@pytest.fixture
+def db():
+    """Session of an in-memory database with three free work rows."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Work(work_id=work_id) for work_id in (1, 2, 3)])
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def claim(db, now: datetime.datetime = NOW) -> list[int]:
+    return sorted(work.work_id for work in claim_leases(db, db.query(Work), Work, LEASE_SECONDS, now))
+
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_claim_leases_free_rows(db):
+    assert claim(db) == [1, 2, 3]
+
+    work = db.get(Work, 1)
+    assert work.lease_owner == WORKER_ID
+    assert work.lease_expires == NOW + datetime.timedelta(seconds=LEASE_SECONDS)
+
+
+def test_claim_skips_leased_rows(db):
+    db.get(Work, 2).lease_owner = "other-worker"
+    db.get(Work, 2).lease_expires = NOW + datetime.timedelta(minutes=5)
+    db.commit()
+
+    assert claim(db) == [1, 3]
+    assert claim(db) == []  # Everything is leased now
+    assert db.get(Work, 2).lease_owner == "other-worker"
+
+
+def test_expired_lease_is_taken_over(db):
+    assert claim(db) == [1, 2, 3]
+    db.get(Work, 2).lease_owner = "crashed-worker"
+    db.commit()
+
+    # The leases expire after LEASE_SECONDS (a crashed worker does not block the work)
+    assert claim(db, NOW + datetime.timedelta(seconds=LEASE_SECONDS - 1)) == []
+    assert claim(db, NOW + datetime.timedelta(seconds=LEASE_SECONDS)) == [1, 2, 3]
+    assert db.get(Work, 2).lease_owner == WORKER_ID
+
+
+def test_released_row_can_be_claimed_again(db):
+    assert claim(db) == [1, 2, 3]
+
+    release_lease(db.get(Work, 3))
+    db.commit()
+    assert (db.get(Work, 3).lease_owner, db.get(Work, 3).lease_expires) == (None, None)
+    assert claim(db) == [3]
@@ -0,0 +1,53 @@
+from unittest import mock
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar import nativ_sources
+from utils.calendar.nativ_sources import parse_dhbw_ma_catalog, reconcile_sources, fetch_source_catalog
+
+CATALOG_PAGE = b"""<html><body><form><select name="uid">
+<option value="">Kurs auswaehlen</option>
+<option value="Informatik" label="Informatik">Informatik</option>
+<option value="8063001" label="TINF22B1">TINF22B1</option>
+<option value="8063002" label="WWI/22&amp;B">WWI/22&amp;B</option>
+</select></form></body></html>"""
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_parse_dhbw_ma_catalog():
+    # Empty values and group headers (label == value) are skipped, "/" and "&" are replaced
+    assert parse_dhbw_ma_catalog(CATALOG_PAGE) == {"TINF22B1": "8063001", "WWI-22-B": "8063002"}
+
+
+def test_reconcile_sources():
+    existing = {1: ("TINF22B1", "8063001"), 2: ("TINF19A", "1"), 3: ("WWI-22-B", "8063002")}
+    available = {"TINF22B1": "8063001", "WWI-22-B": "8063002", "TINF24A": "9"}
+
+    deleted, kept, new = reconcile_sources(existing, available)
+    assert deleted == [2]
+    assert kept == [1, 3]
+    assert new == {"TINF24A": "9"}
+
+
+def test_unchanged_catalog_is_not_parsed_again():
+    url = "https://example.org/catalog"
+    response = mock.Mock(status_code=200, headers={"etag": '"v1"'}, content=CATALOG_PAGE)
+    parse = mock.Mock(wraps=parse_dhbw_ma_catalog)
+
+    with mock.patch.object(nativ_sources.http_client, "get", return_value=response) as get:
+        first = fetch_source_catalog(url, parse)
+        assert first.changed
+
+        # Server ignores the validators -> same fingerprint, no parsing
+        second = fetch_source_catalog(url, parse)
+        assert not second.changed
+        assert second.sources == first.sources
+        assert get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+        # Server answers 304 -> cached catalog
+        get.return_value = mock.Mock(status_code=304, headers={}, content=b"")
+        assert fetch_source_catalog(url, parse).sources == first.sources
+
+    assert parse.call_count == 1
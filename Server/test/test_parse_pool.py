@@ -0,0 +1,43 @@
+import hashlib
+import gzip
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar.parse_pool import ParsePool, process_ical, calendar_hash, calendar_payload
+from test.test_ical_stream import ICAL_FEED
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_pool_matches_inline():
+    jobs = {"feed": (ICAL_FEED,), "broken": (b"BEGIN:VCALENDAR\r\nNO CONTENT LINE\r\n",)}
+
+    pool = ParsePool(workers=2)
+    try:
+        pooled = pool.map(process_ical, jobs)
+    finally:
+        pool.shutdown()
+    inline = ParsePool(workers=0).map(process_ical, jobs)
+
+    assert pooled["feed"] == inline["feed"]
+    assert pooled["feed"]["hash"] == calendar_hash(dict(pooled["feed"]["data"]))
+    assert len(pooled["feed"]["data"]["events"]) == 4
+
+    # A failed job returns its exception instead of a result
+    assert isinstance(pooled["broken"], ValueError)
+    assert isinstance(inline["broken"], ValueError)
+
+
+def test_calendar_payload_is_serialized_once():
+    data = {"X-WR-TIMEZONE": "Europe/Berlin", "events": [{"summary": "Prüfung", "start": "2024-01-15 08:00:00"}]}
+    result = calendar_payload(data)
+
+    # The hashed bytes are the stored (compressed) bytes and the bytes sent to the clients
+    assert result["hash"] == hashlib.sha1(result["data"].raw).hexdigest() == calendar_hash(data)
+    assert gzip.decompress(result["data"].gzip) == result["data"].raw
+    assert result["data"]["events"] is data["events"]  # No decompression for the following steps
+
+
+def test_empty_jobs():
+    assert ParsePool(workers=2).map(process_ical, {}) == {}
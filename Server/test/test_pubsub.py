@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import pytest
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.notifications.pubsub import NotificationBroker, LocalBroker, calendar_channel, canteen_channel
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_only_subscribed_channels_are_delivered():
+    async def scenario():
+        broker = LocalBroker()
+        subscription = broker.subscribe([calendar_channel("native", 1), canteen_channel("MA")])
+        broker.publish(calendar_channel("native", 1), {"hash": "a"})
+        broker.publish(calendar_channel("native", 2), {"hash": "b"})
+        return await subscription.get(timeout=1)
+
+    assert asyncio.run(scenario()) == [("calendar_native:1", {"hash": "a"})]
+
+
+def test_messages_are_coalesced_per_channel():
+    async def scenario():
+        broker = LocalBroker()
+        subscription = broker.subscribe([calendar_channel("custom", 3)])
+        for calendar_hash in ["a", "b", "c"]:
+            broker.publish(calendar_channel("custom", 3), {"hash": calendar_hash})
+        return await subscription.get(timeout=1)
+
+    assert asyncio.run(scenario()) == [("calendar_custom:3", {"hash": "c"})]
+
+
+def test_publish_from_other_thread_wakes_subscriber():
+    async def scenario():
+        broker = LocalBroker()
+        subscription = broker.subscribe([canteen_channel("MA")])
+        loop = asyncio.get_running_loop()
+        loop.call_later(
+            0.05, lambda: threading.Thread(target=broker.publish, args=("canteen:MA", {"hash": "x"})).start()
+        )
+        return await subscription.get(timeout=5)
+
+    assert asyncio.run(scenario()) == [("canteen:MA", {"hash": "x"})]
+
+
+def test_get_times_out_and_unsubscribe_stops_delivery():
+    async def scenario():
+        broker = LocalBroker()
+        subscription = broker.subscribe([canteen_channel("MA")])
+        assert await subscription.get(timeout=0.01) == []
+
+        broker.unsubscribe(subscription)
+        broker.publish(canteen_channel("MA"), {"hash": "x"})
+        assert broker.subscriber_count() == 0
+        return await subscription.get(timeout=0.01)
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_broker_must_implement_the_interface():
+    class PublishOnlyBroker(NotificationBroker):
+        def publish(self, channel, message):
+            pass
+
+    # A broker missing a method fails when it is created (set_broker at startup), not on the first event stream
+    with pytest.raises(TypeError):
+        PublishOnlyBroker()
+    assert isinstance(LocalBroker(), NotificationBroker)
@@ -0,0 +1,133 @@
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar.rapla_parser import parse_rapla_page
+
+###########################################################################
+################################ Test-Data ################################
+###########################################################################
+
+RAPLA_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Rapla</title></head>
+<body>
+<h2>TINF22B1, Informatik</h2>
+<div class="calendar">
+<table class="week_table">
+<tr>
+<th class="week_number">KW 52</th>
+<td class="week_header" colspan="2"><nobr>Mo 25.12.</nobr></td>
+<td class="week_separatorcell">&nbsp;</td>
+<td class="week_smallseparatorcell">&nbsp;</td>
+<td class="week_header" colspan="2"><nobr>Di 26.12.</nobr></td>
+<td class="week_separatorcell">&nbsp;</td>
+<td class="week_smallseparatorcell">&nbsp;</td>
+</tr>
+<tr>
+<th class="week_times"><nobr>08:00</nobr></th>
+<td class="week_block" rowspan="4" style="background-color:#ffdd00"><a href="#1">08:30&#160;-12:00<br/>Mathematik I online<br/><span class="tooltip"><strong>Vorlesung</strong><br/><table class="infotable"><tr><td class="label">Titel:</td><td class="value">Mathematik I</td></tr></table></span></a><span class="person">Prof. Dr. Beispiel</span><span class="resource">TINF22B1</span></td>
+<td class="week_emptycell_black">&nbsp;</td>
+<td class="week_separatorcell_black">&nbsp;</td>
+<td class="week_smallseparatorcell_black">&nbsp;</td>
+<td class="week_emptycell_black">&nbsp;</td>
+<td class="week_block" rowspan="2" style="background-color: #7FBFFF"><a href="#2">09:00&#160;-10:30<br/>Klausur Datenbanken<br/></a><span class="resource">TINF22B1</span><span class="resource">A 101</span><span class="resource">B 202</span></td>
+<td class="week_separatorcell_black">&nbsp;</td>
+<td class="week_smallseparatorcell_black">&nbsp;</td>
+</tr>
+</table>
+<table class="week_table">
+<tr>
+<th class="week_number">KW 1</th>
+<td class="week_header" colspan="2"><nobr>Mi 03.01.</nobr></td>
+<td class="week_separatorcell">&nbsp;</td>
+<td class="week_smallseparatorcell">&nbsp;</td>
+</tr>
+<tr>
+<th class="week_times"><nobr>13:00</nobr></th>
+<td class="week_block" rowspan="4"><a href="#3">13:00&#160;-16:15<br/>Hybrid-Vorlesung Programmieren<br/></a><span class="person">M. Muster</span><span class="resource">Raum C 303</span></td>
+<td class="week_separatorcell_black">&nbsp;</td>
+<td class="week_smallseparatorcell_black">&nbsp;</td>
+<td class="week_block"><a href="#4">17:00&#160;-18:00<br/>Day offset overflow<br/></a></td>
+</tr>
+</table>
+</div>
+</body>
+</html>
+"""
+
+# Output of the previous BeautifulSoup scraper for RAPLA_PAGE (year 2023)
+EXPECTED_EVENTS = [
+    {
+        "summary": "Mathematik I",
+        "description": {"tags": ["online"], "person": "Prof. Dr. Beispiel", "color": "#ffdd00"},
+        "location": None,
+        "start": "2023-12-25 08:30:00",
+        "end": "2023-12-25 12:00:00",
+    },
+    {
+        "summary": "Klausur Datenbanken",
+        "description": {"tags": ["exam"], "color": "#7FBFFF"},
+        "location": "A 101, B 202",
+        "start": "2023-12-26 09:00:00",
+        "end": "2023-12-26 10:30:00",
+    },
+    {
+        "summary": "Hybrid-Vorlesung Programmieren",
+        "description": {"tags": ["hybrid"], "person": "M. Muster"},
+        "location": "Raum C 303",
+        "start": "2024-01-03 13:00:00",
+        "end": "2024-01-03 16:15:00",
+    },
+]
+
+# Week 1 of 2025 starts on Monday 30.12.2024 (the year changes in the middle of the week)
+RAPLA_PAGE_YEAR_CHANGE = """<!DOCTYPE html>
+<html>
+<body>
+<h2>TINF24B1, Informatik</h2>
+<table class="week_table">
+<tr>
+<th class="week_number">KW 1</th>
+<td class="week_header" colspan="2"><nobr>Mo 30.12.</nobr></td>
+<td class="week_separatorcell">&nbsp;</td>
+<td class="week_smallseparatorcell">&nbsp;</td>
+<td class="week_header" colspan="2"><nobr>Mi 01.01.</nobr></td>
+<td class="week_separatorcell">&nbsp;</td>
+<td class="week_smallseparatorcell">&nbsp;</td>
+</tr>
+<tr>
+<th class="week_times"><nobr>08:00</nobr></th>
+<td class="week_block"><a href="#1">08:00&#160;-09:00<br/>Mathematik I<br/></a></td>
+<td class="week_separatorcell_black">&nbsp;</td>
+<td class="week_smallseparatorcell_black">&nbsp;</td>
+<td class="week_block"><a href="#2">10:00&#160;-11:00<br/>Programmieren<br/></a></td>
+<td class="week_separatorcell_black">&nbsp;</td>
+<td class="week_smallseparatorcell_black">&nbsp;</td>
+</tr>
+</table>
+</body>
+</html>
+"""
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_parse_rapla_page():
+    data = parse_rapla_page(RAPLA_PAGE, year=2023)
+    assert data == {"X-WR-TIMEZONE": "Europe/Berlin", "events": EXPECTED_EVENTS}
+
+
+def test_parse_rapla_page_with_tbody():
+    page = RAPLA_PAGE.replace('<table class="week_table">', '<table class="week_table"><tbody>').replace(
+        "</table>\n", "</tbody></table>\n"
+    )
+    assert parse_rapla_page(page, year=2023)["events"] == EXPECTED_EVENTS
+
+
+def test_year_changes_within_a_week():
+    # * The week number (KW 1) already belongs to the new year, the date headers decide the year of each day
+    events = parse_rapla_page(RAPLA_PAGE_YEAR_CHANGE, year=2024)["events"]
+    assert [(event["summary"], event["start"]) for event in events] == [
+        ("Mathematik I", "2024-12-30 08:00:00"),
+        ("Programmieren", "2025-01-01 10:00:00"),
+    ]
@@ -0,0 +1,88 @@
+import datetime
+from unittest import mock
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar import calendar_wrapper
+from utils.calendar.calendar_wrapper import CalendarWrapper
+from utils.calendar.rapla_windows import rapla_window_starts, rapla_window_url, merge_window_events
+from utils.network.fetch_engine import FetchResult
+from test.test_rapla_parser import RAPLA_PAGE, EXPECTED_EVENTS
+
+###########################################################################
+################################ Test-Data ################################
+###########################################################################
+
+RAPLA_SOURCE = "https://rapla.example.org/rapla/calendar?key=abc&salt=123&day=1&month=1&year=2020&prev=%3C%3C"
+
+
+class StaticFetchEngine:
+    """Answers every request with the same page and records the requested urls and validators"""
+
+    def __init__(self, page: bytes):
+        self.page = page
+        self.requests = []
+
+    def fetch_all(self, urls, validators=None):
+        self.requests.append((urls, validators))
+        return {key: FetchResult(url=url, status_code=200, content=self.page) for key, url in urls.items()}
+
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_window_starts_are_week_aligned():
+    starts = rapla_window_starts(datetime.date(2024, 10, 16), weeks_back=2, weeks_ahead=5, weeks_per_window=4)
+    assert starts == [datetime.date(2024, 9, 30), datetime.date(2024, 10, 28)]
+    assert all(start.weekday() == 0 for start in starts)
+
+
+def test_window_url_replaces_date_params():
+    url = rapla_window_url(RAPLA_SOURCE, datetime.date(2024, 9, 30), weeks=4)
+    assert url == "https://rapla.example.org/rapla/calendar?key=abc&salt=123&day=30&month=9&year=2024&pages=4"
+
+
+def test_merge_window_events_deduplicates():
+    merged = merge_window_events([EXPECTED_EVENTS[1:], EXPECTED_EVENTS[:2]])
+    assert merged == EXPECTED_EVENTS
+
+
+def test_rapla_windows_are_merged_and_cached():
+    fetch_engine = StaticFetchEngine(RAPLA_PAGE.encode("utf-8"))
+    wrapper = CalendarWrapper("Rapla", fetch_engine=fetch_engine)
+
+    # Every window renders the same weeks (starting in 2023) -> merged to the events of a single page
+    with mock.patch.object(calendar_wrapper, "rapla_windows") as rapla_windows:
+        rapla_windows.return_value = {
+            datetime.date(2023, 12, 25): RAPLA_SOURCE + "&w=1",
+            datetime.date(2023, 12, 18): RAPLA_SOURCE + "&w=2",
+        }
+        result = wrapper.get_data(RAPLA_SOURCE)
+        assert result["data"]["events"] == EXPECTED_EVENTS
+
+        # Unchanged windows are served from the page cache without parsing them again
+        with mock.patch.object(calendar_wrapper.parse_pool, "map", wraps=calendar_wrapper.parse_pool.map) as parse:
+            assert wrapper.get_data(RAPLA_SOURCE)["hash"] == result["hash"]
+            assert all(not call.args[1] for call in parse.call_args_list)
+
+    assert len(fetch_engine.requests) == 2
+
+
+def test_unchanged_rapla_windows_are_not_modified():
+    wrapper = CalendarWrapper("Rapla", fetch_engine=StaticFetchEngine(RAPLA_PAGE.encode("utf-8")))
+
+    with mock.patch.object(calendar_wrapper, "rapla_windows") as rapla_windows:
+        rapla_windows.return_value = {datetime.date(2023, 12, 25): RAPLA_SOURCE}
+        result = wrapper.get_data(RAPLA_SOURCE)
+        assert result["validators"]["fingerprint"]
+
+        # Same windows with the same content -> no data, only the validators
+        assert wrapper.get_data(RAPLA_SOURCE, result["validators"]) == {
+            "not_modified": True,
+            "validators": result["validators"],
+        }
+
+        # The horizon moved -> different windows -> parsed again
+        rapla_windows.return_value = {datetime.date(2023, 12, 18): RAPLA_SOURCE + "&w=2"}
+        assert "data" in wrapper.get_data(RAPLA_SOURCE, result["validators"])
@@ -0,0 +1,255 @@
+from unittest import mock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import datetime
+import pytest
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.database import Base
+from config.calendar import REFRESH_DEFAULT_SECONDS
+from config.canteen import CANTEEN_WEEKS
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from models.sql_models import m_auth, m_calendar, m_canteen, m_general, m_user  # All models for the mappers
+from middleware import canteen as canteen_middleware
+from middleware import calendar as calendar_middleware
+from middleware.calendar import claim_calendar_refreshes, record_refresh_outcomes
+from middleware.lease import WORKER_ID
+from utils.calendar.nativ_sources import SourceCatalog
+from utils.calendar.refresh_schedule import RefreshOutcome
+from utils.network.upstream_guard import CircuitOpen
+
+NOW = datetime.datetime(2024, 1, 15, 12, 0)
+
+TABLES = [
+    m_calendar.University.__table__,
+    m_calendar.CalendarBackend.__table__,
+    m_calendar.CalendarNative.__table__,
+    m_calendar.CalendarEvent.__table__,
+    m_calendar.CalendarRefreshState.__table__,
+    m_canteen.Canteen.__table__,
+    m_canteen.Dish.__table__,
+    m_canteen.Menu.__table__,
+    m_canteen.CanteenRefreshState.__table__,
+]
+
+###########################################################################
+############################# Helper Functions ############################
+###########################################################################
+
+
+@pytest.fixture
+def db():
+    """Session of an in-memory database with the refresh tables (the leases are the same on MariaDB)."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=TABLES)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def calendar_state(db, calendar_id: int) -> m_calendar.CalendarRefreshState:
+    state = m_calendar.CalendarRefreshState
+    return db.query(state).filter(state.native_calendar_id == calendar_id).one()
+
+
+def add_canteens(db, *canteen_ids: int):
+    for canteen_id in canteen_ids:
+        canteen = m_canteen.Canteen(
+            canteen_name=f"Mensa {canteen_id}", canteen_short_name=f"m{canteen_id}", address_id=1
+        )
+        canteen.canteen_id = canteen_id
+        canteen.last_modified = NOW
+        db.add(canteen)
+    db.commit()
+
+
+def canteen_week(db, canteen_id: int, week_offset: int) -> m_canteen.CanteenRefreshState:
+    state = m_canteen.CanteenRefreshState
+    return db.query(state).filter_by(canteen_id=canteen_id, week_offset=week_offset).one()
+
+
+def update_menus(db, menu_to_db) -> list[tuple[int, int]]:
+    """Run update_canteen_menus with a fake menu download. Returns the fetched (canteen_id, week_offset)."""
+    fetched = []
+
+    def fetch(db, canteen_id, week_offset):
+        fetched.append((canteen_id, week_offset))
+        return menu_to_db(canteen_id, week_offset)
+
+    with (
+        mock.patch.object(canteen_middleware, "canteen_menu_to_db", side_effect=fetch),
+        mock.patch.object(canteen_middleware, "datetime", wraps=datetime.datetime) as clock,
+    ):
+        clock.now.return_value = NOW
+        canteen_middleware.update_canteen_menus(db, mock.Mock(), 1)
+    return sorted(fetched)
+
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+# ======================================================== #
+# ====================== Calendars ======================= #
+# ======================================================== #
+
+
+def test_claim_calendar_refreshes(db):
+    # Calendars without a refresh state are due now and get one
+    assert sorted(claim_calendar_refreshes(db, m_calendar.CalendarNative, [1, 2], NOW)) == [1, 2]
+    assert calendar_state(db, 1).lease_owner == WORKER_ID
+    assert calendar_state(db, 1).refresh_interval == REFRESH_DEFAULT_SECONDS
+
+    # Already leased -> skipped, not due -> skipped
+    calendar_state(db, 2).lease_owner = None
+    calendar_state(db, 2).lease_expires = None
+    calendar_state(db, 2).next_due = NOW + datetime.timedelta(minutes=5)
+    db.commit()
+    assert claim_calendar_refreshes(db, m_calendar.CalendarNative, [1, 2, 3], NOW) == [3]
+
+
+def test_calendar_lease_expires(db):
+    assert claim_calendar_refreshes(db, m_calendar.CalendarNative, [1], NOW) == [1]
+    calendar_state(db, 1).lease_owner = "crashed-worker"
+    db.commit()
+
+    later = NOW + datetime.timedelta(hours=1)
+    assert claim_calendar_refreshes(db, m_calendar.CalendarNative, [1], later) == [1]
+    assert calendar_state(db, 1).lease_owner == WORKER_ID
+
+
+def test_record_refresh_outcomes_releases_leases(db):
+    claim_calendar_refreshes(db, m_calendar.CalendarNative, [1, 2], NOW)
+    calendars = {calendar_id: m_calendar.CalendarNative(calendar_native_id=calendar_id) for calendar_id in (1, 2)}
+
+    record_refresh_outcomes(db, calendars, {1: RefreshOutcome(changed=True), 2: RefreshOutcome(failed=True)}, NOW)
+    db.commit()
+
+    for calendar_id in (1, 2):
+        state = calendar_state(db, calendar_id)
+        assert (state.lease_owner, state.lease_expires) == (None, None)
+        assert state.next_due > NOW
+    assert (calendar_state(db, 1).change_count, calendar_state(db, 2).failure_count) == (1, 1)
+
+    # Released, but only claimed again once they are due
+    assert claim_calendar_refreshes(db, m_calendar.CalendarNative, [1, 2], NOW) == []
+    later = NOW + datetime.timedelta(days=1)
+    assert sorted(claim_calendar_refreshes(db, m_calendar.CalendarNative, [1, 2], later)) == [1, 2]
+
+
+def test_custom_refresh_interval_is_a_floor(db):
+    claim_calendar_refreshes(db, m_calendar.CalendarCustom, [1], NOW)
+    calendars = {1: m_calendar.CalendarCustom(calendar_custom_id=1, refresh_interval=60)}  # Minutes
+
+    # A changed calendar is refreshed sooner, but not before the interval its owner configured
+    record_refresh_outcomes(db, calendars, {1: RefreshOutcome(changed=True)}, NOW)
+    db.commit()
+
+    state = m_calendar.CalendarRefreshState
+    custom_state = db.query(state).filter(state.custom_calendar_id == 1).one()
+    assert custom_state.refresh_interval == 60 * 60
+    assert custom_state.next_due == NOW + datetime.timedelta(hours=1)
+
+
+# ======================================================== #
+# ======================= Canteens ======================= #
+# ======================================================== #
+
+
+def test_canteen_weeks_are_leased_and_released(db):
+    add_canteens(db, 1, 2)
+    weeks = [(canteen_id, week) for canteen_id in (1, 2) for week in range(CANTEEN_WEEKS)]
+
+    assert update_menus(db, lambda canteen_id, week_offset: True) == weeks
+    for canteen_id, week in weeks:
+        state = canteen_week(db, canteen_id, week)
+        assert (state.lease_owner, state.lease_expires, state.last_refreshed) == (None, None, NOW)
+
+    # Refreshed recently -> not fetched again
+    assert update_menus(db, lambda canteen_id, week_offset: True) == []
+
+
+def test_canteen_week_leased_by_another_worker_is_skipped(db):
+    add_canteens(db, 1)
+    update_menus(db, lambda canteen_id, week_offset: False)  # Creates the refresh states, nothing refreshed
+    state = canteen_week(db, 1, 0)
+    state.lease_owner = "other-worker"
+    state.lease_expires = NOW + datetime.timedelta(minutes=5)
+    db.commit()
+
+    assert (1, 0) not in update_menus(db, lambda canteen_id, week_offset: True)
+    assert canteen_week(db, 1, 0).lease_owner == "other-worker"
+
+    # The lease expired (worker crashed) -> taken over
+    canteen_week(db, 1, 0).lease_expires = NOW - datetime.timedelta(seconds=1)
+    db.commit()
+    assert update_menus(db, lambda canteen_id, week_offset: True) == [(1, 0)]
+
+
+def test_failing_canteen_week_does_not_stop_the_others(db):
+    add_canteens(db, 1, 2)
+
+    def menu_to_db(canteen_id, week_offset):
+        if canteen_id == 1 and week_offset == 0:
+            raise CircuitOpen("www.stw-ma.de is unavailable (circuit open)")
+        return True
+
+    assert len(update_menus(db, menu_to_db)) == 2 * CANTEEN_WEEKS
+
+    failed = canteen_week(db, 1, 0)
+    assert (failed.lease_owner, failed.lease_expires, failed.last_refreshed) == (None, None, None)
+    assert canteen_week(db, 2, 0).last_refreshed == NOW
+
+    # Only the failed week is fetched again
+    assert update_menus(db, lambda canteen_id, week_offset: True) == [(1, 0)]
+    assert canteen_week(db, 1, 0).last_refreshed == NOW
+
+
+# ======================================================== #
+# ======================= Catalog ======================== #
+# ======================================================== #
+
+
+def test_calendar_added_by_another_worker_is_skipped(db):
+    db.add(m_calendar.University(university_id=1, university_name="Duale Hochschule Baden-Wuerttemberg Mannheim"))
+    db.add(m_calendar.CalendarBackend(calendar_backend_id=1, backend_name="iCalendar"))
+    db.commit()
+    catalog = SourceCatalog(sources={"TINF22AI1": "1", "TINF22AI2": "2"}, validators={}, changed=True)
+    data = {"events": [{"summary": "Mathe", "start": "2024-01-15 08:00:00", "end": "2024-01-15 10:00:00"}]}
+
+    def get_data(sources):
+        # Another worker adds TINF22AI1 while this worker downloads the new calendars
+        db.execute(
+            m_calendar.CalendarNative.__table__.insert(),
+            {
+                "university_id": 1,
+                "course_name": "TINF22AI1",
+                "source_backend_id": 1,
+                "source": "1",
+                "data": data,
+                "hash": "other-worker",
+                "last_modified": NOW,
+                "guest_last_accessed": NOW,
+            },
+        )
+        return {key: {"data": data, "hash": "this-worker"} for key in sources}, {}
+
+    progress = mock.Mock()
+    with (
+        mock.patch.object(calendar_middleware.nativ_sources, "get_catalog_dhbw_ma", return_value=catalog),
+        mock.patch.object(calendar_middleware, "CalendarWrapper") as wrapper,
+        mock.patch.object(calendar_middleware, "native_refresh_queue"),
+    ):
+        wrapper.return_value.get_data.side_effect = get_data
+        calendar_middleware.update_all_native_calendars(db, progress, 1)
+
+    # The conflict only skips TINF22AI1, TINF22AI2 is added with its events
+    hashes = dict(db.query(m_calendar.CalendarNative.course_name, m_calendar.CalendarNative.hash))
+    assert hashes == {"TINF22AI1": "other-worker", "TINF22AI2": "this-worker"}
+    assert db.query(m_calendar.CalendarEvent).count() == 1
+    assert "Done!" in progress.update.call_args.kwargs["description"]
@@ -0,0 +1,35 @@
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar.refresh_queue import RefreshQueue, PRIORITY_LINKED, PRIORITY_GUEST, PRIORITY_SWEEP
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_calendar_is_queued_once():
+    queue = RefreshQueue()
+    assert queue.enqueue([1, 2, 3], PRIORITY_SWEEP) == 3
+    assert queue.enqueue([2, 3], PRIORITY_GUEST) == 0
+    assert queue.enqueue([3], PRIORITY_LINKED) == 0
+
+    assert len(queue) == 3
+    assert queue.drain() == [3, 2, 1]
+    assert len(queue) == 0
+
+
+def test_lower_priority_does_not_demote():
+    queue = RefreshQueue()
+    queue.enqueue([1], PRIORITY_LINKED)
+    queue.enqueue([2], PRIORITY_GUEST)
+    queue.enqueue([1], PRIORITY_SWEEP)
+
+    assert queue.drain() == [1, 2]
+
+
+def test_drain_limit_keeps_rest_queued():
+    queue = RefreshQueue()
+    queue.enqueue([1, 2, 3], PRIORITY_SWEEP)
+    queue.enqueue([4], PRIORITY_LINKED)
+
+    assert queue.drain(2) == [4, 1]
+    assert queue.drain() == [2, 3]
@@ -0,0 +1,52 @@
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.calendar import (
+    REFRESH_MIN_SECONDS,
+    REFRESH_DEFAULT_SECONDS,
+    REFRESH_MAX_SECONDS,
+    REFRESH_EXAM_MAX_SECONDS,
+)
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar.refresh_schedule import RefreshOutcome, next_refresh_interval
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_unchanged_calendar_backs_off_to_max():
+    interval = None
+    intervals = []
+    for _ in range(20):
+        interval = next_refresh_interval(interval, RefreshOutcome(changed=False))
+        intervals.append(interval)
+
+    assert intervals[0] > REFRESH_DEFAULT_SECONDS
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == REFRESH_MAX_SECONDS
+
+
+def test_changed_calendar_tightens_to_min():
+    interval = REFRESH_MAX_SECONDS
+    for _ in range(20):
+        interval = next_refresh_interval(interval, RefreshOutcome(changed=True))
+    assert interval == REFRESH_MIN_SECONDS
+
+    # A single change after a stable phase shrinks more than an unchanged fetch grows
+    assert next_refresh_interval(REFRESH_DEFAULT_SECONDS, RefreshOutcome(changed=True)) < REFRESH_DEFAULT_SECONDS
+
+
+def test_failed_fetch_does_not_tighten():
+    assert next_refresh_interval(REFRESH_DEFAULT_SECONDS, RefreshOutcome(failed=True)) > REFRESH_DEFAULT_SECONDS
+
+
+def test_upcoming_exam_caps_interval():
+    assert next_refresh_interval(REFRESH_MAX_SECONDS, RefreshOutcome(), exam_upcoming=True) == REFRESH_EXAM_MAX_SECONDS
+
+
+def test_min_interval_of_custom_calendar():
+    # The refresh interval of a custom calendar is a floor (never refreshed more often than its owner configured)
+    floor = 30 * 60
+    assert next_refresh_interval(REFRESH_MIN_SECONDS, RefreshOutcome(changed=True), min_interval=floor) == floor
+    assert next_refresh_interval(REFRESH_MAX_SECONDS, RefreshOutcome(), exam_upcoming=True, min_interval=floor) == floor
+    assert next_refresh_interval(REFRESH_MAX_SECONDS, RefreshOutcome(), min_interval=floor) == REFRESH_MAX_SECONDS
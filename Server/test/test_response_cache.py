@@ -0,0 +1,78 @@
+import gzip
+import json
+import time
+import uuid
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.calendar.response_cache import CalendarResponseCache, CalendarCatalogCache
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_cached_response_is_encoded_once():
+    cache = CalendarResponseCache()
+    body = b'{"course_name":"TINF22B1","data":{"events":[]},"hash":"abc"}'
+    cache.put(("uuid", "TINF22B1"), 1, "abc", body)
+
+    entry = cache.get(("uuid", "TINF22B1"))
+    assert entry.raw == body
+    assert gzip.decompress(entry.gzip) == body
+    assert entry.hash == "abc"
+
+
+def test_invalidate_by_calendar_id():
+    cache = CalendarResponseCache()
+    cache.put(("uuid", "TINF22B1"), 1, "abc", b"{}")
+    cache.put(("uuid", "TINF22B2"), 2, "def", b"{}")
+
+    cache.invalidate(1)
+
+    assert cache.get(("uuid", "TINF22B1")) is None
+    assert cache.get(("uuid", "TINF22B2")) is not None
+
+
+def test_entries_expire_and_are_bounded():
+    cache = CalendarResponseCache(max_size=2, ttl=0.05)
+    for calendar_id in range(3):
+        cache.put(calendar_id, calendar_id, "hash", b"{}")
+
+    assert cache.get(0) is None  # Least recently used entry was dropped
+    assert cache.get(2) is not None
+
+    time.sleep(0.1)
+    assert cache.get(2) is None
+
+
+def test_catalog_per_university():
+    cache = CalendarCatalogCache()
+    university_uuid = uuid.uuid4()
+    universities = {university_uuid: b'{"university_name":"DHBW"}', uuid.uuid4(): b'{"university_name":"KIT"}'}
+
+    assert cache.get() is None
+    catalog = cache.put(universities, cache.generation)
+
+    assert json.loads(catalog.body) == [{"university_name": "DHBW"}, {"university_name": "KIT"}]
+    assert json.loads(cache.get(university_uuid).body) == [{"university_name": "DHBW"}]
+    assert cache.get(uuid.uuid4()).body == b"[]"
+    assert cache.get(university_uuid).etag != catalog.etag
+
+
+def test_catalog_built_before_invalidation_is_not_cached():
+    cache = CalendarCatalogCache()
+    generation = cache.generation
+    cache.invalidate()  # e.g. a refresh added a calendar while the catalog was built
+
+    assert cache.put({}, generation).body == b"[]"
+    assert cache.get() is None
+
+
+def test_catalog_expires():
+    # Another process may have added calendars (invalidate only reaches this process)
+    cache = CalendarCatalogCache(ttl=0.05)
+    cache.put({uuid.uuid4(): b'{"university_name":"DHBW"}'}, cache.generation)
+    assert cache.get() is not None
+
+    time.sleep(0.1)
+    assert cache.get() is None
@@ -0,0 +1,126 @@
+from sqlalchemy import create_engine, inspect, insert, select, type_coerce, Column, MetaData, Table, LargeBinary
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import datetime
+import json
+import pytest
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from models.sql_models import m_auth, m_calendar, m_canteen, m_general, m_user  # All models for the mappers
+from models.sql_models.compressed_json import PAYLOAD_VERSION_GZIP, decode_payload
+from middleware.calendar import migrateCalendarTables
+from middleware.canteen import migrateCanteenTables
+
+NOW = datetime.datetime(2024, 1, 15, 12, 0)
+
+# Columns added to the tables of an older deployment
+NEW_COLUMNS = {
+    m_calendar.CalendarNative: [
+        "timezone",
+        "source_etag",
+        "source_last_modified",
+        "source_content_length",
+        "source_fingerprint",
+    ],
+    m_calendar.CalendarCustom: [
+        "timezone",
+        "source_etag",
+        "source_last_modified",
+        "source_content_length",
+        "source_fingerprint",
+        "feed_token",
+    ],
+    m_canteen.Canteen: ["menu_hash"],
+}
+
+DATA = {"X-WR-TIMEZONE": "Europe/Berlin", "events": [{"summary": "Mathe", "start": "2024-01-15 08:00:00"}]}
+
+###########################################################################
+############################# Helper Functions ############################
+###########################################################################
+
+
+@pytest.fixture
+def db():
+    """Session of an in-memory database with the tables as they were before the new columns (plain JSON rows)."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    metadata = MetaData()
+    old_tables = {
+        model: Table(
+            model.__tablename__,
+            metadata,
+            *(
+                Column(column.name, column.type, primary_key=column.primary_key)
+                for column in model.__table__.columns
+                if column.name not in new_columns
+            ),
+        )
+        for model, new_columns in NEW_COLUMNS.items()
+    }
+    metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        for model in (m_calendar.CalendarNative, m_calendar.CalendarCustom):
+            table = old_tables[model]
+            connection.execute(
+                insert(table).values(
+                    {
+                        model.__table__.primary_key.columns[0].name: 1,
+                        "course_name": "TINF22AI1",
+                        "data": type_coerce(json.dumps(DATA).encode(), LargeBinary),
+                        "last_modified": NOW,
+                    }
+                )
+            )
+
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def stored_data(db, model) -> bytes:
+    return db.scalar(select(type_coerce(model.__table__.columns.data, LargeBinary)))
+
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_migration_adds_the_new_columns(db):
+    migrateCanteenTables(db)
+    migrateCalendarTables(db)
+
+    for model, new_columns in NEW_COLUMNS.items():
+        columns = {column["name"] for column in inspect(db.get_bind()).get_columns(model.__tablename__)}
+        assert set(new_columns) <= columns
+
+    # The unique feed token of the custom calendars has its index
+    indexes = inspect(db.get_bind()).get_indexes(m_calendar.CalendarCustom.__tablename__)
+    assert [(index["column_names"], index["unique"]) for index in indexes] == [(["feed_token"], 1)]
+
+
+def test_migration_compresses_the_stored_data(db):
+    migrateCalendarTables(db)
+
+    for model in (m_calendar.CalendarNative, m_calendar.CalendarCustom):
+        stored = stored_data(db, model)
+        assert stored[:1] == PAYLOAD_VERSION_GZIP
+        assert json.loads(decode_payload(stored)) == DATA
+
+        # The rows are still readable through the model and keep their last_modified
+        calendar = db.query(model).one()
+        assert calendar.data["events"] == DATA["events"]
+        assert calendar.last_modified == NOW
+
+
+def test_migration_is_idempotent(db):
+    migrateCanteenTables(db)
+    migrateCalendarTables(db)
+    stored = stored_data(db, m_calendar.CalendarNative)
+
+    migrateCanteenTables(db)
+    migrateCalendarTables(db)
+    assert stored_data(db, m_calendar.CalendarNative) == stored
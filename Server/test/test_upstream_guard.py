@@ -0,0 +1,96 @@
+from unittest import mock
+import pytest
+
+# ~~~~~~~~~~~~~~~ Test-Asset ~~~~~~~~~~~~~~ #
+from utils.network import upstream_guard as guard_module
+from utils.network.upstream_guard import (
+    UpstreamGuard,
+    CircuitBreaker,
+    TokenBucket,
+    CircuitOpen,
+    STATE_CLOSED,
+    STATE_OPEN,
+    STATE_HALF_OPEN,
+)
+
+URL = "https://vorlesungsplan.dhbw-mannheim.de/ical.php?uid=1"
+
+###########################################################################
+################################ Main Tests ###############################
+###########################################################################
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # Only consecutive failures count
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["total_rejected"] == 1
+
+
+def test_breaker_probes_half_open():
+    with mock.patch.object(guard_module.time, "monotonic", return_value=1000.0) as monotonic:
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+        breaker.record_failure()
+        assert not breaker.allow()
+
+        # After the reset time exactly one probe is let through
+        monotonic.return_value = 1060.0
+        assert breaker.allow()
+        assert breaker.state == STATE_HALF_OPEN
+        assert not breaker.allow()
+
+        # Failed probe -> open again, successful probe -> closed
+        breaker.record_failure()
+        assert breaker.state == STATE_OPEN
+        monotonic.return_value = 1120.0
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == STATE_CLOSED
+        assert breaker.allow()
+
+
+def test_breaker_releases_probe_without_outcome():
+    with mock.patch.object(guard_module.time, "monotonic", return_value=1000.0) as monotonic:
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+        breaker.record_failure()
+        monotonic.return_value = 1060.0
+        assert breaker.allow()
+
+        # The probe was cancelled -> still half open, the next request is the probe
+        breaker.release_probe()
+        assert breaker.state == STATE_HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()
+
+
+def test_token_bucket_spaces_requests():
+    with mock.patch.object(guard_module.time, "monotonic", return_value=0.0) as monotonic:
+        bucket = TokenBucket(rate=2, capacity=2)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.5)
+        assert bucket.reserve() == pytest.approx(1.0)
+
+        monotonic.return_value = 10.0  # Refilled (up to the capacity)
+        assert bucket.reserve() == 0
+
+
+def test_guard_is_per_host():
+    guard = UpstreamGuard(breaker_factory=lambda: CircuitBreaker(failure_threshold=1, reset_seconds=60))
+    guard.acquire(URL)
+    guard.record(URL, success=False)
+
+    with pytest.raises(CircuitOpen):
+        guard.acquire(URL)
+    assert guard.acquire("https://www.stw-ma.de/menu") == 0
+
+    states = guard.states()
+    assert states["vorlesungsplan.dhbw-mannheim.de"]["state"] == STATE_OPEN
+    assert states["www.stw-ma.de"]["state"] == STATE_CLOSED
@@ -0,0 +1,42 @@
+from typing import Dict
+import threading
+import datetime
+
+# Last guest access per native calendar, collected in memory on the GET path.
+# The accesses are written to CalendarNative.guest_last_accessed in one batched UPDATE by a scheduled task
+# (see middleware.calendar.flush_guest_accesses), so a request never waits for a write transaction.
+
+
+class AccessTracker:
+    def __init__(self):
+        self.__accesses: Dict[int, datetime.datetime] = {}
+        self.__lock = threading.Lock()
+
+    def record(self, calendar_id: int, accessed: datetime.datetime = None):
+        accessed = accessed or datetime.datetime.now()
+        with self.__lock:
+            current = self.__accesses.get(calendar_id)
+            if current is None or accessed > current:
+                self.__accesses[calendar_id] = accessed  # * Only the newest access per calendar is written
+
+    def drain(self) -> Dict[int, datetime.datetime]:
+        """Take all recorded accesses (the tracker is empty afterwards)."""
+        with self.__lock:
+            accesses, self.__accesses = self.__accesses, {}
+        return accesses
+
+    def restore(self, accesses: Dict[int, datetime.datetime]):
+        """Put back drained accesses that could not be written (newer accesses are kept)."""
+        for calendar_id, accessed in accesses.items():
+            self.record(calendar_id, accessed)
+
+    def __len__(self) -> int:
+        return len(self.__accesses)
+
+
+guest_access_tracker = AccessTracker()  # * Shared by all requests of the process
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# guest_access_tracker.record(calendar.calendar_native_id)  # on every guest GET
+# guest_access_tracker.drain()  # -> {17: datetime.datetime(2024, 10, 16, 9, 41, 3), ...} (scheduled flush)
@@ -0,0 +1,115 @@
+from typing import Any, Dict, List, Tuple
+import datetime
+import hashlib
+
+# Conversion of the calendar json format to rows of the calendar_events table and the diff between two states.
+# Every event gets a stable identity (event_key) from its summary, its start and its occurrence (the n-th
+# event with the same summary and start), so a refresh only has to insert, update or delete the changed rows.
+
+EVENT_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+EVENT_COLUMNS = ("summary", "description", "location", "event_start", "event_end")
+
+
+def event_key(summary: str | None, start: str, occurrence: int = 0) -> str:
+    return hashlib.sha1(f"{summary}|{start}|{occurrence}".encode("utf-8")).hexdigest()
+
+
+def calendar_event_index(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Get the events of the calendar json format by event_key."""
+    events = {}
+    occurrences = {}
+    for event in (data or {}).get("events", []):
+        identity = (event.get("summary"), event["start"])
+        occurrence = occurrences.get(identity, 0)
+        occurrences[identity] = occurrence + 1
+        events[event_key(*identity, occurrence)] = event
+    return events
+
+
+def event_row(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert an event of the calendar json format to the columns of its row."""
+    return {
+        "summary": event.get("summary"),
+        "description": event.get("description"),
+        "location": event.get("location"),
+        "event_start": datetime.datetime.strptime(event["start"], EVENT_DATE_FORMAT),
+        "event_end": datetime.datetime.strptime(event["end"], EVENT_DATE_FORMAT),
+    }
+
+
+def calendar_event_rows(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Convert the events of the calendar json format to rows by event_key."""
+    return {key: event_row(event) for key, event in calendar_event_index(data).items()}
+
+
+def event_from_row(key: str | None, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a row back to an event of the calendar json format (with its key if given)."""
+    event = {"key": key} if key else {}
+    event.update(
+        {
+            "summary": row["summary"],
+            "description": row["description"],
+            "location": row["location"],
+            "start": row["event_start"].strftime(EVENT_DATE_FORMAT),
+            "end": row["event_end"].strftime(EVENT_DATE_FORMAT),
+        }
+    )
+    return event
+
+
+def diff_calendar_events(
+    existing: Dict[str, Tuple[int, Dict[str, Any]]], rows: Dict[str, Dict[str, Any]]
+) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[Tuple[int, Dict[str, Any]]], List[int]]:
+    """Diff the stored events (event_key -> (id, row)) against the new rows (event_key -> row).
+
+    Returns (inserts [(event_key, row)], updates [(id, row)], deletes [id]).
+    """
+    inserts = []
+    updates = []
+    for key, row in rows.items():
+        if key not in existing:
+            inserts.append((key, row))
+            continue
+
+        event_id, stored_row = existing[key]
+        if any(stored_row.get(column) != row[column] for column in EVENT_COLUMNS):
+            updates.append((event_id, row))
+
+    deletes = [event_id for key, (event_id, _) in existing.items() if key not in rows]
+    return inserts, updates, deletes
+
+
+###########################################################################
+################################ Changesets ###############################
+###########################################################################
+# A changeset describes the change between two versions of a calendar:
+# {"added": [event, ...], "changed": [event, ...], "removed": [event, ...]} (every event with its "key")
+
+
+def compose_changesets(changesets: List[Dict[str, List[Dict[str, Any]]]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Combine consecutive changesets (oldest first) to a single changeset from the first to the last version."""
+    state = {}  # event_key -> (kind, event)
+    for changeset in changesets:
+        for event in changeset.get("added", []):
+            previous = state.get(event["key"])
+            state[event["key"]] = ("changed" if previous and previous[0] == "removed" else "added", event)
+        for event in changeset.get("changed", []):
+            previous = state.get(event["key"])
+            state[event["key"]] = ("added" if previous and previous[0] == "added" else "changed", event)
+        for event in changeset.get("removed", []):
+            previous = state.get(event["key"])
+            if previous and previous[0] == "added":
+                del state[event["key"]]  # Added and removed again -> the client never saw it
+            else:
+                state[event["key"]] = ("removed", event)
+
+    composed = {"added": [], "changed": [], "removed": []}
+    for kind, event in state.values():
+        composed[kind].append(event)
+    return composed
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# rows = calendar_event_rows({"events": [{"summary": "Mathe", "start": "2024-01-01 08:00:00", ...}]})
+# -> {"3f7c...": {"summary": "Mathe", "description": {...}, "location": "A 101", "event_start": datetime(...), ...}}
+# diff_calendar_events(stored_rows, rows) -> ([("9ab1...", {...})], [(17, {...})], [18, 19])
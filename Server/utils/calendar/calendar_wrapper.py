@@ -1,13 +1,15 @@
-from typing import List
-from icalendar import Calendar
-import requests
-from time import sleep
-import hashlib
-import json
-from typing import Dict, Any
-import re
-import datetime
-from bs4 import BeautifulSoup
+from typing import Any, Callable, Dict, Hashable, List
+
+# ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
+from utils.calendar.parse_pool import parse_pool, calendar_payload, process_ical, process_rapla_window
+from utils.calendar.rapla_windows import rapla_windows, rapla_page_cache, merge_window_events
+from utils.network.fetch_engine import (
+    FetchEngine,
+    FetchResult,
+    response_validators,
+    is_unchanged,
+    payload_fingerprint,
+)
 
 
 # TODO Max size of source
@@ -17,6 +19,7 @@ class CalendarWrapper:  # * source_model could be provided (only for threading a
         backend: str,
         type: str = "custom",
         source: Dict[str, str] | str = None,
+        fetch_engine: FetchEngine = None,
     ):
         if backend not in ["iCalendar", "Rapla"]:
             raise ValueError("Invalid backend")
@@ -26,22 +29,8 @@ class CalendarWrapper:  # * source_model could be provided (only for threading a
         self.backend = backend
         self.type = type
         self.source = source
-
-        self.exam_keywords = [
-            "klausur",
-            "exam",
-            "prüfung",
-            "test",
-            "quiz",
-            "examen",
-            "examination",
-            "prüfungsleistung",
-            "abschlussklausur",
-            "abschlussprüfung",
-            "abschlussarbeit",
-            "abschlussklausur",
-            "prüfungsform",
-        ]
+        self.fetch_engine = fetch_engine or FetchEngine()
+        self.fetch_stats: Dict[Hashable, Dict[str, Any]] = {}  # Download time and size per source of the last run
 
     # ======================================================== #
     # ========================= Main ========================= #
@@ -49,12 +38,6 @@ class CalendarWrapper:  # * source_model could be provided (only for threading a
     def get_type(self) -> str:
         return self.type.capitalize()
 
-    def __dict_hash(self, dictionary: dict) -> str:
-        dhash = hashlib.sha1()
-        encoded = json.dumps(dictionary, sort_keys=True).encode("utf-8")
-        dhash.update(encoded)
-        return dhash.hexdigest()
-
     def set_type(self, type: str):
         if type not in ["custom", "dhbw-mannheim"]:
             raise ValueError("Invalid type")
@@ -65,7 +48,13 @@ class CalendarWrapper:  # * source_model could be provided (only for threading a
             raise ValueError("Invalid backend")
         self.backend = backend
 
-    def get_data(self, source: Dict[str, str] | str = None):
+    def get_data(self, source: Dict[str, str] | str = None, validators: Dict[str, Any] = None):
+        """Download and convert the source(s).
+
+        validators are the upstream validators (etag, last_modified, content_length) stored from the last
+        download of the source - for multiple sources a dict with the same keys as source. If the source
+        did not change since then, the result is {"not_modified": True, "validators": ...} instead of the data.
+        """
         if source is None:
             if self.source is None:
                 raise ValueError("No source provided!")
@@ -74,15 +63,70 @@ class CalendarWrapper:  # * source_model could be provided (only for threading a
 
         if isinstance(self.source, dict):
             if self.backend == "iCalendar":
-                return self.__ical_get_data_multiple(self.source)
+                return self.__ical_get_data_multiple(self.source, validators)
             else:  # rapla
-                return self.__rapla_get_data_multiple(self.source)
+                return self.__rapla_get_data_multiple(self.source, validators)
 
         else:
             if self.backend == "iCalendar":
-                return self.__ical_get_data_single(self.source)
+                return self.__ical_get_data_single(self.source, validators)
             else:  # rapla
-                return self.__rapla_get_data_single(self.source)
+                return self.__rapla_get_data_single(self.source, validators)
+
+    def __check_download(self, download: FetchResult, validators: Dict[str, Any]) -> Dict[str, any] | None:
+        """Result of a download that does not need to be parsed (unchanged or failed), None otherwise."""
+        # Source did not change since the last download -> skip parsing and hashing
+        if download.not_modified:
+            return {"not_modified": True, "validators": validators}
+        if download.ok and is_unchanged(validators, download.headers, download.content):
+            return {"not_modified": True, "validators": response_validators(download.headers, download.content)}
+
+        if not download.ok:
+            print(f"[ERROR] Could not download {download.url}! ({download.error})")
+            return {"error": True}
+        return None
+
+    def __get_data_multiple(
+        self,
+        sources: Dict[Hashable, str],
+        validators: Dict[Hashable, Dict[str, Any]],
+        process: Callable[[bytes], Dict[str, any]],
+    ) -> tuple[Dict[Hashable, Dict[str, any]], list]:
+        """Fetch -> parse -> result. process has to be a module level function (it runs in the parse pool)."""
+        validators = validators or {}
+        results = {}
+
+        # ~~~~~~~~~~~~~~~~~ Fetch ~~~~~~~~~~~~~~~~~ #
+        # Download all sources concurrently
+        downloads = self.fetch_engine.fetch_all(sources, validators)
+        self.fetch_stats = {
+            name: {"elapsed": download.elapsed, "bytes": len(download.content or b"")}
+            for name, download in downloads.items()
+        }
+
+        jobs = {}
+        for name, download in downloads.items():
+            result = self.__check_download(download, validators.get(name))
+            if result is None:
+                jobs[name] = (download.content,)
+            else:
+                results[name] = None if result.get("error") else result
+
+        # ~~~~~~~~~~~~~~~~~ Parse ~~~~~~~~~~~~~~~~~ #
+        # Changed sources are parsed concurrently in the worker processes of the parse pool
+        for name, data in parse_pool.map(process, jobs).items():
+            download = downloads[name]
+            if isinstance(data, Exception):
+                print(f"[ERROR] Could not process {download.url}!")
+                print(data)
+                data = None
+
+            if data:
+                data["validators"] = response_validators(download.headers, download.content)
+            results[name] = data
+
+        download_error = [name for name in downloads if not results.get(name)]
+        return results, download_error
 
     # ======================================================== #
     # ======================= ICalendar ====================== #
@@ -99,214 +143,128 @@ class CalendarWrapper:  # * source_model could be provided (only for threading a
 
         return source_url
 
-    def __ical_convert_to_json(self, ical) -> Dict[str, Any]:
-        # * str(event.get()) because they return vText
-
-        cal = Calendar.from_ical(ical)
-        jsonIcal = {}
-        jsonIcal["X-WR-TIMEZONE"] = str(cal.get("X-WR-TIMEZONE"))
-        jsonEvents = []
-
-        for event in cal.walk("vevent"):
-
-            # ~~~~~~~~~~ Process description ~~~~~~~~~~ #
-            event_description = {"tags": []}
-            event_description_tmp = str(event.get("description", "")).lower()
-
-            # Check if the lecture is online or hybrid
-            if "online" in event_description_tmp.lower() or "online" in event.get("summary").lower():
-                event_description["tags"].append("online")
-            elif "hybrid" in event_description_tmp.lower() or "hybrid" in event.get("summary").lower():
-                event_description["tags"].append("hybrid")
-
-            # Check if the lecture is an exam
-            if any(ext in event.get("summary").lower() for ext in self.exam_keywords):  #
-                if "klausureinsicht" in event.get("summary").lower():
-                    event_description["tags"].append("exam_review")
-                else:
-                    event_description["tags"].append("exam")
-
-            # ~~~~~~~~~~~~~~ Build event ~~~~~~~~~~~~~~ #
-            jsonEvents.append(
-                {
-                    "summary": str(event.get("summary")),
-                    "description": event_description,
-                    "location": str(event.get("location")),
-                    "start": event.get("dtstart").dt.strftime("%Y-%m-%d %H:%M:%S"),
-                    "end": event.get("dtend").dt.strftime("%Y-%m-%d %H:%M:%S"),
-                }
-            )
-
-        jsonIcal["events"] = jsonEvents
-        return jsonIcal
+    def __ical_get_data_single(self, source: str, validators: Dict[str, Any] = None) -> Dict[str, any]:
+        ical_data, _ = self.__ical_get_data_multiple({source: source}, {source: validators})
+        return ical_data[source]
 
-    def __ical_get_data_single(self, source: str) -> Dict[str, any]:
-        source_url = self.__ical_get_source_url(source)
-        data = requests.get(source_url, stream=True).content.decode("utf-8")
-
-        if data:
-
-            json_data = self.__ical_convert_to_json(data)
-            if json_data.get("events"):
-                return {"data": json_data, "hash": self.__dict_hash(json_data)}
-        return None
-
-    def __ical_get_data_multiple(self, ical_sources: dict) -> Dict[str, any]:
-        ical_data = {}
-
-        download_error = []
-        for lecture_name, ical_source in ical_sources.items():
-            lecture_data = self.__ical_get_data_single(ical_source)
-            ical_data[lecture_name] = lecture_data
-            if not lecture_data:
-                download_error.append(lecture_name)
-        return ical_data, download_error
+    def __ical_get_data_multiple(self, ical_sources: dict, validators: dict = None) -> Dict[str, any]:
+        source_urls = {name: self.__ical_get_source_url(source) for name, source in ical_sources.items()}
+        return self.__get_data_multiple(source_urls, validators, process_ical)
 
     # ======================================================== #
     # ========================= Rapla ======================== #
     # ======================================================== #
 
-    def __rapla_scrape_source(self, rapla_url: str) -> Dict[str, any]:
-        regex_color = re.compile(r"background-color:\s*(#[0-9a-fA-F]+)")
-        page = requests.get(rapla_url)
-        content = page.text.replace("<br/>", "\n")
-        soup = BeautifulSoup(content, "html.parser")
-
-        weeks = soup.find_all("table", class_="week_table")
-
-        current_year = datetime.datetime.now().year
-        last_calendar_week = 0
-
-        event_json = {"X-WR-TIMEZONE": "Europe/Berlin", "events": []}
-
-        course_name = soup.find("h2").get_text().split(",")[0]
-
-        for week in weeks:
-            soup = BeautifulSoup(str(week), "html.parser")
-            cols = soup.findChildren("tr")
-            days = []
-            calendar_week = int(cols[0].findChild("th", class_="week_number").get_text().split(" ")[1])
-            if calendar_week < last_calendar_week:
-                current_year += 1
-            for col in cols:
-                rows = col.findChildren("td")
-                day_offset = 0
-
-                is_normal_spacer_before = False
-
-                for row in rows:
-                    match row.get("class")[0]:
-                        case "week_header":
-                            day_month = row.get_text().split(" ")[1]
-                            date = f"{day_month}{current_year}"
-                            days.append(date)
-                        case "week_block":
-                            # ~~~~~ Process <a> tag - first information ~~~~ #
-                            tmp = row.findChild("a").get_text().split("\n")
-
-                            lecture_time = tmp[0].replace("\xa0", "").split("-")
-
-                            # ----- Lecture name + special information ----- #
-                            lecture_name = tmp[1]
-                            lecture_description = {"tags": []}
-
-                            if "online" in lecture_name.lower():
-                                lecture_description["tags"].append("online")
-
-                                lecture_name = lecture_name.replace("online", "").strip()
-                                while lecture_name[-1].lower() in "-_.":
-                                    lecture_name = lecture_name[:-1]
-
-                            # Check if the lecture is an exam
-                            if any(ext in lecture_name.lower() for ext in self.exam_keywords):
-                                lecture_description["tags"].append("exam")
-
-                            # ---------------- Lecture Time ---------------- #
-                            try:
-                                lecture_start = datetime.datetime.strptime(
-                                    f"{days[day_offset]} {lecture_time[0]}", "%d.%m.%Y %H:%M"
-                                )
-                                lecture_end = datetime.datetime.strptime(
-                                    f"{days[day_offset]} {lecture_time[1]}", "%d.%m.%Y %H:%M"
-                                )
-                            except IndexError:
-                                print(f"[ERROR] Day offset error for {course_name}->{lecture_name}! Skipping...")
-                                continue
-
-                            tmp = row.findChild("span", class_="person")
-                            if tmp:
-                                lecture_description["person"] = tmp.get_text()
-
-                            # ~~ Process <span> tag - location information ~ #
-                            tmp = row.findChildren("span", class_="resource")
-
-                            lecture_location = ""
-                            for info in tmp:
-                                if info.getText() not in course_name:
-                                    lecture_location = (
-                                        info.getText()
-                                        if lecture_location == ""
-                                        else f"{lecture_location}, {info.getText()}"
-                                    )  # Maybe multiple locations
-
-                            # Get color of the lecture if available
-                            tmp = row.get("style")
-
-                            if tmp:
-                                tmp = re.search(regex_color, tmp)
-                                if tmp:
-                                    lecture_description["color"] = tmp.group(1)
-
-                            event_json["events"].append(
-                                {
-                                    "summary": lecture_name,
-                                    "description": lecture_description,
-                                    "location": lecture_location if lecture_location else None,
-                                    "start": lecture_start.strftime("%Y-%m-%d %H:%M:%S"),
-                                    "end": lecture_end.strftime("%Y-%m-%d %H:%M:%S"),
-                                }
-                            )
-
-                        # Spacer cells
-                        case "week_smallseparatorcell_black":
-                            if is_normal_spacer_before:
-                                day_offset += 1
-                                is_normal_spacer_before = False
-                        case "week_smallseparatorcell":
-                            if is_normal_spacer_before:
-                                day_offset += 1
-                                is_normal_spacer_before = False
-                        case "week_separatorcell_black":
-                            is_normal_spacer_before = True
-                        case "week_separatorcell":
-                            is_normal_spacer_before = True
-
-            last_calendar_week = calendar_week
-        return event_json
-
-    def __rapla_get_data_single(self, source: str) -> Dict[str, any]:
-        try:
-            data = self.__rapla_scrape_source(source)
-        except Exception as e:
-            print(f"[ERROR] Could not download {source}!")
-            print(e)
-            return None
+    def __rapla_check_window(self, download: FetchResult) -> tuple[str, List[Dict[str, any]] | None] | None:
+        """Get (content hash, cached events) of a downloaded window - events are None if the window has to be
+        parsed, the result is None if the download failed."""
+        cached = rapla_page_cache.get(download.url)
 
-        if data:
-            return {"data": data, "hash": self.__dict_hash(data)}
-        else:
+        # Window did not change since the last download -> reuse the parsed events
+        if download.not_modified and cached:
+            return cached[0], cached[2]
+
+        if not download.ok:
+            print(f"[ERROR] Could not download {download.url}! ({download.error})")
             return None
 
-    def __rapla_get_data_multiple(self, rapla_sources: Dict[str, str]) -> Dict[str, any]:
-        rapla_data = {}
+        content_hash = rapla_page_cache.content_hash(download.content)
+        if cached and cached[0] == content_hash:
+            return content_hash, cached[2]
+        return content_hash, None
+
+    def __rapla_get_data_single(self, source: str, validators: Dict[str, Any] = None) -> Dict[str, any]:
+        rapla_data, _ = self.__rapla_get_data_multiple({source: source}, {source: validators})
+        return rapla_data[source]
+
+    def __rapla_get_data_multiple(self, rapla_sources: Dict[str, str], validators: dict = None) -> Dict[str, any]:
+        # * A Rapla page only renders a few weeks -> every source is fetched as week-aligned windows of the
+        # * configured horizon (config/calendar.py). The windows of all sources are downloaded concurrently and
+        # * carry their own validators (page cache). The source level validators only hold the fingerprint
+        # * over all windows of the source.
+        validators = validators or {}
+        windows = {}
+        for name, source in rapla_sources.items():
+            for start, url in rapla_windows(source).items():
+                windows[(name, start)] = url
+
+        downloads = self.fetch_engine.fetch_all(
+            windows, {key: rapla_page_cache.validators(url) for key, url in windows.items()}
+        )
+
+        # Windows are downloaded concurrently -> a source takes as long as its slowest window
+        self.fetch_stats = {name: {"elapsed": 0.0, "bytes": 0} for name in rapla_sources}
+        for (name, _), download in downloads.items():
+            stats = self.fetch_stats[name]
+            stats["elapsed"] = max(stats["elapsed"], download.elapsed)
+            stats["bytes"] += len(download.content or b"")
+
+        # ~~~~~~~~~~~~~~~~~ Check ~~~~~~~~~~~~~~~~~ #
+        source_windows = {name: [] for name in rapla_sources}
+        failed = set()  # Sources with at least one failed window (the old data is kept)
+        jobs = {}
+        for (name, start), download in downloads.items():
+            window = self.__rapla_check_window(download)
+            if window is None:
+                failed.add(name)
+                continue
+
+            content_hash, events = window
+            source_windows[name].append([start, content_hash, events])
+            if events is None:
+                jobs[(name, start)] = (download.text, start.year)
+
+        # ~~~~~~~~~~~~~~~~~ Parse ~~~~~~~~~~~~~~~~~ #
+        # Changed windows are parsed concurrently in the worker processes of the parse pool
+        parsed = parse_pool.map(process_rapla_window, {key: job for key, job in jobs.items() if key[0] not in failed})
+        for (name, start), events in parsed.items():
+            download = downloads[(name, start)]
+            if isinstance(events, Exception):
+                print(f"[ERROR] Could not process {download.url}!")
+                print(events)
+                failed.add(name)
+                continue
+
+            rapla_page_cache.put(
+                download.url,
+                rapla_page_cache.content_hash(download.content),
+                response_validators(download.headers, download.content),
+                events,
+            )
+            for window in source_windows[name]:
+                if window[0] == start:
+                    window[2] = events
 
+        results = {}
         download_error = []
-        for lecture_name, rapla_source in rapla_sources.items():
-            lecture_data = self.__rapla_get_data_single(rapla_source)
-            rapla_data[lecture_name] = lecture_data
-            if not lecture_data:
-                download_error.append(lecture_name)
-        return rapla_data, download_error
+        for name, source_window in source_windows.items():
+            if name in failed:
+                results[name] = None
+                download_error.append(name)
+                continue
+
+            source_window.sort(key=lambda window: window[0])
+            fingerprint = payload_fingerprint(
+                "".join(f"{start.isoformat()}:{content_hash};" for start, content_hash, _ in source_window).encode()
+            )
+            source_validators = {
+                "etag": None,
+                "last_modified": None,
+                "content_length": None,
+                "fingerprint": fingerprint,
+            }
+
+            # Same windows with the same content as last time -> skip merging, hashing and writing
+            if (validators.get(name) or {}).get("fingerprint") == fingerprint:
+                results[name] = {"not_modified": True, "validators": source_validators}
+                continue
+
+            data = {
+                "X-WR-TIMEZONE": "Europe/Berlin",
+                "events": merge_window_events(events for *_, events in source_window),
+            }
+            results[name] = {**calendar_payload(data), "validators": source_validators}
+        return results, download_error
 
 
 # ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
@@ -338,5 +296,9 @@ class CalendarWrapper:  # * source_model could be provided (only for threading a
 #             }
 #         ]
 #     },
-#     "hash": "hash"
+#     "hash": "hash",
+#     "validators": {"etag": "...", "last_modified": "...", "content_length": 1234}
 # }
+#
+# ----- Output (source unchanged since the given validators) ----- #
+# {"not_modified": True, "validators": {...}}
@@ -0,0 +1,97 @@
+from typing import Any, Dict, List
+from pathlib import Path
+import json
+
+# Tags of the calendar events (online, hybrid, exam, ...) are defined in data/calendar/event_tags.json and shared
+# by all calendar backends (iCal and Rapla). Every rule has:
+#   tag:      the tag that is added to the event
+#   keywords: case-insensitive substrings that trigger the tag
+#   fields:   the event fields that are searched (e.g. summary, description)
+#   group:    optional - only the first matching rule (in file order) of a group is applied (e.g. online OR hybrid)
+# A new tag is a new rule in the file, no code change.
+
+EVENT_TAGS_PATH = Path(__file__).parent.parent.parent.absolute() / "data" / "calendar" / "event_tags.json"
+
+FIELD_SEPARATOR = "\x00"  # Never part of a keyword, so a keyword can't match across two fields
+
+
+class EventTagger:
+    """Classifies events by keyword rules.
+
+    The rules are compiled once:
+      - keywords are lowercased and deduplicated
+      - keywords that contain another keyword of the same rule are dropped ("abschlussklausur" -> "klausur")
+      - the searched fields of a rule are joined into one lowercased text per event (lowercased only once)
+      - rules of a group are skipped as soon as the group has a tag
+
+    * A single regex alternation of all keywords was measured slower than these substring checks
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = rules
+
+        # Fields in order of first appearance
+        self.fields = []
+        for rule in rules:
+            for field in rule["fields"]:
+                if field not in self.fields:
+                    self.fields.append(field)
+
+        # Compiled rules: (tag, group, index of the searched field combination, minimal keywords)
+        # A field combination holds the indices of its fields in self.fields
+        self.field_combinations = []
+        self.compiled_rules = []
+        for rule in rules:
+            keywords = {keyword.lower() for keyword in rule["keywords"]}
+            keywords = tuple(
+                sorted(
+                    keyword
+                    for keyword in keywords
+                    if not any(other != keyword and other in keyword for other in keywords)
+                )
+            )
+            fields = tuple(index for index, field in enumerate(self.fields) if field in rule["fields"])
+            if fields not in self.field_combinations:
+                self.field_combinations.append(fields)
+            self.compiled_rules.append(
+                (rule["tag"], rule.get("group"), self.field_combinations.index(fields), keywords)
+            )
+
+    def tag(self, **fields: str) -> List[str]:
+        """Return the tags of an event, e.g. tagger.tag(summary="Klausur Mathe", description="online")"""
+        field_texts = [(fields.get(field) or "").lower() for field in self.fields]
+        texts = [
+            (
+                field_texts[combination[0]]
+                if len(combination) == 1
+                else FIELD_SEPARATOR.join([field_texts[index] for index in combination])
+            )
+            for combination in self.field_combinations
+        ]
+
+        tags = []
+        used_groups = set()
+        for tag, group, text_index, keywords in self.compiled_rules:
+            if group in used_groups:
+                continue
+
+            text = texts[text_index]
+            for keyword in keywords:
+                if keyword in text:
+                    tags.append(tag)
+                    if group:
+                        used_groups.add(group)
+                    break
+        return tags
+
+
+def load_rules(path: Path = EVENT_TAGS_PATH) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+event_tagger = EventTagger(load_rules())  # * Shared tagger of the calendar backends (compiled on import)
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# event_tagger.tag(summary="Klausureinsicht Mathe", description="Raum: online") -> ["online", "exam_review"]
@@ -0,0 +1,161 @@
+from typing import Dict, Iterable, Iterator, Tuple
+import re
+
+# Streaming VEVENT extractor for iCalendar feeds (RFC 5545).
+# The feed is tokenized line by line, so memory stays proportional to a single event
+# instead of building the full icalendar object graph for every component of the feed.
+
+# Properties collected for an event (everything else is skipped without decoding it further)
+EVENT_PROPERTIES = {"SUMMARY", "DESCRIPTION", "LOCATION", "DTSTART", "DTEND", "UID"}
+TEXT_PROPERTIES = {"SUMMARY", "DESCRIPTION", "LOCATION", "UID", "X-WR-TIMEZONE"}
+
+REGEX_DATE = re.compile(r"(\d{4})(\d{2})(\d{2})")
+REGEX_DATE_TIME = re.compile(r"(\d{4})(\d{2})(\d{2})T(\d{2})(\d{2})(\d{2})Z?")
+
+
+###########################################################################
+############################# Helper Functions ############################
+###########################################################################
+
+
+def unfold_lines(stream: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """Join folded lines (continuation lines start with a space or a tab) to logical content lines."""
+    current = None
+    for raw_line in stream:
+        line = raw_line.decode(encoding).rstrip("\r\n")
+        if not line:
+            continue
+        if line[0] in " \t" and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def split_content_line(line: str) -> Tuple[str, Dict[str, str], str]:
+    """Split a content line into name, parameters and raw value ('NAME;PARAM=x:value').
+    Colons and semicolons inside quoted parameter values are ignored."""
+    in_quotes = False
+    value_start = None
+    separators = []
+    for i, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif not in_quotes:
+            if char == ":":
+                value_start = i
+                break
+            if char == ";":
+                separators.append(i)
+
+    if value_start is None:
+        raise ValueError(f"Invalid content line: {line[:50]}")
+
+    bounds = separators + [value_start]
+    name = line[: bounds[0]].upper()
+    params = {}
+    for start, end in zip(bounds, bounds[1:]):
+        key, _, value = line[start + 1 : end].partition("=")
+        params[key.upper()] = value.strip('"')
+    return name, params, line[value_start + 1 :]
+
+
+def unescape_text(value: str) -> str:
+    """Unescape a TEXT value (same rules and order as icalendar's vText)."""
+    if "\\" not in value:
+        return value
+    return (
+        value.replace("\\N", "\\n").replace("\\n", "\n").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+    )
+
+
+def format_date_time(value: str) -> str:
+    """Format a DATE or DATE-TIME value as 'YYYY-MM-DD HH:MM:SS'.
+    The wall clock time is kept as is (TZID / UTC forms are not converted), just like dt.strftime() did."""
+    value = value.strip()
+
+    match = REGEX_DATE_TIME.fullmatch(value)
+    if match:
+        year, month, day, hour, minute, second = match.groups()
+        return f"{year}-{month}-{day} {hour}:{minute}:{second}"
+
+    match = REGEX_DATE.fullmatch(value)
+    if match:
+        year, month, day = match.groups()
+        return f"{year}-{month}-{day} 00:00:00"
+
+    raise ValueError(f"Invalid date/date-time value: {value}")
+
+
+###########################################################################
+################################## Parser #################################
+###########################################################################
+
+
+class ICalEventStream:
+    """Iterates over the VEVENTs of an iCalendar byte stream.
+
+    Every event is yielded as a dict with the keys summary, description, location, uid (unescaped text, None if
+    missing) and start, end ('YYYY-MM-DD HH:MM:SS'). Properties of nested components (e.g. VALARM) are ignored.
+    Properties of the VCALENDAR itself (e.g. X-WR-TIMEZONE) are collected in calendar_properties while iterating.
+    """
+
+    def __init__(self, stream: Iterable[bytes], encoding: str = "utf-8"):
+        self.stream = stream
+        self.encoding = encoding
+        self.calendar_properties: Dict[str, str] = {}
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        components = []  # Stack of the currently open components
+        event = None
+
+        for line in unfold_lines(self.stream, self.encoding):
+            name, params, value = split_content_line(line)
+
+            if name == "BEGIN":
+                component = value.upper()
+                components.append(component)
+                if component == "VEVENT":
+                    event = {}
+                continue
+
+            if name == "END":
+                component = components.pop() if components else None
+                if component == "VEVENT" and event is not None:
+                    yield self.__build_event(event)
+                    event = None
+                continue
+
+            if not components:
+                continue
+
+            if components[-1] == "VEVENT" and name in EVENT_PROPERTIES:
+                # Only the first occurrence of a property is used
+                event.setdefault(name, value)
+            elif components[-1] == "VCALENDAR":
+                self.calendar_properties.setdefault(name, unescape_text(value) if name in TEXT_PROPERTIES else value)
+
+    def __build_event(self, event: Dict[str, str]) -> Dict[str, str]:
+        if "DTSTART" not in event:
+            raise ValueError("Event without DTSTART")
+
+        start = format_date_time(event["DTSTART"])
+        return {
+            "uid": unescape_text(event["UID"]) if "UID" in event else None,
+            "summary": unescape_text(event["SUMMARY"]) if "SUMMARY" in event else None,
+            "description": unescape_text(event["DESCRIPTION"]) if "DESCRIPTION" in event else None,
+            "location": unescape_text(event["LOCATION"]) if "LOCATION" in event else None,
+            "start": start,
+            "end": format_date_time(event["DTEND"]) if "DTEND" in event else start,  # No DTEND -> zero duration
+        }
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# events = ICalEventStream(io.BytesIO(b"BEGIN:VCALENDAR..."))
+# for event in events:
+#     event -> {"uid": "...", "summary": "Lecture 1", "description": None, "location": "A 101",
+#               "start": "2021-10-01 08:00:00", "end": "2021-10-01 10:00:00"}
+# events.calendar_properties -> {"VERSION": "2.0", "X-WR-TIMEZONE": "Europe/Berlin", ...}
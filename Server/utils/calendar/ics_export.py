@@ -0,0 +1,165 @@
+from typing import Any, Iterator, Mapping
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import datetime
+
+# ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
+from utils.calendar.calendar_events import EVENT_DATE_FORMAT, calendar_event_index
+
+# Rendering of the calendar json format as an iCalendar feed (RFC 5545) for calendar apps (Google, Apple, ...).
+# The feed is generated chunk by chunk (one VEVENT per chunk), so it can be streamed while it is rendered.
+# Times are sent in UTC (no VTIMEZONE component needed), UIDs are the calendar and the stable event key
+# (see calendar_events) - the same event in two calendars (e.g. a native and a custom copy) gets two UIDs.
+
+ICS_MEDIA_TYPE = "text/calendar; charset=utf-8"
+ICS_PRODID = "-//TheStudentMaster//Calendar Export//DE"
+ICS_UID_DOMAIN = "thestudentmaster"
+ICS_LINE_OCTETS = 75  # * Maximum length of a content line (longer lines are folded)
+
+UTC_FORMAT = "%Y%m%dT%H%M%SZ"
+LOCAL_FORMAT = "%Y%m%dT%H%M%S"
+
+
+###########################################################################
+############################# Helper Functions ############################
+###########################################################################
+
+
+def escape_text(value: Any) -> str:
+    """Escape a TEXT value (backslash, semicolon, comma and line breaks)."""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+        .replace("\r", "\\n")
+    )
+
+
+def fold_line(line: str) -> str:
+    """Fold a content line into parts of at most 75 octets (UTF-8 characters are not split)."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= ICS_LINE_OCTETS:
+        return line + "\r\n"
+
+    parts = []
+    start = 0
+    limit = ICS_LINE_OCTETS
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:  # Continuation byte -> end before the char
+            end -= 1
+        parts.append(encoded[start:end].decode("utf-8"))
+        start = end
+        limit = ICS_LINE_OCTETS - 1  # Continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def get_zone(timezone: str | None) -> ZoneInfo | None:
+    try:
+        return ZoneInfo(timezone) if timezone else None
+    except (ZoneInfoNotFoundError, ValueError):
+        return None  # Unknown timezone (e.g. "None") -> floating local times
+
+
+def format_time(value: str, zone: ZoneInfo | None) -> str:
+    """Format a 'YYYY-MM-DD HH:MM:SS' wall clock time of the calendar as DATE-TIME (UTC if the zone is known)."""
+    moment = datetime.datetime.strptime(value, EVENT_DATE_FORMAT)
+    if zone is None:
+        return moment.strftime(LOCAL_FORMAT)
+    return moment.replace(tzinfo=zone).astimezone(datetime.timezone.utc).strftime(UTC_FORMAT)
+
+
+def event_uid(kind: str, calendar_id: int, key: str) -> str:
+    """UID of an event of a calendar (kind: "native"/"custom")."""
+    return f"{kind}-{calendar_id}-{key}@{ICS_UID_DOMAIN}"
+
+
+def has_value(value: Any) -> bool:
+    return value is not None and value != "" and value != "None"  # * iCalendar sources store missing values as "None"
+
+
+###########################################################################
+################################## Render #################################
+###########################################################################
+
+
+def render_event(uid: str, event: Mapping[str, Any], zone: ZoneInfo | None, stamp: str) -> str:
+    """Render one event as VEVENT."""
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{format_time(event['start'], zone)}",
+        f"DTEND:{format_time(event['end'], zone)}",
+    ]
+    if has_value(event.get("summary")):
+        lines.append(f"SUMMARY:{escape_text(event['summary'])}")
+    if has_value(event.get("location")):
+        lines.append(f"LOCATION:{escape_text(event['location'])}")
+
+    description = event.get("description")
+    if isinstance(description, dict):
+        if description.get("person"):
+            lines.append(f"DESCRIPTION:{escape_text(description['person'])}")
+        if description.get("tags"):
+            lines.append("CATEGORIES:" + ",".join(escape_text(tag) for tag in description["tags"]))
+    elif has_value(description):
+        lines.append(f"DESCRIPTION:{escape_text(description)}")
+
+    lines.append("END:VEVENT")
+    return "".join(fold_line(line) for line in lines)
+
+
+def iter_ics(
+    data: Mapping[str, Any],
+    calendar_name: str,
+    kind: str,
+    calendar_id: int,
+    last_modified: datetime.datetime | None = None,
+) -> Iterator[bytes]:
+    """Render a calendar as iCalendar feed chunk by chunk (header, one chunk per event, footer).
+
+    last_modified is used as DTSTAMP of the events, so the same data always gives the same feed.
+    A naive last_modified is the local time of the server (as written by the refresh tasks) and converted to UTC.
+    """
+    timezone = data.get("X-WR-TIMEZONE")
+    zone = get_zone(timezone)
+    stamp = last_modified or datetime.datetime(1999, 1, 1, tzinfo=datetime.timezone.utc)
+    stamp = stamp.astimezone(datetime.timezone.utc).strftime(UTC_FORMAT)
+
+    header = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{ICS_PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(calendar_name)}",
+    ]
+    if zone is not None:
+        header.append(f"X-WR-TIMEZONE:{timezone}")
+    yield "".join(fold_line(line) for line in header).encode("utf-8")
+
+    for key, event in calendar_event_index(data).items():
+        yield render_event(event_uid(kind, calendar_id, key), event, zone, stamp).encode("utf-8")
+
+    yield b"END:VCALENDAR\r\n"
+
+
+def render_ics(
+    data: Mapping[str, Any],
+    calendar_name: str,
+    kind: str,
+    calendar_id: int,
+    last_modified: datetime.datetime | None = None,
+) -> bytes:
+    return b"".join(iter_ics(data, calendar_name, kind, calendar_id, last_modified))
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# data = {"X-WR-TIMEZONE": "Europe/Berlin", "events": [{"summary": "Mathe", "description": {"tags": ["exam"]},
+#     "location": "A 101", "start": "2024-10-16 08:00:00", "end": "2024-10-16 09:30:00"}]}
+# feed = render_ics(data, "TINF22B1", "native", 12)
+# -> b"BEGIN:VCALENDAR\r\nVERSION:2.0\r\n...BEGIN:VEVENT\r\nUID:native-12-3f7c...@thestudentmaster\r\n...
+#     DTSTART:20241016T060000Z\r\n...CATEGORIES:exam\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n"
@@ -1,21 +1,107 @@
-from bs4 import BeautifulSoup
-import requests
+from typing import Any, Callable, Dict, NamedTuple
+from lxml import etree, html
+import threading
 
+# ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
+from utils.network import http_client
+from utils.network.fetch_engine import conditional_headers, response_validators, is_unchanged
 
-# Get all available courses from DHBW Mannheim
-def get_source_dhbw_ma() -> dict[str, str]:
-    url = "https://vorlesungsplan.dhbw-mannheim.de/ical.php"
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, "html.parser")
-    ical_infos = soup.find_all("option")
+# Source catalogs (course name -> source id) of the native calendars.
+# A catalog is kept with the HTTP validators and the fingerprint of its page, so an unchanged catalog costs one
+# conditional request (304) or, if the server ignores the validators, one download without parsing.
+
+DHBW_MA_CATALOG_URL = "https://vorlesungsplan.dhbw-mannheim.de/ical.php"
+
+XPATH_OPTIONS = etree.XPath("//option[@value]")
+
+
+class SourceCatalog(NamedTuple):
+    sources: Dict[str, str]  # Course name -> source
+    validators: Dict[str, Any]  # etag, last_modified, content_length, fingerprint of the page
+    changed: bool  # False if the page did not change since the last download
+
+
+_catalogs: Dict[str, SourceCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+###########################################################################
+################################## Parser #################################
+###########################################################################
+
+
+def parse_dhbw_ma_catalog(page: bytes) -> Dict[str, str]:
+    """Parse the course selector of the DHBW Mannheim iCal page (option label -> option value)."""
     icals = {}
-    for ical_info in ical_infos:
-        if ical_info.get("value", "") and ical_info.get("label", "") != ical_info.get("value", ""):
-            ical_name = ical_info["label"].replace("/", "-").replace("&", "-")
-            icals[ical_name] = ical_info["value"]
+    for option in XPATH_OPTIONS(html.fromstring(page)):
+        value, label = option.get("value"), option.get("label")
+        if value and label and label != value:
+            icals[label.replace("/", "-").replace("&", "-")] = value
     return icals
 
 
+###########################################################################
+################################## Fetch ##################################
+###########################################################################
+
+
+def fetch_source_catalog(url: str, parse: Callable[[bytes], Dict[str, str]]) -> SourceCatalog:
+    """Get the catalog of url - downloaded conditionally and only parsed if the page has changed."""
+    with _catalogs_lock:
+        cached = _catalogs.get(url)
+
+    validators = cached.validators if cached else None
+    response = http_client.get(url, headers=conditional_headers(validators))
+    if cached and response.status_code == 304:
+        return cached._replace(changed=False)
+    response.raise_for_status()
+
+    if cached and is_unchanged(validators, response.headers, response.content):
+        catalog = cached._replace(validators=response_validators(response.headers, response.content), changed=False)
+    else:
+        catalog = SourceCatalog(
+            sources=parse(response.content),
+            validators=response_validators(response.headers, response.content),
+            changed=True,
+        )
+    with _catalogs_lock:
+        _catalogs[url] = catalog
+    return catalog
+
+
+# Get the catalog of DHBW Mannheim (changed=False -> same courses as the last call)
+def get_catalog_dhbw_ma() -> SourceCatalog:
+    return fetch_source_catalog(DHBW_MA_CATALOG_URL, parse_dhbw_ma_catalog)
+
+
+# Get all available courses from DHBW Mannheim
+def get_source_dhbw_ma() -> dict[str, str]:
+    return dict(get_catalog_dhbw_ma().sources)
+
+
+###########################################################################
+################################ Reconcile ################################
+###########################################################################
+
+
+def reconcile_sources(
+    existing: Dict[int, tuple[str, str]], available: Dict[str, str]
+) -> tuple[list[int], list[int], Dict[str, str]]:
+    """Diff the stored calendars (calendar_id -> (course_name, source)) against the available sources
+    (course_name -> source) in linear time.
+    Returns (calendar ids to delete, calendar ids to keep, new sources by course name)."""
+    available_sources = set(available.values())
+    deleted, kept, kept_names = [], [], set()
+    for calendar_id, (course_name, source) in existing.items():
+        if source in available_sources:
+            kept.append(calendar_id)
+            kept_names.add(course_name)
+        else:
+            deleted.append(calendar_id)
+    new = {course_name: source for course_name, source in available.items() if course_name not in kept_names}
+    return deleted, kept, new
+
+
 # TODO Validate if this is necessary
 # def get_available_courses_dhbw_stug(base_url: str = "https://www.dhbw-stuttgart.de/studierendenportal/"):
 #     page = requests.get(base_url)
@@ -28,3 +114,9 @@ def get_source_dhbw_ma() -> dict[str, str]:
 #         for course in raw_courses:
 #             courses[course.get_text()] = f"www.dhbw-stuttgart.de{course.find("a").get("href")}"
 #     return courses
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# get_source_dhbw_ma()  -> {"TINF22B1": "8063001", ...} (second call: 304 -> cached catalog, no parsing)
+# reconcile_sources({1: ("TINF22B1", "8063001"), 2: ("TINF19A", "1")}, {"TINF22B1": "8063001", "TINF24A": "9"})
+# -> ([2], [1], {"TINF24A": "9"})
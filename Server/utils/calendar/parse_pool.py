@@ -0,0 +1,154 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, List
+import multiprocessing
+import threading
+import hashlib
+import io
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.calendar import CALENDAR_PARSE_WORKERS
+
+# ~~~~~~~~~~~~~~~~~ Models ~~~~~~~~~~~~~~~~ #
+from models.sql_models.compressed_json import CompressedPayload, canonical_json
+
+# ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
+from utils.calendar.ical_stream import ICalEventStream
+from utils.calendar.rapla_parser import parse_rapla_page
+from utils.calendar.event_tagger import event_tagger
+
+# Parse stage of the calendar refresh (fetch -> parse -> persist).
+# The parse functions are module level functions, so they can be pickled and run in worker processes.
+# This keeps the CPU heavy parsing out of the GIL of the API process and spreads it over all cores.
+
+###########################################################################
+############################# Parse Functions #############################
+###########################################################################
+
+
+def calendar_hash(data: dict) -> str:
+    return hashlib.sha1(canonical_json(data)).hexdigest()
+
+
+def calendar_payload(data: dict) -> Dict[str, Any]:
+    """Serialize a calendar once -> {"data": CompressedPayload, "hash": ...}.
+    The same canonical bytes are hashed, size checked (compressed), stored and sent to the clients."""
+    raw = canonical_json(data)
+    return {"data": CompressedPayload.from_raw(raw, data), "hash": hashlib.sha1(raw).hexdigest()}
+
+
+def convert_ical(ical: bytes) -> Dict[str, Any]:
+    """Convert an iCalendar feed to the calendar json format."""
+    # * Events are extracted one by one from the byte stream (no full Calendar object graph)
+    events = ICalEventStream(io.BytesIO(ical))
+    jsonEvents = []
+
+    for event in events:
+        summary = str(event.get("summary"))
+
+        # ~~~~~~~~~~ Process description ~~~~~~~~~~ #
+        # Online/hybrid and exam tags (rules in data/calendar/event_tags.json)
+        event_description = {"tags": event_tagger.tag(summary=summary, description=event.get("description"))}
+
+        # ~~~~~~~~~~~~~~ Build event ~~~~~~~~~~~~~~ #
+        jsonEvents.append(
+            {
+                "summary": summary,
+                "description": event_description,
+                "location": str(event.get("location")),
+                "start": event.get("start"),
+                "end": event.get("end"),
+            }
+        )
+
+    jsonIcal = {}
+    jsonIcal["X-WR-TIMEZONE"] = str(events.calendar_properties.get("X-WR-TIMEZONE"))
+    jsonIcal["events"] = jsonEvents
+    return jsonIcal
+
+
+def process_ical(ical: bytes) -> Dict[str, Any] | None:
+    """Convert, hash and compress an iCalendar feed -> {"data": ..., "hash": ...} (None if the feed has no events)."""
+    json_data = convert_ical(ical)
+    if json_data.get("events"):
+        return calendar_payload(json_data)
+    return None
+
+
+def process_rapla_window(page: str, year: int) -> List[Dict[str, Any]]:
+    """Parse the events of a Rapla window (year is the year of the first day of the window)."""
+    return parse_rapla_page(page, year=year)["events"]
+
+
+###########################################################################
+################################ Parse Pool ###############################
+###########################################################################
+
+
+class ParsePool:
+    """Runs parse functions in a pool of worker processes (workers=0 -> in the calling thread).
+
+    The pool is started on first use and uses the 'spawn' start method, so no locks or connections of the
+    (multithreaded) server process are copied into the workers.
+    """
+
+    def __init__(self, workers: int = CALENDAR_PARSE_WORKERS):
+        self.workers = workers
+        self.__executor: ProcessPoolExecutor | None = None
+        self.__lock = threading.Lock()
+
+    def __get_executor(self) -> ProcessPoolExecutor:
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self.__executor
+
+    def map(self, function: Callable, jobs: Dict[Hashable, tuple]) -> Dict[Hashable, Any]:
+        """Run function(*arguments) for every job and return the results under the same keys.
+        A job that raised returns the exception instead of a result."""
+        if not jobs:
+            return {}
+
+        if self.workers <= 0:
+            return {key: self.__run_inline(function, arguments) for key, arguments in jobs.items()}
+
+        try:
+            executor = self.__get_executor()
+            futures = {key: executor.submit(function, *arguments) for key, arguments in jobs.items()}
+        except BrokenProcessPool:
+            futures = {}
+
+        results = {}
+        for key, arguments in jobs.items():
+            error = futures[key].exception() if key in futures else BrokenProcessPool()
+            if isinstance(error, BrokenProcessPool):
+                # A worker died (e.g. killed by the OS) -> parse inline and start a new pool next time
+                print(f"[ERROR] Parse pool is broken! Parsing {key} inline...")
+                results[key] = self.__run_inline(function, arguments)
+                self.shutdown(wait=False)
+            else:
+                results[key] = error or futures[key].result()
+        return results
+
+    @staticmethod
+    def __run_inline(function: Callable, arguments: tuple) -> Any:
+        try:
+            return function(*arguments)
+        except Exception as e:
+            return e
+
+    def shutdown(self, wait: bool = True):
+        with self.__lock:
+            if self.__executor is not None:
+                self.__executor.shutdown(wait=wait, cancel_futures=True)
+                self.__executor = None
+
+
+parse_pool = ParsePool()  # * Shared by all CalendarWrapper instances of the process (shut down in main.lifespan)
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# parse_pool.map(process_ical, {"TINF22B1": (b"BEGIN:VCALENDAR...",), "TINF22B2": (b"...",)})
+# -> {"TINF22B1": {"data": CompressedPayload(...), "hash": "..."}, "TINF22B2": ValueError("Invalid content line: ...")}
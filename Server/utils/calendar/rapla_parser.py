@@ -0,0 +1,133 @@
+from typing import Any, Dict, List
+from lxml import etree, html
+import datetime
+import re
+
+# ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
+from utils.calendar.event_tagger import event_tagger
+
+# Single-pass parser for Rapla week views (one lxml tree, no re-serialization of the week tables).
+# Produces the same event format as the previous BeautifulSoup scraper of CalendarWrapper.
+
+REGEX_COLOR = re.compile(r"background-color:\s*(#[0-9a-fA-F]+)")
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+XPATH_COURSE_NAME = etree.XPath("(//h2)[1]")
+XPATH_WEEKS = etree.XPath(f"//table[{_has_class('week_table')}]")
+XPATH_WEEK_ROWS = etree.XPath("./tr | ./*/tr")  # With or without thead/tbody
+XPATH_PERSON = etree.XPath(f".//span[{_has_class('person')}]")
+XPATH_RESOURCES = etree.XPath(f".//span[{_has_class('resource')}]")
+
+SEPARATOR_CELLS = {"week_separatorcell", "week_separatorcell_black"}
+SMALL_SEPARATOR_CELLS = {"week_smallseparatorcell", "week_smallseparatorcell_black"}
+
+
+###########################################################################
+################################## Parser #################################
+###########################################################################
+
+
+def parse_rapla_page(page: str, year: int = None) -> Dict[str, Any]:
+    """Parse a Rapla week view page to the calendar json format.
+
+    year is the year of the first day on the page (default: current year). It is increased whenever the
+    month of the day headers wraps around (31.12. -> 01.01.), also in the middle of a week.
+    """
+    current_year = year or datetime.datetime.now().year
+    last_month = 0
+
+    tree = html.document_fromstring(page.replace("<br/>", "\n"))
+    course_name = XPATH_COURSE_NAME(tree)[0].text_content().split(",")[0]
+
+    event_json = {"X-WR-TIMEZONE": "Europe/Berlin", "events": []}
+
+    for week in XPATH_WEEKS(tree):
+        rows = XPATH_WEEK_ROWS(week)
+        days = []
+
+        for row in rows:
+            day_offset = 0
+            is_normal_spacer_before = False
+
+            for cell in row.iterchildren("td"):
+                cell_class = cell.get("class", "").split()
+                cell_class = cell_class[0] if cell_class else None
+
+                if cell_class == "week_header":
+                    day_month = cell.text_content().split(" ")[1]
+                    month = int(day_month.split(".")[1])
+                    if month < last_month:
+                        current_year += 1
+                    last_month = month
+                    days.append(f"{day_month}{current_year}")
+                elif cell_class == "week_block":
+                    event = _parse_block(cell, days, day_offset, course_name)
+                    if event:
+                        event_json["events"].append(event)
+                elif cell_class in SMALL_SEPARATOR_CELLS:
+                    if is_normal_spacer_before:
+                        day_offset += 1
+                        is_normal_spacer_before = False
+                elif cell_class in SEPARATOR_CELLS:
+                    is_normal_spacer_before = True
+    return event_json
+
+
+def _parse_block(cell: html.HtmlElement, days: List[str], day_offset: int, course_name: str) -> Dict[str, Any]:
+    # ~~~~~ Process <a> tag - first information ~~~~ #
+    lines = cell.find(".//a").text_content().split("\n")
+    lecture_time = lines[0].replace("\xa0", "").split("-")
+
+    # ----- Lecture name + special information ----- #
+    lecture_name = lines[1]
+    # Same tags as the iCal backend (rules in data/calendar/event_tags.json)
+    lecture_description = {"tags": event_tagger.tag(summary=lecture_name)}
+
+    if "online" in lecture_description["tags"]:
+        lecture_name = lecture_name.replace("online", "").strip()
+        while lecture_name[-1].lower() in "-_.":
+            lecture_name = lecture_name[:-1]
+
+    # ---------------- Lecture Time ---------------- #
+    try:
+        lecture_start = datetime.datetime.strptime(f"{days[day_offset]} {lecture_time[0]}", "%d.%m.%Y %H:%M")
+        lecture_end = datetime.datetime.strptime(f"{days[day_offset]} {lecture_time[1]}", "%d.%m.%Y %H:%M")
+    except IndexError:
+        print(f"[ERROR] Day offset error for {course_name}->{lecture_name}! Skipping...")
+        return None
+
+    person = XPATH_PERSON(cell)
+    if person:
+        lecture_description["person"] = person[0].text_content()
+
+    # ~~ Process <span> tag - location information ~ #
+    locations = []  # Maybe multiple locations
+    for resource in XPATH_RESOURCES(cell):
+        resource = resource.text_content()
+        if resource not in course_name:
+            locations.append(resource)
+
+    # Get color of the lecture if available
+    style = cell.get("style")
+    if style:
+        color = REGEX_COLOR.search(style)
+        if color:
+            lecture_description["color"] = color.group(1)
+
+    return {
+        "summary": lecture_name,
+        "description": lecture_description,
+        "location": ", ".join(locations) if locations else None,
+        "start": lecture_start.strftime("%Y-%m-%d %H:%M:%S"),
+        "end": lecture_end.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# parse_rapla_page(requests.get("https://rapla.dhbw.de/rapla/calendar?key=...").text, year=2024)
+# -> {"X-WR-TIMEZONE": "Europe/Berlin", "events": [{"summary": "Mathematik I", "description": {"tags": ["online"],
+#     "person": "...", "color": "#ffdd00"}, "location": "A 101", "start": "...", "end": "..."}, ...]}
@@ -0,0 +1,106 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+import threading
+import datetime
+import hashlib
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.calendar import (
+    RAPLA_HORIZON_WEEKS_BACK,
+    RAPLA_HORIZON_WEEKS_AHEAD,
+    RAPLA_WEEKS_PER_WINDOW,
+    RAPLA_PAGE_CACHE_SIZE,
+)
+
+# A Rapla page only renders the weeks starting at the date in its URL (day, month, year) and the number of
+# weeks in 'pages'. A full semester is therefore fetched as several week-aligned windows that are merged.
+
+RAPLA_DATE_PARAMS = {"day", "month", "year", "pages", "today", "prev", "next", "goto"}  # Navigation moves the window
+
+###########################################################################
+################################# Windows #################################
+###########################################################################
+
+
+def rapla_window_starts(
+    today: datetime.date = None,
+    weeks_back: int = RAPLA_HORIZON_WEEKS_BACK,
+    weeks_ahead: int = RAPLA_HORIZON_WEEKS_AHEAD,
+    weeks_per_window: int = RAPLA_WEEKS_PER_WINDOW,
+) -> List[datetime.date]:
+    """Mondays on which the windows of the horizon start (current week - weeks_back until current week + weeks_ahead)."""
+    today = today or datetime.date.today()
+    first_monday = today - datetime.timedelta(days=today.weekday(), weeks=weeks_back)
+    weeks = weeks_back + weeks_ahead + 1
+    return [first_monday + datetime.timedelta(weeks=week) for week in range(0, weeks, weeks_per_window)]
+
+
+def rapla_window_url(source: str, start: datetime.date, weeks: int = RAPLA_WEEKS_PER_WINDOW) -> str:
+    """Replace the date parameters of a Rapla URL with the given window."""
+    parts = urlsplit(source)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key.lower() not in RAPLA_DATE_PARAMS]
+    query += [("day", start.day), ("month", start.month), ("year", start.year), ("pages", weeks)]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def rapla_windows(source: str, today: datetime.date = None) -> Dict[datetime.date, str]:
+    """All window URLs of a Rapla source for the configured horizon (start of window -> URL)."""
+    return {start: rapla_window_url(source, start) for start in rapla_window_starts(today)}
+
+
+def merge_window_events(windows: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Merge the events of all windows of a source. Events rendered by more than one window are only kept once."""
+    events = {}
+    for window_events in windows:
+        for event in window_events:
+            key = (event["summary"], event["start"], event["end"], event["location"])
+            events.setdefault(key, event)
+    return sorted(events.values(), key=lambda event: (event["start"], event["end"], event["summary"]))
+
+
+###########################################################################
+################################ Page Cache ###############################
+###########################################################################
+
+
+class RaplaPageCache:
+    """Parsed events of Rapla windows by URL, together with the content hash and validators of the page.
+    A window whose page did not change (304 or same content hash) is not parsed again."""
+
+    def __init__(self, max_size: int = RAPLA_PAGE_CACHE_SIZE):
+        self.max_size = max_size
+        self.__entries: OrderedDict[str, Tuple[str, Dict[str, Any], List[Dict[str, Any]]]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        return hashlib.sha1(content).hexdigest()
+
+    def get(self, url: str) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]]] | None:
+        """Get (content hash, validators, events) of a window"""
+        with self.__lock:
+            entry = self.__entries.get(url)
+            if entry is not None:
+                self.__entries.move_to_end(url)
+            return entry
+
+    def validators(self, url: str) -> Dict[str, Any] | None:
+        entry = self.get(url)
+        return entry[1] if entry else None
+
+    def put(self, url: str, content_hash: str, validators: Dict[str, Any], events: List[Dict[str, Any]]):
+        with self.__lock:
+            self.__entries[url] = (content_hash, validators, events)
+            self.__entries.move_to_end(url)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+
+rapla_page_cache = RaplaPageCache()  # * Shared by all CalendarWrapper instances of the process
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# rapla_windows("https://rapla.dhbw.de/rapla/calendar?key=abc&salt=123&day=1&month=1&year=2024", datetime.date(2024, 10, 16))
+# -> {datetime.date(2024, 9, 16): "https://rapla.dhbw.de/rapla/calendar?key=abc&salt=123&day=16&month=9&year=2024&pages=4",
+#     datetime.date(2024, 10, 14): "...&day=14&month=10&year=2024&pages=4", ...}
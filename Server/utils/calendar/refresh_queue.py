@@ -0,0 +1,49 @@
+from typing import Dict, Iterable, List
+import threading
+
+# Work queue of the native calendar refresh, keyed by calendar id.
+# The refresh tasks only enqueue calendars (producers), a single scheduled task fetches them (consumer).
+# A calendar that is enqueued by several producers is fetched once with the highest priority.
+
+PRIORITY_LINKED = 0  # * Calendars linked to user accounts
+PRIORITY_GUEST = 1  # * Calendars recently accessed by guests
+PRIORITY_SWEEP = 2  # * All calendars of the catalog
+
+
+class RefreshQueue:
+    def __init__(self):
+        self.__queue: Dict[int, int] = {}  # calendar_id -> priority (insertion ordered)
+        self.__lock = threading.Lock()
+
+    def enqueue(self, calendar_ids: Iterable[int], priority: int) -> int:
+        """Queue calendars (a queued calendar keeps the higher priority). Returns the number of new entries."""
+        added = 0
+        with self.__lock:
+            for calendar_id in calendar_ids:
+                current = self.__queue.get(calendar_id)
+                if current is None:
+                    added += 1
+                    self.__queue[calendar_id] = priority
+                elif priority < current:
+                    self.__queue[calendar_id] = priority
+        return added
+
+    def drain(self, limit: int = None) -> List[int]:
+        """Take up to limit calendars in priority order (enqueue order within a priority)."""
+        with self.__lock:
+            calendar_ids = sorted(self.__queue, key=self.__queue.get)[:limit]
+            for calendar_id in calendar_ids:
+                del self.__queue[calendar_id]
+        return calendar_ids
+
+    def __len__(self) -> int:
+        return len(self.__queue)
+
+
+native_refresh_queue = RefreshQueue()  # * Shared by the native calendar refresh tasks
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# native_refresh_queue.enqueue([1, 2, 3], PRIORITY_SWEEP)
+# native_refresh_queue.enqueue([2], PRIORITY_LINKED)  -> 0 (already queued, priority raised)
+# native_refresh_queue.drain(2)  -> [2, 1]
@@ -0,0 +1,50 @@
+from typing import NamedTuple
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.calendar import (
+    REFRESH_MIN_SECONDS,
+    REFRESH_DEFAULT_SECONDS,
+    REFRESH_MAX_SECONDS,
+    REFRESH_BACKOFF_FACTOR,
+    REFRESH_EXAM_MAX_SECONDS,
+)
+
+# Adaptive refresh interval of a calendar based on the outcome of its fetches:
+#   - unchanged -> the interval grows by REFRESH_BACKOFF_FACTOR (stable feeds are fetched less often)
+#   - changed   -> the interval shrinks by REFRESH_BACKOFF_FACTOR squared (volatile feeds are fetched more often)
+#   - failed    -> the interval grows (an unreachable upstream is not hammered)
+# Calendars with an upcoming exam are never refreshed less often than REFRESH_EXAM_MAX_SECONDS.
+# min_interval is a floor that wins over everything else (custom calendars: the refresh interval set by the owner).
+
+
+class RefreshOutcome(NamedTuple):
+    changed: bool = False
+    failed: bool = False
+    elapsed: float | None = None  # Download time in seconds
+    bytes: int | None = None  # Downloaded bytes
+
+
+def next_refresh_interval(
+    interval: int | None,
+    outcome: RefreshOutcome,
+    exam_upcoming: bool = False,
+    min_interval: int = REFRESH_MIN_SECONDS,
+) -> int:
+    """Refresh interval (in seconds) after a fetch with the given outcome."""
+    interval = interval or REFRESH_DEFAULT_SECONDS
+    if outcome.changed:
+        interval = interval / REFRESH_BACKOFF_FACTOR**2
+    else:
+        interval = interval * REFRESH_BACKOFF_FACTOR
+
+    interval = min(max(int(interval), REFRESH_MIN_SECONDS), REFRESH_MAX_SECONDS)
+    if exam_upcoming:
+        interval = min(interval, REFRESH_EXAM_MAX_SECONDS)
+    return max(interval, min_interval)
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# next_refresh_interval(900, RefreshOutcome(changed=False))  -> 1350 (unchanged -> backs off)
+# next_refresh_interval(900, RefreshOutcome(changed=True))  -> 400 (changed -> tightens)
+# next_refresh_interval(7200, RefreshOutcome(), exam_upcoming=True)  -> 600
+# next_refresh_interval(400, RefreshOutcome(changed=True), min_interval=1800)  -> 1800 (custom calendar, 30 minutes)
@@ -0,0 +1,187 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, NamedTuple
+import threading
+import time
+import hashlib
+import gzip
+import uuid
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.calendar import (
+    CALENDAR_RESPONSE_CACHE_SIZE,
+    CALENDAR_RESPONSE_CACHE_TTL,
+    CALENDAR_CATALOG_CACHE_TTL,
+    CALENDAR_FEED_CACHE_SIZE,
+)
+
+# Ready-to-send response bodies of calendar GETs (raw and gzip), so popular calendars are served without
+# querying the database or validating the events again. Entries are dropped by the refresh tasks when the
+# calendar changes and expire after the TTL (other processes of the server may have refreshed it).
+# The catalog of the available calendars is cached the same way (see CalendarCatalogCache), the rendered ICS feeds
+# are kept by the hash of their calendar (see CalendarFeedCache).
+
+
+class CachedResponse(NamedTuple):
+    calendar_id: int
+    hash: str
+    raw: bytes
+    gzip: bytes
+    expires: float
+
+
+class CalendarResponseCache:
+    def __init__(self, max_size: int = CALENDAR_RESPONSE_CACHE_SIZE, ttl: float = CALENDAR_RESPONSE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.__entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: Hashable) -> CachedResponse | None:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.monotonic():
+                del self.__entries[key]
+                return None
+            self.__entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, calendar_id: int, calendar_hash: str, raw: bytes) -> CachedResponse:
+        """Cache the response body of a calendar (the gzip body is compressed once here)."""
+        entry = CachedResponse(
+            calendar_id, calendar_hash, raw, gzip.compress(raw, mtime=0), time.monotonic() + self.ttl
+        )
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, *calendar_ids: int):
+        """Drop the responses of the given calendars (e.g. after a refresh changed them)."""
+        calendar_ids = set(calendar_ids)
+        with self.__lock:
+            for key in [key for key, entry in self.__entries.items() if entry.calendar_id in calendar_ids]:
+                del self.__entries[key]
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+
+calendar_response_cache = CalendarResponseCache()  # * Shared by all requests of the process
+
+
+###########################################################################
+################################# Catalog #################################
+###########################################################################
+
+
+class CachedCatalog(NamedTuple):
+    body: bytes
+    etag: str
+
+
+class CalendarCatalogCache:
+    """Encoded catalog of the available native calendars (all universities and per university).
+    Built on the first request and kept until the calendars or universities change (invalidate) or the TTL expires.
+    invalidate only reaches this process, the TTL bounds the staleness when another process changed the calendars."""
+
+    def __init__(self, ttl: float = CALENDAR_CATALOG_CACHE_TTL):
+        self.ttl = ttl
+        self.__catalog: Dict[uuid.UUID | None, CachedCatalog] | None = None
+        self.__expires = 0.0
+        self.__generation = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        """Take before building the catalog - put ignores a catalog that was built before an invalidation."""
+        return self.__generation
+
+    @staticmethod
+    def __entry(body: bytes) -> CachedCatalog:
+        return CachedCatalog(body, f'"{hashlib.sha1(body).hexdigest()}"')
+
+    @classmethod
+    def __select(cls, catalog: Dict[uuid.UUID | None, CachedCatalog], university_uuid: uuid.UUID | None):
+        return catalog.get(university_uuid) or cls.__entry(b"[]")
+
+    def get(self, university_uuid: uuid.UUID = None) -> CachedCatalog | None:
+        catalog = self.__catalog
+        if catalog is None or self.__expires < time.monotonic():
+            return None
+        return self.__select(catalog, university_uuid)
+
+    def put(
+        self, universities: Dict[uuid.UUID, bytes], generation: int, university_uuid: uuid.UUID = None
+    ) -> CachedCatalog:
+        """Cache the catalog (encoded entry of every university) and return the requested entry."""
+        catalog = {key: self.__entry(b"[" + body + b"]") for key, body in universities.items()}
+        catalog[None] = self.__entry(b"[" + b",".join(universities.values()) + b"]")
+        with self.__lock:
+            if generation == self.__generation:
+                self.__catalog = catalog
+                self.__expires = time.monotonic() + self.ttl
+        return self.__select(catalog, university_uuid)
+
+    def invalidate(self):
+        with self.__lock:
+            self.__generation += 1
+            self.__catalog = None
+
+
+calendar_catalog_cache = CalendarCatalogCache()  # * Rebuilt after calendars were added/deleted or after the TTL
+
+
+###########################################################################
+################################# ICS Feed ################################
+###########################################################################
+
+
+class CalendarFeedCache:
+    """Rendered ICS feeds by calendar (e.g. ("native", 12)). An entry is only returned for the hash it was rendered
+    from, so a changed calendar is rendered again without an invalidation (the hash is read with the calendar)."""
+
+    def __init__(self, max_size: int = CALENDAR_FEED_CACHE_SIZE):
+        self.max_size = max_size
+        self.__entries: OrderedDict[Hashable, tuple[str, bytes]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: Hashable, calendar_hash: str) -> bytes | None:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or entry[0] != calendar_hash:
+                return None
+            self.__entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, calendar_hash: str, feed: bytes):
+        with self.__lock:
+            self.__entries[key] = (calendar_hash, feed)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+
+calendar_feed_cache = CalendarFeedCache()  # * Shared by all requests of the process
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# entry = calendar_response_cache.get((university_uuid, "TINF22B1"))
+# if entry is None:
+#     entry = calendar_response_cache.put((university_uuid, "TINF22B1"), calendar.calendar_native_id, calendar.hash, body)
+# calendar_response_cache.invalidate(calendar.calendar_native_id)  # after the refresh was committed
+#
+# generation = calendar_catalog_cache.generation
+# catalog = calendar_catalog_cache.get(university_uuid) or calendar_catalog_cache.put(encoded, generation, university_uuid)
+#
+# feed = calendar_feed_cache.get(("native", calendar.calendar_native_id), calendar.hash)
+# if feed is None:
+#     feed = render_ics(calendar.data, name, "native", calendar.calendar_native_id)
+#     calendar_feed_cache.put(("native", calendar.calendar_native_id), calendar.hash, feed)
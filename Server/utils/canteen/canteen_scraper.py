@@ -1,8 +1,10 @@
 from bs4 import BeautifulSoup
-import requests
 from datetime import datetime, timedelta
 import re
 
+# ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
+from utils.network import http_client
+
 
 def fetch_menu(
     canteen_short_name: str,
@@ -60,7 +62,7 @@ def fetch_menu_dhbw_eppel(
     # url = f"https://www.stw-ma.de/Essen+_+Trinken/Speisepl%C3%A4ne/Speisenausgabe+DHBW+Eppelheim-date-2024%25252d03%25252d{date}-view-week.html"
 
     # Fetch and parse the menu page
-    response = requests.get(url)
+    response = http_client.get(url)
     soup = BeautifulSoup(response.text, "html.parser")
     rows = soup.find_all("tr")
     menu = {}
@@ -178,7 +180,7 @@ def fetch_menu_stw_ma(
             )
 
     # fetch menu from url
-    response = requests.get(url)
+    response = http_client.get(url)
     soup = BeautifulSoup(response.text, "html.parser")
     rows = soup.find_all("tr")
     menu = {}
@@ -0,0 +1,202 @@
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from typing import Any, Dict, Hashable, Mapping
+import asyncio
+import hashlib
+import time
+import httpx
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.network import FETCH_MAX_CONCURRENCY, FETCH_MAX_CONCURRENCY_PER_HOST
+
+# ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
+from utils.network.http_client import create_async_client, async_get, ResponseTooLarge, CircuitOpen
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status_code: int | None = None
+    content: bytes | None = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0  # In seconds
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status_code == 200 and bool(self.content)
+
+    @property
+    def not_modified(self) -> bool:
+        return self.error is None and self.status_code == 304
+
+    @property
+    def text(self) -> str:
+        # Decode with the charset announced by the server (if any), like requests' Response.text
+        charset = "utf-8"
+        for param in self.headers.get("content-type", "").split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "charset" and value:
+                charset = value.strip('"')
+        try:
+            return (self.content or b"").decode(charset, errors="replace")
+        except LookupError:
+            return (self.content or b"").decode("utf-8", errors="replace")
+
+
+VALIDATOR_FIELDS = ("etag", "last_modified", "content_length", "fingerprint")
+
+
+def get_source_validators(source: Any) -> Dict[str, Any]:
+    """Get the stored validators of a calendar (its source_etag, ... columns) for a conditional download."""
+    return {name: getattr(source, f"source_{name}") for name in VALIDATOR_FIELDS}
+
+
+def source_validator_columns(validators: Dict[str, Any] | None) -> Dict[str, Any]:
+    """Columns of a calendar (source_etag, ...) that store the validators of its last download."""
+    validators = validators or {}
+    return {f"source_{name}": validators.get(name) for name in VALIDATOR_FIELDS}
+
+
+def conditional_headers(validators: Dict[str, Any] | None) -> Dict[str, str]:
+    """Build the request headers for a conditional GET from stored validators."""
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def payload_fingerprint(content: bytes | None) -> str | None:
+    """Fast fingerprint of a raw payload (blake2b, 128 bit) to detect unchanged downloads before parsing them."""
+    if content is None:
+        return None
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def response_validators(headers: Mapping[str, str], content: bytes | None) -> Dict[str, Any]:
+    """Extract the validators of a response that should be stored for the next download."""
+    return {
+        "etag": headers.get("etag"),
+        "last_modified": headers.get("last-modified"),
+        "content_length": len(content) if content is not None else None,
+        "fingerprint": payload_fingerprint(content),
+    }
+
+
+def is_unchanged(validators: Dict[str, Any] | None, headers: Mapping[str, str], content: bytes | None) -> bool:
+    """Some servers ignore conditional headers and always answer with 200.
+    Treat such a response as unchanged if its payload has the same fingerprint as the stored one
+    (or, without a stored fingerprint, if it carries the same validators as the stored ones)."""
+    if not validators:
+        return False
+    new_validators = response_validators(headers, content)
+    if validators.get("fingerprint") and new_validators["fingerprint"]:
+        return validators["fingerprint"] == new_validators["fingerprint"]
+    if validators.get("etag") and new_validators["etag"]:
+        return validators["etag"] == new_validators["etag"]
+    if validators.get("last_modified") and new_validators["last_modified"]:
+        return (
+            validators["last_modified"] == new_validators["last_modified"]
+            and validators.get("content_length") == new_validators["content_length"]
+        )
+    return False
+
+
+class FetchEngine:
+    """Downloads many sources concurrently.
+
+    The number of parallel downloads is bounded globally (max_concurrency) and per upstream host
+    (max_per_host), so a full refresh does not hammer a single server with hundreds of requests at once.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = FETCH_MAX_CONCURRENCY,
+        max_per_host: int = FETCH_MAX_CONCURRENCY_PER_HOST,
+    ):
+        if max_concurrency < 1 or max_per_host < 1:
+            raise ValueError("Concurrency limits must be at least 1")
+
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+
+    # ======================================================== #
+    # ========================= Async ======================== #
+    # ======================================================== #
+
+    async def __fetch_one(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        validators: Dict[str, Any] | None,
+        global_limit: asyncio.Semaphore,
+        host_limit: asyncio.Semaphore,
+    ) -> FetchResult:
+        async with global_limit, host_limit:
+            start = time.perf_counter()
+            try:
+                response, content = await async_get(client, url, headers=conditional_headers(validators))
+            except (httpx.HTTPError, ResponseTooLarge, CircuitOpen) as e:  # * CircuitOpen fails without a request
+                return FetchResult(url=url, elapsed=time.perf_counter() - start, error=repr(e))
+
+            return FetchResult(
+                url=url,
+                status_code=response.status_code,
+                content=content,
+                headers=dict(response.headers),
+                elapsed=time.perf_counter() - start,
+                error=None if response.status_code in (200, 304) else f"HTTP {response.status_code}",
+            )
+
+    async def fetch_all_async(
+        self, urls: Dict[Hashable, str], validators: Dict[Hashable, Dict[str, Any]] = None
+    ) -> Dict[Hashable, FetchResult]:
+        """Fetch all urls concurrently and return the results under the same keys.
+
+        If validators (etag, last_modified) are given for a key, the request is sent as conditional GET
+        and an unchanged source is answered with a 304 result (see FetchResult.not_modified)."""
+        if not urls:
+            return {}
+        validators = validators or {}
+
+        global_limit = asyncio.Semaphore(self.max_concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+
+        async with create_async_client(self.max_concurrency) as client:
+            jobs = []
+            for key, url in urls.items():
+                host = urlsplit(url).netloc
+                if host not in host_limits:
+                    host_limits[host] = asyncio.Semaphore(self.max_per_host)
+                jobs.append(self.__fetch_one(client, url, validators.get(key), global_limit, host_limits[host]))
+
+            results = await asyncio.gather(*jobs)
+
+        return dict(zip(urls.keys(), results))
+
+    # ======================================================== #
+    # ========================= Sync ========================= #
+    # ======================================================== #
+
+    def fetch_all(
+        self, urls: Dict[Hashable, str], validators: Dict[Hashable, Dict[str, Any]] = None
+    ) -> Dict[Hashable, FetchResult]:
+        """Blocking entry point for the (threaded) update tasks."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.fetch_all_async(urls, validators))
+
+        # Called from inside a running event loop -> run the fetch in its own loop on a helper thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.fetch_all_async(urls, validators)).result()
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# results = FetchEngine().fetch_all({"Lecture 1": "https://...", "Lecture 2": "https://..."})
+# results["Lecture 1"].ok -> True
+# results["Lecture 1"].content -> b"BEGIN:VCALENDAR..."
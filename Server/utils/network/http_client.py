@@ -0,0 +1,194 @@
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict
+import threading
+import asyncio
+import random
+import time
+import requests
+import httpx
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.network import (
+    FETCH_MAX_CONCURRENCY,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_READ_TIMEOUT_SECONDS,
+    HTTP_MAX_RETRIES,
+    HTTP_RETRY_BACKOFF_SECONDS,
+    HTTP_RETRY_JITTER_SECONDS,
+    HTTP_RETRY_STATUS_CODES,
+    HTTP_MAX_RESPONSE_BYTES,
+    HTTP_POOL_HOSTS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_USER_AGENT,
+)
+
+# ~~~~~~~~~~~~~~~~~ Utils ~~~~~~~~~~~~~~~~~ #
+from utils.network.upstream_guard import upstream_guard, CircuitOpen
+
+# One shared outbound client for all scrapers (calendar, calendar sources, canteen).
+# Connections are pooled per host and reused, so TLS handshakes are not repeated for every request.
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+DEFAULT_HEADERS = {"User-Agent": HTTP_USER_AGENT}
+
+_session: requests.Session = None
+_session_lock = threading.Lock()
+
+
+###########################################################################
+################################ Sync Client ##############################
+###########################################################################
+
+
+def get_session() -> requests.Session:
+    """Get the shared requests session (created on first use)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=HTTP_MAX_RETRIES,
+                    backoff_factor=HTTP_RETRY_BACKOFF_SECONDS,
+                    backoff_jitter=HTTP_RETRY_JITTER_SECONDS,
+                    status_forcelist=HTTP_RETRY_STATUS_CODES,
+                    allowed_methods=["GET", "HEAD"],
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry
+                )
+
+                session = requests.Session()
+                session.headers.update(DEFAULT_HEADERS)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get(
+    url: str,
+    headers: Dict[str, str] = None,
+    timeout: tuple[float, float] = (HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS),
+    max_bytes: int = HTTP_MAX_RESPONSE_BYTES,
+) -> requests.Response:
+    """GET an url with the shared session (timeouts, retries, a response size cap and the upstream guard included).
+
+    Raises:
+        CircuitOpen: if the host is failing (no request is sent)
+        ResponseTooLarge: if the response body is larger than max_bytes
+        requests.RequestException: on connection errors / timeouts (after all retries)
+    """
+    wait = upstream_guard.acquire(url)
+    try:
+        time.sleep(wait)  # Rate limit of the host
+        response = get_session().get(url, headers=headers, timeout=timeout, stream=True)
+    except requests.RequestException:
+        upstream_guard.record(url, success=False)
+        raise
+    except BaseException:
+        upstream_guard.release(url)  # No outcome (interrupted) - must not hold the probe of a half-open circuit
+        raise
+    upstream_guard.record(url, success=response.status_code not in HTTP_RETRY_STATUS_CODES)
+
+    try:
+        content_length = response.headers.get("Content-Length")
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            raise ResponseTooLarge(f"{url} announced {content_length} bytes (max {max_bytes})")
+
+        # Read the body in chunks, so an endless/huge response is aborted early
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > max_bytes:
+                raise ResponseTooLarge(f"{url} is larger than {max_bytes} bytes")
+            chunks.append(chunk)
+        response._content = b"".join(chunks)
+    finally:
+        response.close()
+    return response
+
+
+###########################################################################
+############################### Async Client ##############################
+###########################################################################
+
+
+def create_async_client(max_connections: int = FETCH_MAX_CONCURRENCY) -> httpx.AsyncClient:
+    """Create an async client with the shared settings.
+    Async clients are bound to their event loop, so every fetch run creates (and closes) its own client."""
+    return httpx.AsyncClient(
+        headers=DEFAULT_HEADERS,
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        follow_redirects=True,
+    )
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given (0-based) retry attempt."""
+    return HTTP_RETRY_BACKOFF_SECONDS * (2**attempt) + random.uniform(0, HTTP_RETRY_JITTER_SECONDS)
+
+
+async def async_get(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: Dict[str, str] = None,
+    max_bytes: int = HTTP_MAX_RESPONSE_BYTES,
+) -> tuple[httpx.Response, bytes]:
+    """GET an url with retries, a response size cap and the upstream guard. Returns the response and its
+    (capped) body.
+
+    Raises:
+        CircuitOpen: if the host is failing (no request is sent)
+        ResponseTooLarge: if the response body is larger than max_bytes
+        httpx.HTTPError: on connection errors / timeouts (after all retries)
+    """
+    wait = upstream_guard.acquire(url)  # Circuit of the host and the token of the first attempt
+    success = None  # Outcome for the circuit breaker (None: no answer, e.g. cancelled before a response)
+    try:
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            last_attempt = attempt == HTTP_MAX_RETRIES
+            if attempt:
+                # * Every retry is a request to the host and takes its own token of the rate limit
+                wait = max(retry_delay(attempt - 1), upstream_guard.throttle(url))
+            await asyncio.sleep(wait)
+
+            try:
+                async with client.stream("GET", url, headers=headers) as response:
+                    success = response.status_code not in HTTP_RETRY_STATUS_CODES
+                    if not success and not last_attempt:
+                        continue
+
+                    content_length = response.headers.get("content-length")
+                    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                        raise ResponseTooLarge(f"{url} announced {content_length} bytes (max {max_bytes})")
+
+                    chunks = []
+                    size = 0
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                        if size > max_bytes:
+                            raise ResponseTooLarge(f"{url} is larger than {max_bytes} bytes")
+                        chunks.append(chunk)
+                    return response, b"".join(chunks)
+            except httpx.TransportError:
+                success = False
+                if last_attempt:
+                    raise
+    except httpx.HTTPError:
+        success = False
+        raise
+    finally:
+        # Every exit records the outcome (or frees the probe of a half-open circuit if there is none)
+        if success is None:
+            upstream_guard.release(url)
+        else:
+            upstream_guard.record(url, success=success)
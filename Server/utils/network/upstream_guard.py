@@ -0,0 +1,179 @@
+from typing import Dict, Any
+from urllib.parse import urlsplit
+import threading
+import time
+
+# ~~~~~~~~~~~~~~~~~ Config ~~~~~~~~~~~~~~~~ #
+from config.network import (
+    UPSTREAM_RATE_PER_SECOND,
+    UPSTREAM_BURST,
+    UPSTREAM_FAILURE_THRESHOLD,
+    UPSTREAM_RESET_SECONDS,
+)
+
+# Health and politeness per upstream host (shared by the sync and the async client).
+#   - Circuit breaker: after UPSTREAM_FAILURE_THRESHOLD consecutive failures the host is "open" and every
+#     request fails immediately (CircuitOpen) instead of waiting for timeouts. After UPSTREAM_RESET_SECONDS a
+#     single probe request is let through ("half_open") - success closes the circuit, failure opens it again.
+#   - Token bucket: requests to a host are spaced to UPSTREAM_RATE_PER_SECOND (bursts up to UPSTREAM_BURST).
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(
+        self, failure_threshold: int = UPSTREAM_FAILURE_THRESHOLD, reset_seconds: float = UPSTREAM_RESET_SECONDS
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self.state = STATE_CLOSED
+        self.failures = 0  # Consecutive failures
+        self.opened_at: float | None = None
+        self.total_failures = 0
+        self.total_rejected = 0
+        self.__probe_running = False
+        self.__lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a request may be sent (an open circuit lets one probe through after the reset time)."""
+        with self.__lock:
+            if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = STATE_HALF_OPEN
+            if self.state == STATE_HALF_OPEN and not self.__probe_running:
+                self.__probe_running = True
+                return True
+            if self.state == STATE_CLOSED:
+                return True
+            self.total_rejected += 1
+            return False
+
+    def record_success(self):
+        with self.__lock:
+            self.state = STATE_CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.__probe_running = False
+
+    def record_failure(self):
+        with self.__lock:
+            self.failures += 1
+            self.total_failures += 1
+            if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = STATE_OPEN
+                self.opened_at = time.monotonic()
+            self.__probe_running = False
+
+    def release_probe(self):
+        """End a request without an outcome (e.g. cancelled) - a half-open circuit lets the next probe through."""
+        with self.__lock:
+            self.__probe_running = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.__lock:
+            retry_in = None
+            if self.state == STATE_OPEN:
+                retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "total_failures": self.total_failures,
+                "total_rejected": self.total_rejected,
+                "retry_in_seconds": retry_in,
+            }
+
+
+class TokenBucket:
+    def __init__(self, rate: float = UPSTREAM_RATE_PER_SECOND, capacity: int = UPSTREAM_BURST):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("Rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self.__tokens = float(capacity)
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return the seconds the caller has to wait before sending (0 if one was available).
+        Tokens are reserved ahead, so concurrent callers are spaced out instead of all waiting for the same token."""
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+            self.__tokens -= 1
+            return 0.0 if self.__tokens >= 0 else -self.__tokens / self.rate
+
+
+class UpstreamGuard:
+    def __init__(self, breaker_factory=CircuitBreaker, bucket_factory=TokenBucket):
+        self.__breaker_factory = breaker_factory
+        self.__bucket_factory = bucket_factory
+        self.__breakers: Dict[str, CircuitBreaker] = {}
+        self.__buckets: Dict[str, TokenBucket] = {}
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def host(url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self.__lock:
+            if host not in self.__breakers:
+                self.__breakers[host] = self.__breaker_factory()
+            return self.__breakers[host]
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self.__lock:
+            if host not in self.__buckets:
+                self.__buckets[host] = self.__bucket_factory()
+            return self.__buckets[host]
+
+    def acquire(self, url: str) -> float:
+        """Check the circuit of the url's host and reserve a token. Returns the seconds to wait before sending.
+
+        Raises:
+            CircuitOpen: if the host is failing (the request must not be sent)
+        """
+        host = self.host(url)
+        if not self.breaker(host).allow():
+            raise CircuitOpen(f"{host} is unavailable (circuit open)")
+        return self.bucket(host).reserve()
+
+    def throttle(self, url: str) -> float:
+        """Reserve a token for another attempt of an allowed request (no circuit check). Returns the seconds to wait."""
+        return self.bucket(self.host(url)).reserve()
+
+    def release(self, url: str):
+        """End a request of acquire() that got no outcome (cancelled / interrupted), so its probe is not held."""
+        self.breaker(self.host(url)).release_probe()
+
+    def record(self, url: str, success: bool):
+        breaker = self.breaker(self.host(url))
+        if success:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    def states(self) -> Dict[str, Dict[str, Any]]:
+        """State of every known host (for monitoring)."""
+        with self.__lock:
+            breakers = dict(self.__breakers)
+        return {host: breaker.snapshot() for host, breaker in sorted(breakers.items())}
+
+
+upstream_guard = UpstreamGuard()  # * Shared by all outbound requests of the process
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# wait = upstream_guard.acquire("https://www.stw-ma.de/...")  # raises CircuitOpen if the host is failing
+# time.sleep(wait)  # or await asyncio.sleep(wait)
+# ... send the request ...
+# upstream_guard.record("https://www.stw-ma.de/...", success=response.status_code < 500)
+# (or upstream_guard.release(...) if the request was cancelled, upstream_guard.throttle(...) before a retry)
+# upstream_guard.states()  -> {"www.stw-ma.de": {"state": "closed", "consecutive_failures": 0, ...}}
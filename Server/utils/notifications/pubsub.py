@@ -0,0 +1,147 @@
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from abc import ABC, abstractmethod
+import asyncio
+import threading
+
+# Publish/subscribe of hash changes (calendars, canteens) from the refresh tasks to the event streams of the clients.
+# The refresh tasks publish to a channel after their commit, every open event stream holds a Subscription.
+# LocalBroker only reaches the subscribers of this process. A broker across processes (e.g. on a message bus)
+# implements the same interface and replaces it with set_broker() at startup - publishers and routes are unchanged.
+
+
+def calendar_channel(kind: str, calendar_id: int) -> str:
+    """Channel of a calendar (kind: "native"/"custom")."""
+    return f"calendar_{kind}:{calendar_id}"
+
+
+def canteen_channel(canteen_short_name: str) -> str:
+    return f"canteen:{canteen_short_name}"
+
+
+###########################################################################
+############################### Subscription ##############################
+###########################################################################
+
+
+class Subscription:
+    """Channels of one client. Messages are coalesced per channel: a slow client only gets the newest message
+    of a channel (a hash that was already replaced is not worth sending), so the memory per client is bounded."""
+
+    def __init__(self, channels: Iterable[str]):
+        self.channels = frozenset(channels)
+        self.__pending: Dict[str, Dict[str, Any]] = {}
+        self.__wakeup = asyncio.Event()
+        self.__loop: asyncio.AbstractEventLoop | None = None  # Bound by the first get()
+        self.__lock = threading.Lock()
+
+    def deliver(self, channel: str, message: Dict[str, Any]):
+        """Queue a message (thread safe - called by the refresh tasks)."""
+        with self.__lock:
+            self.__pending[channel] = message
+            loop = self.__loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self.__wakeup.set)
+            except RuntimeError:
+                pass  # Event loop is closed (shutdown)
+
+    async def get(self, timeout: float) -> List[Tuple[str, Dict[str, Any]]]:
+        """Wait for messages -> [(channel, message)] ([] if nothing was published within the timeout)."""
+        with self.__lock:
+            self.__loop = asyncio.get_running_loop()
+            if self.__pending:
+                self.__wakeup.set()
+            else:
+                self.__wakeup.clear()
+        try:
+            await asyncio.wait_for(self.__wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self.__lock:
+            messages = list(self.__pending.items())
+            self.__pending.clear()
+        return messages
+
+
+###########################################################################
+################################## Broker #################################
+###########################################################################
+
+
+class NotificationBroker(ABC):
+    """Interface of a broker (see LocalBroker)."""
+
+    @abstractmethod
+    def publish(self, channel: str, message: Dict[str, Any]):
+        """Deliver message to every subscription of channel (thread safe, called after the commit)."""
+
+    @abstractmethod
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        """Open a subscription of the channels (one per event stream)."""
+
+    @abstractmethod
+    def unsubscribe(self, subscription: Subscription):
+        """Close a subscription (the event stream ended)."""
+
+
+class LocalBroker(NotificationBroker):
+    """Broker of the subscribers of this process."""
+
+    def __init__(self):
+        self.__subscribers: Dict[str, Set[Subscription]] = {}
+        self.__lock = threading.Lock()
+
+    def publish(self, channel: str, message: Dict[str, Any]):
+        with self.__lock:
+            subscribers = list(self.__subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(channel, message)
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        subscription = Subscription(channels)
+        with self.__lock:
+            for channel in subscription.channels:
+                self.__subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.__lock:
+            for channel in subscription.channels:
+                subscribers = self.__subscribers.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.__subscribers[channel]
+
+    def subscriber_count(self) -> int:
+        with self.__lock:
+            return len({subscription for subscribers in self.__subscribers.values() for subscription in subscribers})
+
+
+_broker: NotificationBroker = LocalBroker()  # * Replaced by set_broker() to notify across processes
+
+
+def get_broker() -> NotificationBroker:
+    return _broker
+
+
+def set_broker(broker: NotificationBroker):
+    global _broker
+    _broker = broker
+
+
+def publish(channel: str, message: Dict[str, Any]):
+    """Publish a message to the current broker (errors are logged - a notification must not fail a refresh)."""
+    try:
+        _broker.publish(channel, message)
+    except Exception as e:
+        print(f"[ERROR] Publishing to {channel} failed: {e}")
+
+
+# ~~~~~~~~~~~~~~~~ Example ~~~~~~~~~~~~~~~~ #
+# subscription = get_broker().subscribe([calendar_channel("native", 12), canteen_channel("MA")])
+# publish(calendar_channel("native", 12), {"hash": "3f7c..."})  # refresh task, after the commit
+# await subscription.get(timeout=25)
+# -> [("calendar_native:12", {"hash": "3f7c..."})]
+# get_broker().unsubscribe(subscription)